@@ -1,48 +1,193 @@
 import json
 import os.path
+import tempfile
+from typing import Iterable, Optional
+
+import numpy as np
+
+from CrystalStructure.instrumentation import timed
 
 SCATTERING_PARAMS_FILENAME = 'atomic_scattering_params.json'
 COVALENT_RADI_FILENAME = 'covalent_radius.json'
 VDW_FILENAME = 'vdw_radius.json'
 
-def load_constants_json(fname: str) -> dict:
+ELEMENT_SYMBOLS = (
+    'H', 'He', 'Li', 'Be', 'B', 'C', 'N', 'O', 'F', 'Ne', 'Na', 'Mg', 'Al', 'Si', 'P', 'S', 'Cl', 'Ar',
+    'K', 'Ca', 'Sc', 'Ti', 'V', 'Cr', 'Mn', 'Fe', 'Co', 'Ni', 'Cu', 'Zn', 'Ga', 'Ge', 'As', 'Se', 'Br', 'Kr',
+    'Rb', 'Sr', 'Y', 'Zr', 'Nb', 'Mo', 'Tc', 'Ru', 'Rh', 'Pd', 'Ag', 'Cd', 'In', 'Sn', 'Sb', 'Te', 'I', 'Xe',
+    'Cs', 'Ba', 'La', 'Ce', 'Pr', 'Nd', 'Pm', 'Sm', 'Eu', 'Gd', 'Tb', 'Dy', 'Ho', 'Er', 'Tm', 'Yb', 'Lu',
+    'Hf', 'Ta', 'W', 'Re', 'Os', 'Ir', 'Pt', 'Au', 'Hg', 'Tl', 'Pb', 'Bi', 'Po', 'At', 'Rn',
+    'Fr', 'Ra', 'Ac', 'Th', 'Pa', 'U', 'Np', 'Pu', 'Am', 'Cm', 'Bk', 'Cf', 'Es', 'Fm', 'Md', 'No', 'Lr',
+    'Rf', 'Db', 'Sg', 'Bh', 'Hs', 'Mt', 'Ds', 'Rg', 'Cn', 'Nh', 'Fl', 'Mc', 'Lv', 'Ts', 'Og')
+
+def get_constants_fpath(fname : str) -> str:
     dirpath = os.path.dirname(__file__)
-    fpath = os.path.join(dirpath, fname)
-    with open(fpath) as file:
+    return os.path.join(dirpath, fname)
+
+def load_constants_json(fname: str) -> dict:
+    with open(get_constants_fpath(fname=fname)) as file:
         return json.load(file, parse_float=float, parse_int=float)
 
 # ---------------------------------------------------------
 
 
+class ConstantTables:
+    """Dense constant tables. Row i belongs to species id i: row 0 is reserved for non-elements (void/placeholder),
+    rows 1-118 are the elements indexed by atomic number and further rows hold extra table entries such as D.
+    Missing values are NaN"""
+    def __init__(self, symbols : list[str], vdw : np.ndarray, covalent : np.ndarray, scattering_params : np.ndarray):
+        self.symbols : list[str] = symbols
+        self.species_ids : dict[str, int] = {symbol : index for index, symbol in enumerate(symbols) if symbol}
+        self.vdw : np.ndarray = vdw
+        self.covalent : np.ndarray = covalent
+        self.scattering_params : np.ndarray = scattering_params
+
+    @classmethod
+    def from_json(cls) -> 'ConstantTables':
+        vdw_dict = load_constants_json(fname=VDW_FILENAME)
+        covalent_dict = load_constants_json(fname=COVALENT_RADI_FILENAME)
+        scattering_dict = load_constants_json(fname=SCATTERING_PARAMS_FILENAME)
+
+        symbols = ['', *ELEMENT_SYMBOLS]
+        for symbol in [*vdw_dict, *covalent_dict, *scattering_dict]:
+            if not symbol in symbols:
+                symbols.append(symbol)
+
+        vdw = np.full(len(symbols), np.nan)
+        covalent = np.full(len(symbols), np.nan)
+        scattering_params = np.full((len(symbols), 4, 2), np.nan)
+        for index, symbol in enumerate(symbols):
+            vdw[index] = vdw_dict.get(symbol, np.nan)
+            covalent[index] = covalent_dict.get(symbol, np.nan)
+            if symbol in scattering_dict:
+                scattering_params[index] = scattering_dict[symbol]
+
+        return cls(symbols=symbols, vdw=vdw, covalent=covalent, scattering_params=scattering_params)
+
+    @classmethod
+    def from_binary(cls, fpath : str) -> 'ConstantTables':
+        with np.load(fpath) as data:
+            return cls(symbols=data['symbols'].tolist(), vdw=data['vdw'], covalent=data['covalent'],
+                       scattering_params=data['scattering_params'])
+
+    def save_binary(self, fpath : str):
+        """Writes to a temporary file that replaces fpath once complete, so concurrent readers never see a partial file"""
+        dirpath = os.path.dirname(os.path.abspath(fpath))
+        os.makedirs(dirpath, exist_ok=True)
+        file_descriptor, tmp_fpath = tempfile.mkstemp(dir=dirpath, suffix='.npz.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                np.savez(file, symbols=np.array(self.symbols), vdw=self.vdw, covalent=self.covalent,
+                         scattering_params=self.scattering_params)
+            os.replace(tmp_fpath, fpath)
+        except BaseException:
+            os.remove(tmp_fpath)
+            raise
+
 
 class AtomicConstants:
-    _vdw : dict[str, float] = load_constants_json(fname=VDW_FILENAME)
-    _covalent : dict[str, float] = load_constants_json(fname=COVALENT_RADI_FILENAME)
-    _scattering_params : dict[str, tuple] = load_constants_json(fname=SCATTERING_PARAMS_FILENAME)
+    """Van der Waals radii, covalent radii and scattering parameters. The tables are loaded from the json files on
+    first use. If binary_cache_fpath is set (e.g. to a file in a user cache directory), they are read from that
+    binary cache instead while it is newer than the json files, and it is rebuilt otherwise"""
+    binary_cache_fpath : Optional[str] = None
+    _tables : Optional[ConstantTables] = None
+
+    @classmethod
+    def get_tables(cls) -> ConstantTables:
+        if cls._tables is None:
+            cls._tables = cls._load_tables()
+        return cls._tables
+
+    @classmethod
+    @timed(name='atomic_constants.load_tables')
+    def _load_tables(cls) -> ConstantTables:
+        cache_fpath = cls.binary_cache_fpath
+        if cache_fpath is None:
+            return ConstantTables.from_json()
+
+        json_fnames = [VDW_FILENAME, COVALENT_RADI_FILENAME, SCATTERING_PARAMS_FILENAME]
+        json_mtime = max(os.path.getmtime(get_constants_fpath(fname=fname)) for fname in json_fnames)
+        if os.path.isfile(cache_fpath) and os.path.getmtime(cache_fpath) >= json_mtime:
+            try:
+                return ConstantTables.from_binary(fpath=cache_fpath)
+            except Exception:
+                # Unreadable caches (e.g. written by an older version) are rebuilt below
+                pass
+
+        tables = ConstantTables.from_json()
+        try:
+            tables.save_binary(fpath=cache_fpath)
+        except OSError:
+            pass
+        return tables
 
     # ---------------------------------------------------------
     # get
 
     @classmethod
+    @timed(name='atomic_constants.get_vdw_radius')
     def get_vdw_radius(cls, element_symbol: str) -> float:
-        return cls._vdw[element_symbol]
+        tables = cls.get_tables()
+        return cls._get_value(tables.vdw, symbol=element_symbol)
 
     @classmethod
+    @timed(name='atomic_constants.get_covalent')
     def get_covalent(cls, element_symbol: str) -> float:
-        return cls._covalent[element_symbol]
+        tables = cls.get_tables()
+        return cls._get_value(tables.covalent, symbol=element_symbol)
 
     @classmethod
+    @timed(name='atomic_constants.get_scattering_params')
     def get_scattering_params(cls, species_symbol: str) -> tuple:
-        return cls._scattering_params[species_symbol]
+        tables = cls.get_tables()
+        params = tables.scattering_params[cls.get_species_id(symbol=species_symbol)]
+        if np.isnan(params).any():
+            raise KeyError(species_symbol)
+        return tuple(tuple(pair) for pair in params.tolist())
+
+    @classmethod
+    def get_species_id(cls, symbol : str) -> int:
+        return cls.get_tables().species_ids[symbol]
+
+    # ---------------------------------------------------------
+    # vectorized get
+
+    @classmethod
+    def get_species_ids(cls, symbols : Iterable[str]) -> np.ndarray:
+        species_ids = cls.get_tables().species_ids
+        return np.array([species_ids[symbol] for symbol in symbols], dtype=np.int64)
+
+    @classmethod
+    def get_vdw_radii(cls, species_ids : np.ndarray) -> np.ndarray:
+        return cls.get_tables().vdw[species_ids]
+
+    @classmethod
+    def get_covalent_radii(cls, species_ids : np.ndarray) -> np.ndarray:
+        return cls.get_tables().covalent[species_ids]
+
+    @classmethod
+    def get_scattering_params_array(cls, species_ids : np.ndarray) -> np.ndarray:
+        """Returns an array of shape (*species_ids.shape, 4, 2) holding the (a_i, b_i) pairs"""
+        return cls.get_tables().scattering_params[species_ids]
 
     @classmethod
     def print_all(cls):
-        print("Van der Waals radii:", cls._vdw)
-        print("Covalent radii:", cls._covalent)
-        print("Scattering parameters:", cls._scattering_params)
+        tables = cls.get_tables()
+        print("Van der Waals radii:", dict(zip(tables.symbols, tables.vdw.tolist())))
+        print("Covalent radii:", dict(zip(tables.symbols, tables.covalent.tolist())))
+        print("Scattering parameters:", dict(zip(tables.symbols, tables.scattering_params.tolist())))
+
+    # ---------------------------------------------------------
+
+    @classmethod
+    def _get_value(cls, table : np.ndarray, symbol : str) -> float:
+        value = table[cls.get_species_id(symbol=symbol)]
+        if np.isnan(value):
+            raise KeyError(symbol)
+        return float(value)
 
 
 
 if __name__ == "__main__":
     provider = AtomicConstants()
-    provider.print_all()
\ No newline at end of file
+    provider.print_all()
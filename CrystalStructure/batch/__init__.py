@@ -0,0 +1,4 @@
+from .tensors import CrystalBatch, make_batch
+from .density import calculate_cell_volumes, calculate_atomic_volumes, calculate_packing_densities, scale_to_density
+from .symmetry import calculate_symmetries
+from .properties import BatchReport, calculate_properties_batch
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import math
+from typing import Sequence
+
+import numpy as np
+
+from CrystalStructure.atomic_constants import AtomicConstants
+from CrystalStructure.crystal import CrystalStructure
+from CrystalStructure.crystal.atomic_site import AtomType
+from CrystalStructure.crystal.binary import nan_if_none
+from .sites import gather_sites
+
+
+# ---------------------------------------------------------
+
+def calculate_cell_volumes(lattice : np.ndarray) -> np.ndarray:
+    """Unit cell volumes for an array of shape (B, 6) holding a, b, c, alpha, beta, gamma with angles in degrees"""
+    lattice = np.asarray(lattice, dtype=np.float64).reshape(-1, 6)
+    lengths, angles = lattice[:, :3], np.radians(lattice[:, 3:])
+    cos_alpha, cos_beta, cos_gamma = np.cos(angles).T
+    root = 1 - cos_alpha ** 2 - cos_beta ** 2 - cos_gamma ** 2 + 2 * cos_alpha * cos_beta * cos_gamma
+    return np.prod(lengths, axis=1) * np.sqrt(root)
+
+
+def calculate_atomic_volumes(crystals : Sequence[CrystalStructure]) -> np.ndarray:
+    """Batched equivalent of CrystalBase.calculate_atomic_volume; void and placeholder sites do not contribute"""
+    site_columns = gather_sites(crystals=crystals)
+    atom_types = [AtomType.intern(symbol=species_str) for species_str in site_columns.species_table]
+    is_standard = np.array([atom_type.is_standard for atom_type in atom_types], dtype=bool)
+    constants_ids = np.array([atom_type.constants_id for atom_type in atom_types], dtype=np.int64)
+    radii = (AtomicConstants.get_covalent_radii(constants_ids) + AtomicConstants.get_vdw_radii(constants_ids)) / 2
+    species_volumes = np.where(is_standard, 4 / 3 * math.pi * radii ** 3, 0.0)
+    if np.any(np.isnan(species_volumes)):
+        missing = [atom_type.symbol for atom_type, volume in zip(atom_types, species_volumes) if np.isnan(volume)]
+        raise KeyError(f'No radii available for species {missing}')
+
+    counts, site_species = site_columns.counts, site_columns.species
+    if len(site_species) == 0:
+        return np.zeros(len(counts))
+    crystal_indices = np.repeat(np.arange(len(counts)), counts)
+    site_volumes = np.where(is_standard[site_species], species_volumes[site_species] * site_columns.occupancies, 0.0)
+    return np.bincount(crystal_indices, weights=site_volumes, minlength=len(counts))
+
+
+def calculate_packing_densities(crystals : Sequence[CrystalStructure]) -> np.ndarray:
+    """Batched equivalent of CrystalStructure.packing_density. Crystals without volume_uc use their cell volume"""
+    return calculate_atomic_volumes(crystals) / get_unit_cell_volumes(crystals)
+
+
+def scale_to_density(crystals : Sequence[CrystalStructure], target_density : float) -> np.ndarray:
+    """Batched equivalent of CrystalStructure.scale: rescales the lattice lengths of all crystals so that their
+    packing density equals target_density and writes back lengths, volume_uc and atomic_volume.
+    The symmetry fields are kept. Returns the applied volume scaling factors"""
+    atomic_volumes = calculate_atomic_volumes(crystals)
+    volumes_uc = get_unit_cell_volumes(crystals)
+    volume_scalings = atomic_volumes / volumes_uc / target_density
+    cbrt_scalings = np.cbrt(volume_scalings)
+    new_volumes = volumes_uc * volume_scalings
+
+    results = zip(crystals, cbrt_scalings.tolist(), new_volumes.tolist(), atomic_volumes.tolist())
+    for crystal, cbrt_scaling, new_volume, atomic_volume in results:
+        crystal.rescale_lengths(cbrt_scaling=cbrt_scaling, volume_uc=new_volume, atomic_volume=atomic_volume)
+
+    return volume_scalings
+
+# ---------------------------------------------------------
+
+def get_unit_cell_volumes(crystals : Sequence[CrystalStructure]) -> np.ndarray:
+    volumes = [nan_if_none(crystal.get_cached('volume_uc')) for crystal in crystals]
+    stored_volumes = np.array(volumes, dtype=np.float64)
+    missing = np.isnan(stored_volumes)
+    if np.any(missing):
+        missing_crystals = [crystal for crystal, is_missing in zip(crystals, missing) if is_missing]
+        lattice = np.array([(*c.lengths.as_tuple(), *c.angles.as_tuple()) for c in missing_crystals], dtype=np.float64)
+        stored_volumes[missing] = calculate_cell_volumes(lattice)
+    return stored_volumes
@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional, Callable
+
+import numpy as np
+
+from CrystalStructure.crystal import CrystalStructure
+from CrystalStructure.crystal.lattice import make_lattice_matrices
+from CrystalStructure.symmetry import SymmetryCache, SymmetryResult, SpglibCell, analyze_cell
+
+TIMEOUT_ERROR = 'TimeoutError: symmetry analysis exceeded the timeout'
+ChunkResults = list[tuple[int, Optional[SymmetryResult], Optional[str]]]
+# ---------------------------------------------------------
+
+@dataclass
+class BatchReport:
+    """Progress of calculate_properties_batch; errors maps the position of a crystal in the input to its error"""
+    completed : int = 0
+    failed : int = 0
+    elapsed : float = 0.0
+    errors : dict[int, str] = field(default_factory=dict)
+
+    @property
+    def throughput(self) -> float:
+        return self.completed / self.elapsed if self.elapsed > 0 else 0.0
+
+
+@dataclass
+class PackedChunk:
+    """Compact spglib inputs of several crystals: one lattice matrix per crystal and the positions and type numbers
+    of all crystals concatenated, split by counts. Only this is sent to worker processes"""
+    indices : list[int]
+    lattice_matrices : np.ndarray
+    positions : np.ndarray
+    numbers : np.ndarray
+    counts : np.ndarray
+
+    def get_cells(self) -> Iterator[tuple[int, tuple]]:
+        offsets = np.concatenate([[0], np.cumsum(self.counts)])
+        for j, index in enumerate(self.indices):
+            start, stop = offsets[j], offsets[j+1]
+            yield index, (self.lattice_matrices[j], self.positions[start:stop], self.numbers[start:stop])
+
+    def split(self) -> list[PackedChunk]:
+        return [PackedChunk(indices=[index], lattice_matrices=matrix[np.newaxis], positions=positions,
+                            numbers=numbers, counts=np.array([len(numbers)]))
+                for index, (matrix, positions, numbers) in self.get_cells()]
+
+
+def calculate_properties_batch(crystals : Iterable[CrystalStructure], num_workers : Optional[int] = None,
+                               chunk_size : int = 64, timeout : Optional[float] = None,
+                               symprec : float = 0.1, angle_tolerance : float = 10, use_cache : bool = True,
+                               progress_callback : Optional[Callable[[BatchReport], None]] = None) -> BatchReport:
+    """Equivalent of calling calculate_properties on every crystal, with the spglib work split into chunks that
+    are dispatched to num_workers processes (num_workers=0 runs in the calling process). Results are merged back
+    into the given crystals. A chunk exceeding timeout seconds is retried crystal by crystal so that only
+    pathological structures fail. Failures are reported in the returned BatchReport instead of raised"""
+    report = BatchReport()
+    start_time = time.time()
+    cache = SymmetryCache.get_default()
+    pending : dict[int, tuple[CrystalStructure, Optional[str]]] = {}
+
+    def merge(index : int, result : Optional[SymmetryResult], error : Optional[str]):
+        crystal, key = pending.pop(index)
+        if result is None:
+            report.failed += 1
+            report.errors[index] = error
+        else:
+            crystal.spacegroup = result.spacegroup
+            crystal.wyckoff_symbols = list(result.wyckoff_symbols)
+            crystal.crystal_system = result.crystal_system
+            if use_cache:
+                cache.put(key=key, result=result)
+        report.completed += 1
+
+    def on_chunk_done(chunk_results : ChunkResults):
+        for index, result, error in chunk_results:
+            merge(index=index, result=result, error=error)
+        report.elapsed = time.time() - start_time
+        if progress_callback:
+            progress_callback(report)
+
+    def make_chunks() -> Iterator[PackedChunk]:
+        indexed_crystals = enumerate(crystals)
+        while True:
+            batch = [(index, crystal) for index, crystal in itertools.islice(indexed_crystals, chunk_size)]
+            if not batch:
+                return
+            cached_results, to_analyze = [], []
+            for index, crystal in batch:
+                pending[index] = (crystal, None)
+                if len(crystal.base) == 0:
+                    cached_results.append((index, None, 'ValueError: Base is empty'))
+                    continue
+                try:
+                    key = crystal.make_symmetry_key(symprec=symprec, angle_tolerance=angle_tolerance) if use_cache else None
+                except Exception as e:
+                    cached_results.append((index, None, f'{type(e).__name__}: {e}'))
+                    continue
+                pending[index] = (crystal, key)
+                cached = cache.get(key=key) if use_cache else None
+                if not cached is None:
+                    cached_results.append((index, cached, None))
+                else:
+                    to_analyze.append((index, crystal))
+
+            set_volumes(crystals=[crystal for _, crystal in batch if len(crystal.base) > 0])
+            indexed_cells = []
+            matrices = get_lattice_matrices(crystals=[crystal for _, crystal in to_analyze])
+            for (index, crystal), matrix in zip(to_analyze, matrices):
+                try:
+                    indexed_cells.append((index, crystal.to_spglib_cell(lattice_matrix=matrix)))
+                except Exception as e:
+                    cached_results.append((index, None, f'{type(e).__name__}: {e}'))
+            if cached_results:
+                on_chunk_done(chunk_results=cached_results)
+            if indexed_cells:
+                yield pack_chunk(indexed_cells=indexed_cells)
+
+    if num_workers == 0:
+        for chunk in make_chunks():
+            on_chunk_done(analyze_chunk(chunk=chunk, symprec=symprec, angle_tolerance=angle_tolerance))
+    else:
+        num_workers = num_workers or os.cpu_count() or 1
+        scheduler = ChunkScheduler(num_workers=num_workers, timeout=timeout, symprec=symprec,
+                                   angle_tolerance=angle_tolerance)
+        scheduler.run(chunks=make_chunks(), on_chunk_done=on_chunk_done)
+
+    report.elapsed = time.time() - start_time
+    return report
+
+
+class ChunkScheduler:
+    """Keeps one chunk in flight per worker process. A worker whose chunk exceeds the timeout or that dies is
+    killed and replaced; the chunk is then retried crystal by crystal so that only the offending crystal fails"""
+    def __init__(self, num_workers : int, timeout : Optional[float], symprec : float, angle_tolerance : float):
+        self.num_workers : int = num_workers
+        self.timeout : Optional[float] = timeout
+        self.symprec : float = symprec
+        self.angle_tolerance : float = angle_tolerance
+
+    def run(self, chunks : Iterator[PackedChunk], on_chunk_done : Callable[[ChunkResults], None]):
+        retry_queue : list[PackedChunk] = []
+        workers = [self._make_worker() for _ in range(self.num_workers)]
+
+        def replace(worker : ChunkWorker, error : str):
+            chunk = worker.chunk
+            worker.kill()
+            workers[workers.index(worker)] = self._make_worker()
+            if len(chunk.indices) > 1:
+                retry_queue.extend(chunk.split())
+            else:
+                on_chunk_done([(chunk.indices[0], None, error)])
+
+        try:
+            while True:
+                for worker in [w for w in workers if w.chunk is None]:
+                    chunk = retry_queue.pop() if retry_queue else next(chunks, None)
+                    if chunk is None:
+                        break
+                    worker.submit(chunk=chunk)
+                busy = [w for w in workers if not w.chunk is None]
+                if not busy:
+                    return
+
+                wait_time = None
+                if not self.timeout is None:
+                    wait_time = max(min(w.started + self.timeout for w in busy) - time.time(), 0)
+                ready = multiprocessing.connection.wait([w.connection for w in busy], timeout=wait_time)
+                for worker in [w for w in busy if w.connection in ready]:
+                    try:
+                        results = worker.receive()
+                    except (EOFError, OSError):
+                        replace(worker=worker, error='RuntimeError: worker process died during symmetry analysis')
+                        continue
+                    on_chunk_done(results)
+
+                for worker in [w for w in busy if not w.chunk is None and self._is_expired(started=w.started)]:
+                    replace(worker=worker, error=TIMEOUT_ERROR)
+        finally:
+            for worker in workers:
+                worker.stop()
+
+    def _make_worker(self) -> ChunkWorker:
+        return ChunkWorker(symprec=self.symprec, angle_tolerance=self.angle_tolerance)
+
+    def _is_expired(self, started : float) -> bool:
+        return not self.timeout is None and time.time() - started > self.timeout
+
+
+class ChunkWorker:
+    def __init__(self, symprec : float, angle_tolerance : float):
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=run_worker, args=(child_connection, symprec, angle_tolerance),
+                                               daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.chunk : Optional[PackedChunk] = None
+        self.started : Optional[float] = None
+
+    def submit(self, chunk : PackedChunk):
+        self.connection.send(chunk)
+        self.chunk, self.started = chunk, time.time()
+
+    def receive(self) -> ChunkResults:
+        results = self.connection.recv()
+        self.chunk, self.started = None, None
+        return results
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+    def stop(self):
+        if self.chunk is None and self.process.is_alive():
+            try:
+                self.connection.send(None)
+                self.process.join(timeout=1)
+            except OSError:
+                pass
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+def run_worker(connection, symprec : float, angle_tolerance : float):
+    while True:
+        chunk = connection.recv()
+        if chunk is None:
+            return
+        connection.send(analyze_chunk(chunk=chunk, symprec=symprec, angle_tolerance=angle_tolerance))
+
+# ---------------------------------------------------------
+
+def set_volumes(crystals : list[CrystalStructure]):
+    matrices = get_lattice_matrices(crystals=crystals)
+    volumes = np.abs(np.einsum('ij,ij->i', np.cross(matrices[:, 0], matrices[:, 1]), matrices[:, 2]))
+    for crystal, volume in zip(crystals, volumes.tolist()):
+        crystal.volume_uc = volume
+
+
+def get_lattice_matrices(crystals : list[CrystalStructure]) -> np.ndarray:
+    lattice_params = [(*crystal.lengths.as_tuple(), *crystal.angles.as_tuple()) for crystal in crystals]
+    return make_lattice_matrices(lattice_params=np.array(lattice_params, dtype=np.float64).reshape(-1, 6))
+
+
+def pack_chunk(indexed_cells : list[tuple[int, SpglibCell]]) -> PackedChunk:
+    """Concatenates cells whose conversion from a crystal already succeeded"""
+    cells = [cell for _, cell in indexed_cells]
+    matrices = np.array([matrix for matrix, _, _ in cells], dtype=np.float64)
+    return PackedChunk(indices=[index for index, _ in indexed_cells], lattice_matrices=matrices,
+                       positions=np.concatenate([positions for _, positions, _ in cells]),
+                       numbers=np.concatenate([numbers for _, _, numbers in cells]),
+                       counts=np.array([len(numbers) for _, _, numbers in cells], dtype=np.int64))
+
+
+def analyze_chunk(chunk : PackedChunk, symprec : float, angle_tolerance : float) -> ChunkResults:
+    results = []
+    for index, cell in chunk.get_cells():
+        try:
+            results.append((index, analyze_cell(cell=cell, symprec=symprec, angle_tolerance=angle_tolerance), None))
+        except Exception as e:
+            results.append((index, None, f'{type(e).__name__}: {e}'))
+    return results
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+
+from CrystalStructure.crystal import CrystalStructure, ColumnarBase
+
+
+# ---------------------------------------------------------
+
+@dataclass
+class SiteColumns:
+    """Sites of several crystals concatenated in crystal order; counts holds the number of sites per crystal and
+    species indexes into species_table. NaN coords/occupancies encode None"""
+    counts : np.ndarray
+    coords : np.ndarray
+    occupancies : np.ndarray
+    species : np.ndarray
+    species_table : list[str]
+
+
+def gather_sites(crystals : Sequence[CrystalStructure]) -> SiteColumns:
+    """Fills preallocated columns in one pass: ColumnarBase columns are copied in as slices, the sites of other
+    bases are read once and written in bulk, without converting any base to a ColumnarBase"""
+    bases = [crystal.base for crystal in crystals]
+    counts = np.array([len(base) for base in bases], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(counts)]).tolist()
+    num_sites = offsets[-1]
+    coords = np.empty((num_sites, 3), dtype=np.float64)
+    occupancies = np.empty(num_sites, dtype=np.float64)
+    species = np.empty(num_sites, dtype=np.int64)
+
+    species_indices : dict[str, int] = {}
+    rows : list[int] = []
+    site_coords : list[tuple] = []
+    site_occupancies : list = []
+    site_species : list[int] = []
+    for base, start, stop in zip(bases, offsets[:-1], offsets[1:]):
+        if isinstance(base, ColumnarBase):
+            id_map = [species_indices.setdefault(species_str, len(species_indices)) for species_str in base.species_table]
+            species[start:stop] = np.array(id_map, dtype=np.int64)[base.species_ids]
+            coords[start:stop] = base.coords
+            occupancies[start:stop] = base.occupancies
+            continue
+        rows.extend(range(start, stop))
+        for site in base:
+            site_coords.append((site.x, site.y, site.z))
+            site_occupancies.append(site.occupancy)
+            site_species.append(species_indices.setdefault(site.species_str, len(species_indices)))
+
+    if rows:
+        coords[rows] = np.array(site_coords, dtype=np.float64)
+        occupancies[rows] = np.array(site_occupancies, dtype=np.float64)
+        species[rows] = site_species
+    return SiteColumns(counts=counts, coords=coords, occupancies=occupancies, species=species,
+                       species_table=list(species_indices))
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+
+from CrystalStructure.crystal import CrystalStructure
+from CrystalStructure.crystal.lattice import make_lattice_matrices
+from CrystalStructure.symmetry import SymmetryResult, analyze_cells
+
+
+# ---------------------------------------------------------
+
+def calculate_symmetries(crystals : Sequence[CrystalStructure], symprec : float = 0.1,
+                         angle_tolerance : float = 10) -> list[SymmetryResult]:
+    """Batched symmetry analysis: the lattice matrices of all crystals are built in one vectorized pass
+    and spglib is called on the resulting cells without constructing pymatgen objects"""
+    lattice_params = np.array([(*crystal.lengths.as_tuple(), *crystal.angles.as_tuple()) for crystal in crystals],
+                              dtype=np.float64).reshape(-1, 6)
+    lattice_matrices = make_lattice_matrices(lattice_params=lattice_params)
+    cells = (crystal.to_spglib_cell(lattice_matrix=matrix) for crystal, matrix in zip(crystals, lattice_matrices))
+    return analyze_cells(cells=cells, symprec=symprec, angle_tolerance=angle_tolerance)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+
+from CrystalStructure.crystal import CrystalStructure, AtomicSite
+from CrystalStructure.crystal.atomic_site import AtomType
+from .sites import gather_sites
+
+SITE_FEATURES = 12
+# ---------------------------------------------------------
+
+@dataclass
+class CrystalBatch:
+    """Padded tensor representation of several crystals:
+    - sites: (B, max_sites, 12) rows of a1, b1, a2, b2, a3, b3, a4, b4, x, y, z, occupancy as in AtomicSite.as_list
+    - mask: (B, max_sites) True where the row belongs to the crystal, False for padding
+    - lattice: (B, 6) rows of a, b, c, alpha, beta, gamma
+    - species: (B, max_sites) indices into species_table"""
+    sites : np.ndarray
+    mask : np.ndarray
+    lattice : np.ndarray
+    species : np.ndarray
+    species_table : list[str]
+
+    @property
+    def num_sites(self) -> np.ndarray:
+        return np.sum(self.mask, axis=1)
+
+    def __len__(self):
+        return len(self.sites)
+
+
+def make_batch(crystals : Sequence[CrystalStructure], max_sites : Optional[int] = None,
+               padding : str = AtomType.void_symbol, species_table : Optional[list[str]] = None) -> CrystalBatch:
+    """Pads the sites of all crystals to max_sites rows using void or placeholder sites.
+    Passing a species_table fixes the species indices across batches, otherwise a table is built from the batch.
+    The void and placeholder symbols always occupy indices 0 and 1 of a generated table"""
+    if padding == AtomType.void_symbol:
+        padding_site = AtomicSite.make_void()
+    elif padding == AtomType.placeholder_symbol:
+        padding_site = AtomicSite.make_placeholder()
+    else:
+        raise ValueError(f'Padding must be either the void symbol "{AtomType.void_symbol}" '
+                         f'or the placeholder symbol "{AtomType.placeholder_symbol}", got "{padding}"')
+
+    site_columns = gather_sites(crystals=crystals)
+    counts = site_columns.counts
+    if max_sites is None:
+        max_sites = int(counts.max()) if len(counts) > 0 else 0
+    if np.any(counts > max_sites):
+        raise ValueError(f'Crystal with {counts.max()} sites exceeds max_sites = {max_sites}')
+
+    fixed_table = not species_table is None
+    species_table = list(species_table) if fixed_table else [AtomType.void_symbol, AtomType.placeholder_symbol]
+    species_indices = {symbol : index for index, symbol in enumerate(species_table)}
+    for symbol in [padding] + site_columns.species_table:
+        if not symbol in species_indices:
+            if fixed_table:
+                raise ValueError(f'Species "{symbol}" is not contained in the provided species table')
+            species_indices[symbol] = len(species_table)
+            species_table.append(symbol)
+
+    id_map = np.array([species_indices[symbol] for symbol in site_columns.species_table], dtype=np.int64)
+    flat_species = id_map[site_columns.species]
+    flat_coords, flat_occupancies = site_columns.coords, site_columns.occupancies
+
+    batch_size = len(counts)
+    rows = np.repeat(np.arange(batch_size), counts)
+    cols = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    padding_row = np.array(padding_site.as_list(), dtype=np.float64)
+    sites = np.broadcast_to(padding_row, (batch_size, max_sites, SITE_FEATURES)).copy()
+    params_table = np.array([AtomType.intern(symbol=symbol).scattering_params for symbol in species_table], dtype=np.float64)
+    sites[rows, cols, :8] = params_table[flat_species].reshape(-1, 8)
+    sites[rows, cols, 8:11] = flat_coords
+    sites[rows, cols, 11] = flat_occupancies
+
+    mask = np.zeros((batch_size, max_sites), dtype=bool)
+    mask[rows, cols] = True
+    species = np.full((batch_size, max_sites), species_indices[padding], dtype=np.int64)
+    species[rows, cols] = flat_species
+
+    lattice = np.array([(*crystal.lengths.as_tuple(), *crystal.angles.as_tuple()) for crystal in crystals],
+                       dtype=np.float64).reshape(batch_size, 6)
+
+    return CrystalBatch(sites=sites, mask=mask, lattice=lattice, species=species, species_table=species_table)
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import Optional
+
+from CrystalStructure.io.convert import ConversionReport, convert_cifs
+
+# ---------------------------------------------------------
+
+def main(argv : Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='crystalstructure', description='Bulk operations on crystal structures')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert_parser = subparsers.add_parser('convert', help='Convert a directory, glob or tar archive of CIFs into '
+                                                           'a dataset file (.jsonl outputs are written as JSON lines)')
+    convert_parser.add_argument('source', help='Directory, glob pattern, tar archive or single CIF file')
+    convert_parser.add_argument('output', help='Output file; .jsonl, .jsonl.gz, ... for JSON lines, else a dataset')
+    convert_parser.add_argument('-j', '--workers', type=int, default=None,
+                                help='Number of worker processes (default: all cores, 0: no worker processes)')
+    convert_parser.add_argument('--properties', action='store_true', help='Calculate symmetry and volume properties')
+    convert_parser.add_argument('--standardize', action='store_true', help='Convert to the conventional standard cell')
+    convert_parser.add_argument('--density', type=float, default=None, help='Scale every crystal to this packing density')
+    convert_parser.add_argument('--checkpoint-every', type=int, default=1000,
+                                help='Number of CIFs between checkpoints an interrupted run resumes from')
+    convert_parser.add_argument('--failure-log', default=None,
+                                help='JSON lines file of the CIFs that failed (default: OUTPUT.failures.jsonl)')
+    convert_parser.add_argument('--restart', action='store_true', help='Discard the checkpoint of an earlier run')
+    convert_parser.add_argument('-q', '--quiet', action='store_true', help='Do not print progress')
+    args = parser.parse_args(argv)
+
+    progress_callback = None if args.quiet else print_progress
+    try:
+        report = convert_cifs(source=args.source, output_fpath=args.output, num_workers=args.workers,
+                              calculate_properties=args.properties, standardize=args.standardize,
+                              density=args.density, checkpoint_every=args.checkpoint_every,
+                              failure_log_fpath=args.failure_log, restart=args.restart,
+                              progress_callback=progress_callback)
+    except KeyboardInterrupt:
+        print('\nInterrupted; run the same command again to resume from the last checkpoint', file=sys.stderr)
+        return 130
+    except (ValueError, FileNotFoundError) as e:
+        print(f'\nError: {e}', file=sys.stderr)
+        return 2
+
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f'Wrote {report.written} crystals to {args.output}; {report.failed} CIFs failed')
+    return 0
+
+
+def print_progress(report : ConversionReport):
+    print(f'\r{report.processed} processed  {report.written} converted  {report.failed} failed  '
+          f'{report.throughput:.1f} structures/s', end='', file=sys.stderr, flush=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
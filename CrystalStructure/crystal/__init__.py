@@ -1,3 +1,5 @@
 from .crystal import CrystalStructure, CrystalSystem
-from .base import CrystalBase, AtomicSite
-from .lattice import Lengths, Angles
\ No newline at end of file
+from .base import CrystalBase, ColumnarBase, AtomicSite
+from .lattice import Lengths, Angles
+from .neighbors import NeighborList
+from .fingerprint import Fingerprint
\ No newline at end of file
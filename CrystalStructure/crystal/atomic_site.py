@@ -2,14 +2,17 @@ from __future__ import annotations
 
 import json
 from dataclasses import dataclass
-from typing import Optional
-
-from pymatgen.core import Species
-from pymatgen.util.typing import SpeciesLike
+from functools import cached_property, lru_cache
+from typing import Optional, TYPE_CHECKING
 
 from CrystalStructure.atomic_constants.atomic_constants import AtomicConstants
+from CrystalStructure.instrumentation import stage
 from holytools.abstract import Serializable
 
+if TYPE_CHECKING:
+    from pymatgen.core import Species
+    from pymatgen.util.typing import SpeciesLike
+
 ScatteringParams = tuple[float, float, float, float, float, float, float, float]
 #---------------------------------------------------------
 
@@ -25,7 +28,7 @@ class AtomicSite(Serializable):
     wyckoff_letter : Optional[str] = None
 
     def __post_init__(self):
-        self.atom_type : AtomType = AtomType(symbol=self.species_str)
+        self.atom_type : AtomType = AtomType.intern(symbol=self.species_str)
 
     @property
     def pymatgen_species(self) -> SpeciesLike:
@@ -33,7 +36,7 @@ class AtomicSite(Serializable):
 
     @property
     def element_symbol(self) -> str:
-        return self.pymatgen_species.element.symbol
+        return self.atom_type.element_symbol
 
     @classmethod
     def make_void(cls) -> AtomicSite:
@@ -82,19 +85,66 @@ class AtomicSite(Serializable):
 
 
 class AtomType:
+    """Species of an atomic site. Instances obtained via AtomType.intern are shared process-wide per symbol,
+    so the parsed pymatgen species and the per-species constants are only resolved once"""
     void_symbol = '⊥'
     placeholder_symbol = '*'
+    intern_cache_size = 4096
 
     def __init__(self, symbol : str):
         self.symbol : str = symbol
 
-    @property
+    @classmethod
+    def intern(cls, symbol : str) -> AtomType:
+        return _get_interned(cls, symbol)
+
+    def __reduce__(self):
+        # Unpickled atom types (e.g. results from worker processes) are interned again instead of copied
+        return _get_interned, (type(self), self.symbol)
+
+    @staticmethod
+    def cache_info():
+        """Hits, misses, maxsize and current size of the interning cache"""
+        return _get_interned.cache_info()
+
+    @staticmethod
+    def clear_cache():
+        _get_interned.cache_clear()
+
+    # ---------------------------------------------------------
+    # properties
+
+    @cached_property
+    def is_standard(self) -> bool:
+        return not self.symbol in [self.void_symbol, self.placeholder_symbol]
+
+    @cached_property
     def pymatgen_type(self) -> Optional[Species]:
-        is_standard = not self.symbol in [self.void_symbol, self.placeholder_symbol]
-        pymatgen_type = Species.from_str(species_string=self.symbol) if is_standard else None
+        if not self.is_standard:
+            return None
+        from pymatgen.core import Species
+        with stage(name='species.from_str'):
+            pymatgen_type = Species.from_str(species_string=self.symbol)
         return pymatgen_type
 
-    @property
+    @cached_property
+    def element_symbol(self) -> Optional[str]:
+        return self.pymatgen_type.element.symbol if self.is_standard else None
+
+    @cached_property
+    def constants_id(self) -> int:
+        """Row of the species in the AtomicConstants tables; the atomic number for elements and 0 for non-elements"""
+        return AtomicConstants.get_species_id(symbol=self.element_symbol) if self.is_standard else 0
+
+    @cached_property
+    def covalent_radius(self) -> Optional[float]:
+        return AtomicConstants.get_covalent(element_symbol=self.element_symbol) if self.is_standard else None
+
+    @cached_property
+    def vdw_radius(self) -> Optional[float]:
+        return AtomicConstants.get_vdw_radius(element_symbol=self.element_symbol) if self.is_standard else None
+
+    @cached_property
     def scattering_params(self) -> ScatteringParams:
         if self.symbol == self.void_symbol:
             values = (0.0, 0.0), (0.0, 0.0), (0.0, 0.0), (0.0, 0.0)
@@ -104,8 +154,12 @@ class AtomType:
         else:
             # TODO: This casting only currently exists beacuse the scattering param table only has values for (unoxidized) elements, not ions
             # TODO: Normally would simply be species_symbol=str(self.species_like)
-            species_symbol = self.pymatgen_type.element.symbol
-            values = AtomicConstants.get_scattering_params(species_symbol=species_symbol)
+            values = AtomicConstants.get_scattering_params(species_symbol=self.element_symbol)
 
         (a1, b1), (a2, b2), (a3, b3), (a4, b4) = values
         return a1, b1, a2, b2, a3, b3, a4, b4
+
+
+@lru_cache(maxsize=AtomType.intern_cache_size)
+def _get_interned(atom_type_cls : type[AtomType], symbol : str) -> AtomType:
+    return atom_type_cls(symbol=symbol)
@@ -4,30 +4,34 @@ import math
 import json
 from typing import Optional, Iterable
 
+import numpy as np
 from holytools.abstract import Serializable
 
 from CrystalStructure.atomic_constants import AtomicConstants
-from .atomic_site import AtomicSite
+from CrystalStructure.instrumentation import timed
+from .atomic_site import AtomicSite, AtomType
+from .binary import BaseColumns, Precision, pack_base, unpack_base, nan_if_none, none_if_nan
 
 
 # ---------------------------------------------------------
 
 class CrystalBase(Serializable):
+    """version is incremented whenever sites are added through append, extend or +=, which lets owners of the
+    base notice changes; in-place edits of the atomic_sites list are not counted"""
     def __init__(self, atomic_sites : Optional[list[AtomicSite]] = None):
         super().__init__()
+        self.version : int = 0
         if not atomic_sites is None:
             self.atomic_sites : list[AtomicSite] = atomic_sites
         else:
             self.atomic_sites : list[AtomicSite] = []
 
+    @timed(name='base.calculate_atomic_volume')
     def calculate_atomic_volume(self) -> float:
         total_atomic_volume = 0
         for site in self.get_non_void_sites():
-            element_symbol : str = site.element_symbol
-            covalent_radius  = AtomicConstants.get_covalent(element_symbol=element_symbol)
-            vdw_radius = AtomicConstants.get_vdw_radius(element_symbol=element_symbol)
-
-            radius = (covalent_radius + vdw_radius) / 2
+            atom_type = site.atom_type
+            radius = (atom_type.covalent_radius + atom_type.vdw_radius) / 2
             atomic_volume = 4 / 3 * math.pi * radius ** 3
             total_atomic_volume += atomic_volume * site.occupancy
 
@@ -46,11 +50,15 @@ class CrystalBase(Serializable):
 
         return wyckoff_symbols
 
+    def to_columnar(self) -> ColumnarBase:
+        return ColumnarBase.from_sites(atomic_sites=self)
+
     # ---------------------------------------------------------
     # list interface
 
     def append(self, item : AtomicSite):
         self.atomic_sites.append(item)
+        self.version += 1
 
     def __add__(self, other : list[AtomicSite]):
         new_base = CrystalBase()
@@ -77,13 +85,249 @@ class CrystalBase(Serializable):
     # ---------------------------------------------------------
     # save/load
 
+    @timed(name='base.to_bytes')
+    def to_bytes(self, precision : Precision = 'float64') -> bytes:
+        base = self.to_columnar()
+        columns = BaseColumns(coords=base.coords, occupancies=base.occupancies, species_ids=base.species_ids,
+                              species_table=base.species_table, wyckoff_letters=base.wyckoff_letters)
+        return pack_base(columns=columns, precision=precision)
+
+    @classmethod
+    @timed(name='base.from_bytes')
+    def from_bytes(cls, b : bytes) -> ColumnarBase:
+        columns, _ = unpack_base(buffer=b)
+        return ColumnarBase.from_columns(columns=columns)
+
     @classmethod
+    @timed(name='base.from_str')
     def from_str(cls, s: str):
         site_strs = json.loads(s)
         return cls([AtomicSite.from_str(site_str) for site_str in site_strs])
 
+    @timed(name='base.to_str')
     def to_str(self) -> str:
         return json.dumps([site.to_str() for site in self])
 
     def __str__(self):
-        return str([x for x in self])
\ No newline at end of file
+        return str([x for x in self])
+
+
+class ColumnarBase(CrystalBase):
+    """Struct-of-arrays variant of CrystalBase: coordinates, occupancies, interned species indices and wyckoff
+    letters are kept in contiguous numpy columns. AtomicSite objects are only built on demand when the base
+    is indexed or iterated, so they are copies: mutating them does not write back into the base, and atomic_sites
+    is a read-only tuple. Sites are added through append, extend or +=. The wyckoff letter column is a fixed-width
+    string array that is widened when a longer letter is added"""
+    _initial_capacity = 8
+
+    def __init__(self, atomic_sites : Optional[list[AtomicSite]] = None):
+        Serializable.__init__(self)
+        self.version : int = 0
+        self.species_table : list[str] = []
+        self._species_indices : dict[str, int] = {}
+        self._size : int = 0
+        self._allocate(capacity=self._initial_capacity)
+        if not atomic_sites is None:
+            self.extend(atomic_sites)
+
+    @classmethod
+    def from_arrays(cls, coords : np.ndarray, occupancies : np.ndarray, species_ids : np.ndarray,
+                    species_table : list[str], wyckoff_letters : Optional[np.ndarray] = None) -> ColumnarBase:
+        """Fills a base in bulk; species_ids index into species_table, NaN coords/occupancies encode None
+        and empty wyckoff letters encode missing ones"""
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+        num_sites = len(coords)
+        occupancies = np.asarray(occupancies, dtype=np.float64)
+        species_ids = np.asarray(species_ids, dtype=np.int32)
+        wyckoff_letters = to_letters([''] * num_sites if wyckoff_letters is None else wyckoff_letters)
+        if not len(occupancies) == len(species_ids) == len(wyckoff_letters) == num_sites:
+            raise ValueError(f'Column lengths do not match the number of coordinates ({num_sites})')
+        if num_sites > 0 and (species_ids.min() < 0 or species_ids.max() >= len(species_table)):
+            raise ValueError(f'Species ids must index into species table of length {len(species_table)}')
+
+        base = cls()
+        base._allocate(capacity=max(num_sites, cls._initial_capacity))
+        base._fit_letters(letters=wyckoff_letters)
+        base._coords[:num_sites] = coords
+        base._occupancies[:num_sites] = occupancies
+        base._species_ids[:num_sites] = species_ids
+        base._wyckoff_letters[:num_sites] = wyckoff_letters
+        base._size = num_sites
+        for symbol in species_table:
+            base._intern(symbol)
+        return base
+
+    @classmethod
+    def from_sites(cls, atomic_sites : Iterable[AtomicSite]) -> ColumnarBase:
+        atomic_sites = list(atomic_sites)
+        species_table = list(dict.fromkeys(site.species_str for site in atomic_sites))
+        species_indices = {species_str : index for index, species_str in enumerate(species_table)}
+
+        coords = np.array([(site.x, site.y, site.z) for site in atomic_sites], dtype=np.float64)
+        occupancies = np.array([site.occupancy for site in atomic_sites], dtype=np.float64)
+        species_ids = np.array([species_indices[site.species_str] for site in atomic_sites], dtype=np.int32)
+        wyckoff_letters = to_letters([site.wyckoff_letter or '' for site in atomic_sites])
+        return cls.from_arrays(coords=coords, occupancies=occupancies, species_ids=species_ids,
+                               species_table=species_table, wyckoff_letters=wyckoff_letters)
+
+    @classmethod
+    def from_columns(cls, columns : BaseColumns) -> ColumnarBase:
+        return cls.from_arrays(coords=columns.coords, occupancies=columns.occupancies, species_ids=columns.species_ids,
+                               species_table=columns.species_table, wyckoff_letters=columns.wyckoff_letters)
+
+    @timed(name='base.calculate_atomic_volume')
+    def calculate_atomic_volume(self) -> float:
+        atom_types = [AtomType.intern(symbol=species_str) for species_str in self.species_table]
+        is_standard = np.array([atom_type.is_standard for atom_type in atom_types], dtype=bool)
+        constants_ids = np.array([atom_type.constants_id for atom_type in atom_types], dtype=np.int64)
+        radii = (AtomicConstants.get_covalent_radii(constants_ids) + AtomicConstants.get_vdw_radii(constants_ids)) / 2
+        species_volumes = 4 / 3 * math.pi * radii ** 3
+        missing_radii = is_standard & np.isnan(species_volumes)
+        if np.any(missing_radii):
+            raise KeyError(f'No radii available for species {np.array(self.species_table)[missing_radii].tolist()}')
+
+        standard_mask = is_standard[self.species_ids]
+        site_volumes = species_volumes[self.species_ids[standard_mask]] * self.occupancies[standard_mask]
+        return float(np.sum(site_volumes))
+
+    def get_standard_mask(self) -> np.ndarray:
+        """Boolean mask of the sites that are neither void nor placeholder sites"""
+        is_standard = [AtomType.intern(symbol=species_str).is_standard for species_str in self.species_table]
+        return np.array(is_standard, dtype=bool)[self.species_ids]
+
+    def get_wyckoffs(self) -> list[str]:
+        if np.any(self.wyckoff_letters == ''):
+            raise ValueError('Wyckoff symbols are not defined for all sites')
+        return self.wyckoff_letters.tolist()
+
+    def to_columnar(self) -> ColumnarBase:
+        return self
+
+    # ---------------------------------------------------------
+    # columns
+
+    @property
+    def coords(self) -> np.ndarray:
+        return self._coords[:self._size]
+
+    @property
+    def occupancies(self) -> np.ndarray:
+        return self._occupancies[:self._size]
+
+    @property
+    def species_ids(self) -> np.ndarray:
+        return self._species_ids[:self._size]
+
+    @property
+    def wyckoff_letters(self) -> np.ndarray:
+        return self._wyckoff_letters[:self._size]
+
+    @property
+    def species_strs(self) -> list[str]:
+        return [self.species_table[species_id] for species_id in self.species_ids]
+
+    @property
+    def atomic_sites(self) -> tuple[AtomicSite, ...]:
+        return tuple(self)
+
+    # ---------------------------------------------------------
+    # list interface
+
+    def append(self, item : AtomicSite):
+        if self._size == len(self._coords):
+            self._allocate(capacity=2 * len(self._coords))
+        index = self._size
+        self._coords[index] = [nan_if_none(item.x), nan_if_none(item.y), nan_if_none(item.z)]
+        self._occupancies[index] = nan_if_none(item.occupancy)
+        self._species_ids[index] = self._intern(item.species_str)
+        letter = to_letters([item.wyckoff_letter or ''])
+        self._fit_letters(letters=letter)
+        self._wyckoff_letters[index] = letter[0]
+        self._size += 1
+        self.version += 1
+
+    def extend(self, other : Iterable[AtomicSite]):
+        if not isinstance(other, ColumnarBase):
+            other = ColumnarBase.from_sites(atomic_sites=other)
+
+        num_new = len(other)
+        required = self._size + num_new
+        if required > len(self._coords):
+            self._allocate(capacity=max(required, 2 * len(self._coords)))
+        id_map = np.array([self._intern(symbol) for symbol in other.species_table], dtype=np.int32)
+        new_slice = slice(self._size, required)
+        self._fit_letters(letters=other.wyckoff_letters)
+        self._coords[new_slice] = other.coords
+        self._occupancies[new_slice] = other.occupancies
+        self._species_ids[new_slice] = id_map[other.species_ids] if num_new > 0 else other.species_ids
+        self._wyckoff_letters[new_slice] = other.wyckoff_letters
+        self._size = required
+        self.version += 1
+
+    def __add__(self, other : list[AtomicSite]):
+        new_base = ColumnarBase()
+        new_base.extend(self)
+        new_base.extend(other)
+        return new_base
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __iter__(self) -> Iterable[AtomicSite]:
+        return (self._make_site(index) for index in range(self._size))
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self._make_site(index) for index in range(self._size)[item]]
+        if item < 0:
+            item += self._size
+        if not 0 <= item < self._size:
+            raise IndexError(f'Site index {item} out of range for base with {self._size} sites')
+        return self._make_site(item)
+
+    # ---------------------------------------------------------
+    # internal
+
+    def _allocate(self, capacity : int):
+        coords = np.full((capacity, 3), np.nan)
+        occupancies = np.full(capacity, np.nan)
+        species_ids = np.zeros(capacity, dtype=np.int32)
+        wyckoff_letters = np.full(capacity, '', dtype=getattr(self, '_wyckoff_letters', to_letters([])).dtype)
+        if self._size > 0:
+            coords[:self._size] = self.coords
+            occupancies[:self._size] = self.occupancies
+            species_ids[:self._size] = self.species_ids
+            wyckoff_letters[:self._size] = self.wyckoff_letters
+        self._coords, self._occupancies = coords, occupancies
+        self._species_ids, self._wyckoff_letters = species_ids, wyckoff_letters
+
+    def _intern(self, species_str : str) -> int:
+        species_id = self._species_indices.get(species_str)
+        if species_id is None:
+            species_id = len(self.species_table)
+            self.species_table.append(species_str)
+            self._species_indices[species_str] = species_id
+        return species_id
+
+    def _fit_letters(self, letters : np.ndarray):
+        if letters.dtype.itemsize > self._wyckoff_letters.dtype.itemsize:
+            self._wyckoff_letters = self._wyckoff_letters.astype(letters.dtype)
+
+    def _make_site(self, index : int) -> AtomicSite:
+        x, y, z = self._coords[index].tolist()
+        wyckoff_letter = str(self._wyckoff_letters[index]) or None
+        return AtomicSite(x=none_if_nan(x), y=none_if_nan(y), z=none_if_nan(z),
+                          occupancy=none_if_nan(float(self._occupancies[index])),
+                          species_str=self.species_table[self._species_ids[index]],
+                          wyckoff_letter=wyckoff_letter)
+
+
+
+def to_letters(wyckoff_letters : Iterable[str]) -> np.ndarray:
+    """Wyckoff letter column as wide as its longest letter, at least one character; '' marks a missing letter"""
+    letters = np.asarray(wyckoff_letters, dtype=str).reshape(-1)
+    return letters.astype(np.promote_types(letters.dtype, '<U1'))
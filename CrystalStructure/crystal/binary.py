@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import math
+import struct
+from dataclasses import dataclass
+from typing import Optional, Literal
+
+import numpy as np
+
+# Layout (little endian):
+# crystal: magic | version | precision | a b c alpha beta gamma | spacegroup | volume_uc | atomic_volume |
+#          crystal system code | wyckoff symbol count + utf-8 '\x1f' joined wyckoff symbols | base
+# base:    magic | version | precision | num sites | num species | wyckoff width W | species table |
+#          coords (N x 3) | occupancies (N) | species ids (N, uint16) | wyckoff letters (N x W, uint32 code points)
+# A wyckoff width of 0 means no wyckoff letters are stored
+# None is encoded as NaN for floats, -1 for integers and code 0 for the crystal system
+BASE_MAGIC = b'CSBB'
+CRYSTAL_MAGIC = b'CSBC'
+FORMAT_VERSION = 1
+Precision = Literal['float32', 'float64']
+PRECISIONS : tuple[str, ...] = ('float32', 'float64')
+CRYSTAL_SYSTEMS : tuple[str, ...] = ("cubic", "hexagonal", "monoclinic", "orthorhombic", "tetragonal", "triclinic", "trigonal")
+
+_PREAMBLE = struct.Struct('<4sBB')
+_BASE_HEADER = struct.Struct('<IHB')
+_CRYSTAL_HEADER = struct.Struct('<6diddBi')
+_LENGTH = struct.Struct('<H')
+_WYCKOFF_LENGTH = struct.Struct('<I')
+# ---------------------------------------------------------
+
+@dataclass
+class BaseColumns:
+    coords : np.ndarray
+    occupancies : np.ndarray
+    species_ids : np.ndarray
+    species_table : list[str]
+    wyckoff_letters : Optional[np.ndarray]
+
+
+@dataclass
+class CrystalFields:
+    lattice_params : tuple[Optional[float], ...]
+    spacegroup : Optional[int]
+    volume_uc : Optional[float]
+    atomic_volume : Optional[float]
+    crystal_system : Optional[str]
+    wyckoff_symbols : Optional[list[str]]
+
+
+def pack_base(columns : BaseColumns, precision : Precision = 'float64') -> bytes:
+    if not precision in PRECISIONS:
+        raise ValueError(f'Precision must be one of {PRECISIONS}, got {precision}')
+    if len(columns.species_table) > np.iinfo(np.uint16).max:
+        raise ValueError(f'Binary format supports at most {np.iinfo(np.uint16).max} distinct species per base')
+
+    num_sites = len(columns.species_ids)
+    has_wyckoffs = not columns.wyckoff_letters is None and bool(np.any(columns.wyckoff_letters != ''))
+    wyckoff_width = columns.wyckoff_letters.dtype.itemsize // 4 if has_wyckoffs else 0
+    if wyckoff_width > np.iinfo(np.uint8).max:
+        raise ValueError(f'Binary format supports wyckoff letters of at most {np.iinfo(np.uint8).max} characters')
+    parts = [_PREAMBLE.pack(BASE_MAGIC, FORMAT_VERSION, PRECISIONS.index(precision)),
+             _BASE_HEADER.pack(num_sites, len(columns.species_table), wyckoff_width)]
+    for species_str in columns.species_table:
+        encoded = species_str.encode('utf-8')
+        parts += [_LENGTH.pack(len(encoded)), encoded]
+
+    parts.append(np.ascontiguousarray(columns.coords, dtype=f'<{precision_code(precision)}').tobytes())
+    parts.append(np.ascontiguousarray(columns.occupancies, dtype=f'<{precision_code(precision)}').tobytes())
+    parts.append(np.ascontiguousarray(columns.species_ids, dtype='<u2').tobytes())
+    if has_wyckoffs:
+        parts.append(np.ascontiguousarray(columns.wyckoff_letters, dtype=f'<U{wyckoff_width}').view('<u4').tobytes())
+    return b''.join(parts)
+
+
+def unpack_base(buffer : bytes | memoryview, offset : int = 0) -> tuple[BaseColumns, int]:
+    """Decodes a base starting at offset and returns its columns together with the offset past its end.
+    Numeric columns are read-only views into buffer"""
+    precision, offset = _unpack_preamble(buffer=buffer, offset=offset, magic=BASE_MAGIC)
+    num_sites, num_species, wyckoff_width = _BASE_HEADER.unpack_from(buffer, offset)
+    offset += _BASE_HEADER.size
+
+    species_table = []
+    for _ in range(num_species):
+        (length,) = _LENGTH.unpack_from(buffer, offset)
+        offset += _LENGTH.size
+        species_table.append(bytes(buffer[offset:offset + length]).decode('utf-8'))
+        offset += length
+
+    float_dtype = np.dtype(f'<{precision_code(precision)}')
+    coords, offset = _read_array(buffer, offset, float_dtype, 3 * num_sites)
+    occupancies, offset = _read_array(buffer, offset, float_dtype, num_sites)
+    species_ids, offset = _read_array(buffer, offset, np.dtype('<u2'), num_sites)
+    wyckoff_letters = None
+    if wyckoff_width > 0:
+        code_points, offset = _read_array(buffer, offset, np.dtype('<u4'), num_sites * wyckoff_width)
+        wyckoff_letters = code_points.view(f'<U{wyckoff_width}')
+
+    columns = BaseColumns(coords=coords.reshape(num_sites, 3), occupancies=occupancies, species_ids=species_ids,
+                          species_table=species_table, wyckoff_letters=wyckoff_letters)
+    return columns, offset
+
+
+def pack_crystal(fields : CrystalFields, base_bytes : bytes, precision : Precision = 'float64') -> bytes:
+    wyckoff_symbols = fields.wyckoff_symbols
+    wyckoff_bytes = b'' if wyckoff_symbols is None else '\x1f'.join(wyckoff_symbols).encode('utf-8')
+    header = _CRYSTAL_HEADER.pack(*[nan_if_none(x) for x in fields.lattice_params],
+                                  -1 if fields.spacegroup is None else fields.spacegroup,
+                                  nan_if_none(fields.volume_uc), nan_if_none(fields.atomic_volume),
+                                  0 if fields.crystal_system is None else CRYSTAL_SYSTEMS.index(fields.crystal_system) + 1,
+                                  -1 if wyckoff_symbols is None else len(wyckoff_symbols))
+    preamble = _PREAMBLE.pack(CRYSTAL_MAGIC, FORMAT_VERSION, PRECISIONS.index(precision))
+    return b''.join([preamble, header, _WYCKOFF_LENGTH.pack(len(wyckoff_bytes)), wyckoff_bytes, base_bytes])
+
+
+def unpack_crystal(buffer : bytes | memoryview, offset : int = 0) -> tuple[CrystalFields, int]:
+    """Decodes the crystal fields starting at offset and returns them with the offset at which the base starts"""
+    _, offset = _unpack_preamble(buffer=buffer, offset=offset, magic=CRYSTAL_MAGIC)
+    *lattice_params, spacegroup, volume_uc, atomic_volume, system_code, num_wyckoffs = _CRYSTAL_HEADER.unpack_from(buffer, offset)
+    offset += _CRYSTAL_HEADER.size
+    (wyckoff_length,) = _WYCKOFF_LENGTH.unpack_from(buffer, offset)
+    offset += _WYCKOFF_LENGTH.size
+    wyckoff_str = bytes(buffer[offset:offset + wyckoff_length]).decode('utf-8')
+    offset += wyckoff_length
+
+    if num_wyckoffs < 0:
+        wyckoff_symbols = None
+    else:
+        wyckoff_symbols = wyckoff_str.split('\x1f') if num_wyckoffs > 0 else []
+
+    fields = CrystalFields(lattice_params=tuple(none_if_nan(x) for x in lattice_params),
+                           spacegroup=None if spacegroup < 0 else spacegroup,
+                           volume_uc=none_if_nan(volume_uc), atomic_volume=none_if_nan(atomic_volume),
+                           crystal_system=None if system_code == 0 else CRYSTAL_SYSTEMS[system_code - 1],
+                           wyckoff_symbols=wyckoff_symbols)
+    return fields, offset
+
+# ---------------------------------------------------------
+
+def precision_code(precision : str) -> str:
+    return 'f4' if precision == 'float32' else 'f8'
+
+def nan_if_none(value : Optional[float]) -> float:
+    return math.nan if value is None else value
+
+def none_if_nan(value : float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+def _unpack_preamble(buffer : bytes | memoryview, offset : int, magic : bytes) -> tuple[str, int]:
+    found_magic, version, precision_index = _PREAMBLE.unpack_from(buffer, offset)
+    if found_magic != magic:
+        raise ValueError(f'Invalid binary data: expected magic {magic!r}, got {found_magic!r}')
+    if version > FORMAT_VERSION:
+        raise ValueError(f'Binary format version {version} is newer than supported version {FORMAT_VERSION}')
+    return PRECISIONS[precision_index], offset + _PREAMBLE.size
+
+def _read_array(buffer : bytes | memoryview, offset : int, dtype : np.dtype, count : int) -> tuple[np.ndarray, int]:
+    array = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+    return array, offset + count * dtype.itemsize
@@ -0,0 +1,393 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import cmp_to_key, lru_cache
+from itertools import groupby
+from typing import Union, TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from pymatgen.core import Composition
+
+CifValue = Union[str, list[str]]
+SITE_TOLERANCE = 1e-4
+FRAC_TOLERANCE = 1e-4
+
+SYMOP_TAGS = ('_symmetry_equiv_pos_as_xyz', '_symmetry_equiv_pos_as_xyz_',
+              '_space_group_symop_operation_xyz', '_space_group_symop_operation_xyz_')
+MAGNETIC_PREFIXES = ('_space_group_magn', '_atom_site_moment', '_space_group_symop_magn')
+SPECIAL_SYMBOLS = ('Hw', 'Ow', 'Wat', 'wat', 'OH', 'OH2', 'NO3')
+# ---------------------------------------------------------
+
+class UnsupportedCifError(ValueError):
+    """Raised for CIF features the native parser does not handle; callers fall back to pymatgen"""
+
+
+@dataclass
+class CifSites:
+    """Expanded sites of a CIF in the order pymatgen's CifParser produces them: one row per (site, species)
+    pair, disordered sites contribute one row per species"""
+    lattice_params : tuple[float, float, float, float, float, float]
+    coords : np.ndarray
+    occupancies : np.ndarray
+    species_strs : list[str]
+
+
+def parse_simple_cif(cif_content : str) -> CifSites:
+    """Parses a single-block CIF with explicit cell parameters, a symmetry operation loop and an _atom_site loop
+    with fractional coordinates. Raises UnsupportedCifError for anything else"""
+    block = read_block(cif_content=cif_content)
+    if any(tag.startswith(prefix) for tag in block for prefix in MAGNETIC_PREFIXES):
+        raise UnsupportedCifError('Magnetic CIFs are not supported')
+
+    lattice_params = tuple(parse_float(get_scalar(block, f'_cell_{name}'))
+                           for name in ('length_a', 'length_b', 'length_c', 'angle_alpha', 'angle_beta', 'angle_gamma'))
+    rotations, translations = parse_symops(xyz_strs=get_symop_strs(block=block))
+    compositions, coords = collect_site_rows(block=block, rotations=rotations, translations=translations)
+    if not compositions:
+        raise UnsupportedCifError('CIF contains no sites')
+    if any(sum(composition.values()) > 1 for composition in compositions):
+        raise UnsupportedCifError('Site occupancies sum to more than 1')
+
+    group_compositions, group_coords = [], []
+    for composition, group in groupby(sorted(zip(compositions, range(len(coords))), key=lambda item: item[0]),
+                                      key=lambda item: item[0]):
+        row_coords = coords[[index for _, index in group]]
+        group_compositions.append(composition)
+        group_coords.append(expand_coords(coords=row_coords, rotations=rotations, translations=translations))
+
+    group_ranks = rank_compositions(compositions=group_compositions)
+    site_groups = np.repeat(np.arange(len(group_coords)), [len(group) for group in group_coords])
+    order = np.argsort(group_ranks[site_groups], kind='stable')
+    site_coords = np.concatenate(group_coords)[order]
+    site_groups = site_groups[order]
+
+    group_species = [to_species_strs(composition=composition) for composition in group_compositions]
+    species_counts = np.array([len(species) for species in group_species])
+    group_occupancies = [np.array(list(composition.values()), dtype=np.float64) for composition in group_compositions]
+    species_strs = [species_str for group in site_groups.tolist() for species_str in group_species[group]]
+    occupancies = np.concatenate([group_occupancies[group] for group in site_groups.tolist()])
+
+    return CifSites(lattice_params=lattice_params, coords=np.repeat(site_coords, species_counts[site_groups], axis=0),
+                    occupancies=occupancies, species_strs=species_strs)
+
+# ---------------------------------------------------------
+# tokenizing
+
+_TOKEN_PATTERN = re.compile(r"""'(.*?)'(?=\s|$)|"(.*?)"(?=\s|$)|(#.*)|(\S+)""")
+
+
+def tokenize(cif_content : str) -> list[tuple[str, bool]]:
+    """Splits CIF content into (token, is_quoted) pairs; comments are dropped and semicolon text fields
+    become single quoted tokens"""
+    tokens = []
+    lines = cif_content.splitlines()
+    line_index = 0
+    while line_index < len(lines):
+        line = lines[line_index]
+        line_index += 1
+        if line.startswith(';'):
+            text_lines = [line[1:]]
+            while line_index < len(lines) and not lines[line_index].startswith(';'):
+                text_lines.append(lines[line_index])
+                line_index += 1
+            if line_index == len(lines):
+                raise UnsupportedCifError('Unterminated text field')
+            line_index += 1
+            tokens.append(('\n'.join(text_lines).strip(), True))
+            continue
+
+        for match in _TOKEN_PATTERN.finditer(line):
+            single_quoted, double_quoted, comment, bare = match.groups()
+            if comment is not None:
+                break
+            if bare is None:
+                tokens.append((single_quoted if single_quoted is not None else double_quoted, True))
+            else:
+                tokens.append((bare, False))
+    return tokens
+
+
+def read_block(cif_content : str) -> dict[str, CifValue]:
+    """Maps tags to values (scalars) or lists of values (loop columns) for the single data block of the CIF"""
+    block : dict[str, CifValue] = {}
+    tokens = tokenize(cif_content=cif_content)
+    num_blocks = 0
+    index = 0
+    while index < len(tokens):
+        token, is_quoted = tokens[index]
+        lowered = token.lower()
+        if is_quoted:
+            raise UnsupportedCifError(f'Unexpected value {token!r}')
+        if lowered.startswith('data_'):
+            num_blocks += 1
+            if num_blocks > 1:
+                raise UnsupportedCifError('Only single block CIFs are supported')
+            index += 1
+        elif lowered.startswith(('save_', 'global_', 'stop_')):
+            raise UnsupportedCifError(f'Unsupported CIF construct {token!r}')
+        elif lowered == 'loop_':
+            index = read_loop(tokens=tokens, start=index + 1, block=block)
+        elif token.startswith('_'):
+            if index + 1 >= len(tokens):
+                raise UnsupportedCifError(f'Tag {token} has no value')
+            block[token] = tokens[index + 1][0]
+            index += 2
+        else:
+            raise UnsupportedCifError(f'Unexpected token {token!r}')
+
+    if num_blocks == 0:
+        raise UnsupportedCifError('CIF has no data block')
+    return block
+
+
+def read_loop(tokens : list[tuple[str, bool]], start : int, block : dict[str, CifValue]) -> int:
+    index = start
+    tags = []
+    while index < len(tokens) and not tokens[index][1] and tokens[index][0].startswith('_'):
+        tags.append(tokens[index][0])
+        index += 1
+
+    values = []
+    while index < len(tokens):
+        token, is_quoted = tokens[index]
+        if not is_quoted and (token.startswith('_') or token.lower() == 'loop_' or token.lower().startswith('data_')):
+            break
+        values.append(token)
+        index += 1
+
+    if not tags or len(values) % len(tags) != 0:
+        raise UnsupportedCifError(f'Malformed loop with tags {tags}')
+    for column, tag in enumerate(tags):
+        block[tag] = values[column::len(tags)]
+    return index
+
+# ---------------------------------------------------------
+# values
+
+def get_scalar(block : dict[str, CifValue], tag : str) -> str:
+    value = block.get(tag)
+    if value is None:
+        raise UnsupportedCifError(f'Missing {tag}')
+    if isinstance(value, list):
+        if len(value) != 1:
+            raise UnsupportedCifError(f'Expected a single value for {tag}')
+        value = value[0]
+    return value
+
+
+def get_column(block : dict[str, CifValue], tag : str) -> list[str]:
+    value = block[tag]
+    return value if isinstance(value, list) else [value]
+
+
+def parse_float(text : str) -> float:
+    """Strips standard uncertainties such as 4.0809(4); a lone '.' counts as 0"""
+    try:
+        return float(re.sub(r"\(.+\)*", "", text))
+    except ValueError:
+        if text.strip() == '.':
+            return 0.
+        raise
+
+
+def parse_fractional(text : str) -> float:
+    """Like parse_float but snaps finite precision thirds (0.3333, 0.6667) to their exact values"""
+    value = parse_float(text)
+    for fraction in (1 / 3, 2 / 3):
+        if abs(value / fraction - 1) <= FRAC_TOLERANCE:
+            return fraction
+    return value
+
+# ---------------------------------------------------------
+# symmetry
+
+_ROTATION_PATTERN = re.compile(r"([+-]?)([\d.]*)/?([\d.]*)([x-z])")
+_TRANSLATION_PATTERN = re.compile(r"([+-]?)([\d.]+)/?([\d.]*)(?![x-z])")
+
+
+def get_symop_strs(block : dict[str, CifValue]) -> list[str]:
+    for tag in SYMOP_TAGS:
+        if block.get(tag):
+            return get_column(block, tag)
+    raise UnsupportedCifError('CIF has no explicit symmetry operations')
+
+
+def parse_symops(xyz_strs : list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Parses operations like '-y+1/2, x-y, z' into rotations of shape (K,3,3) and translations of shape (K,3).
+    Results are cached since CIFs of the same space group repeat the same operation lists; the returned
+    arrays are read-only"""
+    return _parse_symops(tuple(xyz_strs))
+
+
+@lru_cache(maxsize=1024)
+def _parse_symops(xyz_strs : tuple[str, ...]) -> tuple[np.ndarray, np.ndarray]:
+    rotations = np.zeros((len(xyz_strs), 3, 3))
+    translations = np.zeros((len(xyz_strs), 3))
+    for op_index, xyz_str in enumerate(xyz_strs):
+        components = xyz_str.strip().replace(' ', '').lower().split(',')
+        if len(components) != 3:
+            raise UnsupportedCifError(f'Cannot parse symmetry operation {xyz_str!r}')
+        for row, component in enumerate(components):
+            for match in _ROTATION_PATTERN.finditer(component):
+                factor = -1. if match[1] == '-' else 1.
+                if match[2]:
+                    factor *= float(match[2]) / float(match[3]) if match[3] else float(match[2])
+                rotations[op_index, row, ord(match[4]) - ord('x')] = factor
+            for match in _TRANSLATION_PATTERN.finditer(component):
+                sign = -1. if match[1] == '-' else 1.
+                translations[op_index, row] = sign * (float(match[2]) / float(match[3]) if match[3] else float(match[2]))
+    rotations.flags.writeable = False
+    translations.flags.writeable = False
+    return rotations, translations
+
+
+def apply_symops(coord : np.ndarray, rotations : np.ndarray, translations : np.ndarray) -> np.ndarray:
+    return np.einsum('kij,j->ki', rotations, coord) + translations
+
+
+def pbc_matches(coords : np.ndarray, others : np.ndarray) -> np.ndarray:
+    """(len(coords), len(others)) mask of coordinate pairs that coincide up to lattice translations"""
+    diff = coords[:, None, :] - others[None, :, :]
+    diff -= np.round(diff)
+    return np.all(np.abs(diff) < SITE_TOLERANCE, axis=-1)
+
+
+def expand_coords(coords : np.ndarray, rotations : np.ndarray, translations : np.ndarray) -> np.ndarray:
+    """Symmetry images of coords wrapped into [0,1), keeping the first occurrence of every position. Images of
+    one coordinate only ever coincide up to rounding errors, so matching is treated as transitive"""
+    kept = np.empty((0, 3))
+    for coord in coords:
+        images = apply_symops(coord, rotations, translations)
+        images -= np.floor(images)
+        is_new = ~pbc_matches(images, kept).any(axis=1)
+        is_repeat = np.tril(pbc_matches(images, images), k=-1).any(axis=1)
+        kept = np.concatenate([kept, images[is_new & ~is_repeat]])
+    return kept
+
+# ---------------------------------------------------------
+# sites
+
+def collect_site_rows(block : dict[str, CifValue], rotations : np.ndarray,
+                      translations : np.ndarray) -> tuple[list[Composition], np.ndarray]:
+    """Compositions and coordinates of the _atom_site rows; rows that are symmetry equivalent to an earlier row
+    are merged into its composition"""
+    from pymatgen.core import Composition, Element, Species
+
+    labels = get_column(block, '_atom_site_label')
+    has_type_symbols = '_atom_site_type_symbol' in block
+    symbols = get_column(block, '_atom_site_type_symbol') if has_type_symbols else labels
+    if any(' + ' in symbol for symbol in symbols):
+        raise UnsupportedCifError('Pauling file style mixed site symbols are not supported')
+    columns = [get_column(block, f'_atom_site_fract_{axis}') for axis in 'xyz']
+    occupancy_column = get_column(block, '_atom_site_occupancy') if '_atom_site_occupancy' in block else None
+    oxidation_states = parse_oxidation_states(block=block)
+
+    compositions : list[Composition] = []
+    coords : list[np.ndarray] = []
+    for index, raw_symbol in enumerate(symbols):
+        element_symbol = parse_element_symbol(raw_symbol)
+        if oxidation_states is None:
+            species = Element(element_symbol)
+        else:
+            oxidation_state = oxidation_states.get(element_symbol, 0)
+            if has_type_symbols:
+                oxidation_state = oxidation_states.get(raw_symbol, oxidation_state)
+            species = Species(element_symbol, oxidation_state)
+
+        try:
+            occupancy = parse_float(occupancy_column[index]) if occupancy_column else 1
+        except ValueError:
+            occupancy = 1
+        if occupancy <= 0:
+            continue
+
+        coord = np.array([parse_fractional(column[index]) for column in columns])
+        composition = Composition({species: max(occupancy, 1e-8)})
+        match = None
+        if coords:
+            images = apply_symops(coord, rotations, translations)
+            matches = pbc_matches(images, np.array(coords))
+            matching_ops = np.flatnonzero(matches.any(axis=1))
+            if len(matching_ops) > 0:
+                match = int(np.argmax(matches[matching_ops[0]]))
+        if match is None:
+            compositions.append(composition)
+            coords.append(coord)
+        else:
+            compositions[match] = compositions[match] + composition
+
+    return compositions, np.array(coords).reshape(-1, 3)
+
+
+def parse_element_symbol(symbol : str) -> str:
+    """Element of an _atom_site type symbol or label such as 'Al0+' or 'O1'"""
+    from pymatgen.core import Element
+
+    if re.match('|'.join(SPECIAL_SYMBOLS), symbol):
+        raise UnsupportedCifError(f'Special symbol {symbol!r} is not supported')
+    if Element.is_valid_symbol(symbol[:2].title()):
+        element_symbol = symbol[:2].title()
+    elif symbol and Element.is_valid_symbol(symbol[0].upper()):
+        element_symbol = symbol[0].upper()
+    else:
+        raise UnsupportedCifError(f'Cannot determine element of {symbol!r}')
+    if not symbol.startswith(element_symbol):
+        raise UnsupportedCifError(f'Ambiguous element symbol {symbol!r}')
+    return element_symbol
+
+
+def parse_oxidation_states(block : dict[str, CifValue]) -> dict[str, float] | None:
+    if not ('_atom_type_symbol' in block and '_atom_type_oxidation_number' in block):
+        return None
+    type_symbols = get_column(block, '_atom_type_symbol')
+    oxidation_numbers = get_column(block, '_atom_type_oxidation_number')
+    try:
+        oxidation_states = {symbol : parse_float(number) for symbol, number in zip(type_symbols, oxidation_numbers)}
+        for symbol, number in zip(type_symbols, oxidation_numbers):
+            oxidation_states[re.sub(r"\d?[+,\-]?$", "", symbol)] = parse_float(number)
+    except ValueError:
+        return None
+    return oxidation_states
+
+
+def to_species_strs(composition : Composition) -> list[str]:
+    """Species strings as written by CrystalStructure.from_pymatgen, where elements get oxidation state 0"""
+    from pymatgen.core import Element, Species
+
+    species_strs = []
+    for species in composition:
+        if isinstance(species, Element):
+            species = Species(symbol=species.symbol, oxidation_state=0)
+        species_strs.append(str(species))
+    return species_strs
+
+
+def rank_compositions(compositions : list[Composition]) -> np.ndarray:
+    """Ranks of the site compositions in the order of Structure.get_sorted_structure: by average electronegativity,
+    then by species string. Equal keys share a rank so that a stable sort by rank reproduces the site order"""
+    electronegativities = [composition.average_electroneg for composition in compositions]
+    species_strings = [get_species_string(composition) for composition in compositions]
+
+    def compare(first : int, second : int) -> int:
+        if electronegativities[first] < electronegativities[second]:
+            return -1
+        if electronegativities[first] > electronegativities[second]:
+            return 1
+        string_first, string_second = species_strings[first], species_strings[second]
+        return -1 if string_first < string_second else (1 if string_second < string_first else 0)
+
+    ranks = np.zeros(len(compositions), dtype=np.int64)
+    ordered = sorted(range(len(compositions)), key=cmp_to_key(compare))
+    for position in range(1, len(ordered)):
+        is_tied = compare(ordered[position - 1], ordered[position]) == 0
+        ranks[ordered[position]] = ranks[ordered[position - 1]] + (0 if is_tied else 1)
+    return ranks
+
+
+def get_species_string(composition : Composition) -> str:
+    if len(composition) == 1 and composition.num_atoms == 1:
+        return str(next(iter(composition)))
+    return ', '.join(f'{species}:{composition[species]:.3}' for species in sorted(composition))
@@ -1,111 +1,352 @@
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass, asdict
-from typing import Optional, Literal
+from dataclasses import dataclass, asdict, fields, is_dataclass
+from functools import lru_cache
+from logging import Logger
+from typing import Optional, Literal, TYPE_CHECKING
 
 import numpy as np
 from holytools.abstract import JsonDataclass
-from pymatgen.core import Structure, Lattice, Species, Element
-from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
-from pymatgen.symmetry.groups import SpaceGroup
 
-from holytools.logging import LoggerFactory
-from .atomic_site import AtomicSite
-from .base import CrystalBase
-from .lattice import Angles, Lengths
+from CrystalStructure.instrumentation import stage, timed
+from CrystalStructure.symmetry import SymmetryCache, SymmetryResult, SpglibCell, analyze_cell, get_symmetry_operations
+from .atomic_site import AtomicSite, AtomType
+from .base import CrystalBase, ColumnarBase
+from .cif_parser import CifSites, UnsupportedCifError, parse_simple_cif
+from .binary import CrystalFields, Precision, pack_crystal, unpack_crystal, unpack_base
+from .derived import DerivedProperty
+from .fingerprint import Fingerprint, make_fingerprint
+from .lattice import Angles, Lengths, make_lattice_matrices
+from .neighbors import NeighborList
+from .transform import expand_base, make_supercell_base
+
+if TYPE_CHECKING:
+    from pymatgen.core import Structure, Species
+    from pymatgen.util.typing import SpeciesLike
 
-logger = LoggerFactory.get_logger(name=__name__)
 CrystalSystem = Literal["cubic", "hexagonal", "monoclinic", "orthorhombic", "tetragonal", "triclinic", "trigonal"]
+
+DERIVED_FIELDS = ('spacegroup', 'volume_uc', 'atomic_volume', 'wyckoff_symbols', 'crystal_system')
+SYMMETRY_FIELDS = ('spacegroup', 'wyckoff_symbols', 'crystal_system')
 # ---------------------------------------------------------
 
 @dataclass
 class CrystalStructure(JsonDataclass):
+    """Derived fields are stored values, None where unknown. volume_uc and atomic_volume are cheap and computed
+    on first read. spacegroup, wyckoff_symbols and crystal_system come from one symmetry analysis and are only
+    computed on request by calculate_properties or get_cached(name, calculate=True). Computed and assigned values
+    are reset to None once lengths, angles or base are reassigned or the base is extended"""
     lengths : Lengths
     angles : Angles
     base : CrystalBase
-    spacegroup : Optional[int] = None
-    volume_uc : Optional[float] = None
-    atomic_volume: Optional[float] = None
-    wyckoff_symbols : Optional[list[str]] = None
-    crystal_system : Optional[str] = None
+    spacegroup : Optional[int] = DerivedProperty(calculate='_calculate_symmetry')
+    volume_uc : Optional[float] = DerivedProperty(calculate='_calculate_volume_uc', lazy=True)
+    atomic_volume: Optional[float] = DerivedProperty(calculate='_calculate_atomic_volume', lazy=True)
+    wyckoff_symbols : Optional[list[str]] = DerivedProperty(calculate='_calculate_symmetry')
+    crystal_system : Optional[str] = DerivedProperty(calculate='_calculate_symmetry')
 
     @classmethod
-    def from_cif(cls, cif_content : str) -> CrystalStructure:
-        pymatgen_structure = Structure.from_str(cif_content, fmt='cif')
-        crystal_structure = cls.from_pymatgen(pymatgen_structure)
+    @timed(name='crystal.from_cif')
+    def from_cif(cls, cif_content : str, use_native_parser : bool = True, columnar : bool = False) -> CrystalStructure:
+        """Simple CIFs (one block, explicit cell, symmetry operations and fractional _atom_site loop) are read by
+        the native parser; everything else, or use_native_parser=False, goes through pymatgen. columnar=True
+        keeps the sites in a ColumnarBase instead of a CrystalBase"""
+        if use_native_parser:
+            try:
+                with stage(name='cif.parse_native'):
+                    cif_sites = parse_simple_cif(cif_content=cif_content)
+                return cls._from_cif_sites(cif_sites=cif_sites, columnar=columnar)
+            except UnsupportedCifError as e:
+                get_logger().debug(msg=f'Falling back to pymatgen CIF parser: {e}')
+            except (ValueError, KeyError, IndexError) as e:
+                get_logger().debug(msg=f'Native CIF parser failed, falling back to pymatgen: {e}')
+
+        from pymatgen.core import Structure
+        with stage(name='cif.parse_pymatgen'):
+            pymatgen_structure = Structure.from_str(cif_content, fmt='cif')
+        crystal_structure = cls.from_pymatgen(pymatgen_structure, columnar=columnar)
         return crystal_structure
 
     @classmethod
-    def from_pymatgen(cls, pymatgen_structure: Structure) -> CrystalStructure:
+    def _from_cif_sites(cls, cif_sites : CifSites, columnar : bool = False) -> CrystalStructure:
+        from pymatgen.core import Lattice
+        lattice = Lattice.from_parameters(*cif_sites.lattice_params)
+        species_table = list(dict.fromkeys(cif_sites.species_strs))
+        species_indices = {species_str : index for index, species_str in enumerate(species_table)}
+        species_ids = np.array([species_indices[species_str] for species_str in cif_sites.species_strs], dtype=np.int32)
+        base = ColumnarBase.from_arrays(coords=cif_sites.coords, occupancies=cif_sites.occupancies,
+                                        species_ids=species_ids, species_table=species_table)
+
+        return cls(lengths=Lengths(a=lattice.a, b=lattice.b, c=lattice.c),
+                   angles=Angles(alpha=lattice.alpha, beta=lattice.beta, gamma=lattice.gamma),
+                   base=base if columnar else CrystalBase(list(base)))
+
+    @classmethod
+    @timed(name='crystal.from_pymatgen')
+    def from_pymatgen(cls, pymatgen_structure: Structure, columnar : bool = False) -> CrystalStructure:
+        """Sites with several species (disordered sites) are expanded into one AtomicSite per species.
+        Site compositions are resolved once per distinct composition and the base is filled in bulk; columnar=True
+        keeps it as a ColumnarBase instead of converting it into a CrystalBase"""
         lattice = pymatgen_structure.lattice
-        base : CrystalBase = CrystalBase()
+        compositions = pymatgen_structure.species_and_occu
 
-        for index, site in enumerate(pymatgen_structure.sites):
-            site_composition = site.species
-            for species, occupancy in site_composition.items():
-                if isinstance(species, Element):
-                    species = Species(symbol=species.symbol, oxidation_state=0)
-                x,y,z = lattice.get_fractional_coords(site.coords)
-                atomic_site = AtomicSite(x, y, z, occupancy=occupancy, species_str=str(species))
-                base.append(atomic_site)
+        composition_indices : dict[int, int] = {}
+        composition_species : list[list[str]] = []
+        composition_occupancies : list[list[float]] = []
+        site_compositions = np.empty(len(compositions), dtype=np.int64)
+        for site_index, composition in enumerate(compositions):
+            composition_index = composition_indices.get(id(composition))
+            if composition_index is None:
+                composition_index = len(composition_species)
+                composition_indices[id(composition)] = composition_index
+                composition_species.append([get_species_str(species) for species in composition])
+                composition_occupancies.append(list(composition.values()))
+            site_compositions[site_index] = composition_index
+
+        species_table = list(dict.fromkeys(species_str for species_strs in composition_species for species_str in species_strs))
+        species_indices = {species_str : index for index, species_str in enumerate(species_table)}
+        flat_species_ids = np.array([species_indices[species_str] for species_strs in composition_species
+                                     for species_str in species_strs], dtype=np.int32)
+        flat_occupancies = np.array([occupancy for occupancies in composition_occupancies for occupancy in occupancies],
+                                    dtype=np.float64)
+        species_counts = np.array([len(species_strs) for species_strs in composition_species], dtype=np.int64)
+        composition_starts = np.cumsum(species_counts) - species_counts
+
+        site_counts = species_counts[site_compositions]
+        row_starts = np.repeat(np.cumsum(site_counts) - site_counts, site_counts)
+        flat_indices = np.repeat(composition_starts[site_compositions], site_counts) + np.arange(len(row_starts)) - row_starts
+        coords = np.repeat(pymatgen_structure.frac_coords.reshape(-1, 3), site_counts, axis=0)
+        base = ColumnarBase.from_arrays(coords=coords, occupancies=flat_occupancies[flat_indices],
+                                        species_ids=flat_species_ids[flat_indices], species_table=species_table)
 
         crystal_str = cls(lengths=Lengths(a=lattice.a, b=lattice.b, c=lattice.c),
                           angles=Angles(alpha=lattice.alpha, beta=lattice.beta, gamma=lattice.gamma),
-                          base=base)
+                          base=base if columnar else CrystalBase(list(base)))
 
         return crystal_str
 
     # ---------------------------------------------------------
     # properties
 
-    def calculate_properties(self):
+    @timed(name='crystal.calculate_properties')
+    def calculate_properties(self, symprec : float = 0.1, angle_tolerance : float = 10, use_cache : bool = True):
+        """Eagerly computes volume_uc and the symmetry fields with the given tolerances. Symmetry results are looked
+        up in the default SymmetryCache before running spglib directly on the cell returned by to_spglib_cell"""
         if len(self.base) == 0:
-            logger.error(msg=f'Base is empty! Cannot calculate properties of empty crystal. Aborting ...')
+            get_logger().error(msg=f'Base is empty! Cannot calculate properties of empty crystal. Aborting ...')
             return
 
-        pymatgen_structure = self.to_pymatgen()
-        self.volume_uc = pymatgen_structure.volume
-        analyzer = SpacegroupAnalyzer(structure=pymatgen_structure, symprec=0.1, angle_tolerance=10)
-        self.spacegroup = analyzer.get_space_group_number()
+        self._calculate_volume_uc()
+        result = self._get_symmetry(symprec=symprec, angle_tolerance=angle_tolerance, use_cache=use_cache)
+        self.spacegroup = result.spacegroup
+        self.wyckoff_symbols = list(result.wyckoff_symbols)
+        self.crystal_system = result.crystal_system
+
+    def _get_symmetry(self, symprec : float, angle_tolerance : float, use_cache : bool) -> SymmetryResult:
+        cache = SymmetryCache.get_default()
+        key, result = None, None
+        if use_cache:
+            key = self.make_symmetry_key(symprec=symprec, angle_tolerance=angle_tolerance)
+            result = cache.get(key=key)
 
-        symmetry_dataset = analyzer.get_symmetry_dataset()
-        self.wyckoff_symbols = symmetry_dataset['wyckoffs']
+        if result is None:
+            result = self._analyze_symmetry(symprec=symprec, angle_tolerance=angle_tolerance)
+            if use_cache:
+                cache.put(key=key, result=result)
+        return result
 
-        pymatgen_spacegroup = SpaceGroup.from_int_number(self.spacegroup)
-        self.crystal_system = pymatgen_spacegroup.crystal_system
+    def make_symmetry_key(self, symprec : float, angle_tolerance : float) -> str:
+        base = self.base.to_columnar()
+        standard_mask = base.get_standard_mask()
+        species_strs = [base.species_table[species_id] for species_id in base.species_ids[standard_mask]]
+        lattice_params = (*self.lengths.as_tuple(), *self.angles.as_tuple())
+        return SymmetryCache.get_default().make_key(lattice_params=lattice_params, species_strs=species_strs,
+                                                    coords=base.coords[standard_mask], symprec=symprec,
+                                                    angle_tolerance=angle_tolerance)
 
+    def _analyze_symmetry(self, symprec : float, angle_tolerance : float) -> SymmetryResult:
+        return analyze_cell(cell=self.to_spglib_cell(), symprec=symprec, angle_tolerance=angle_tolerance)
 
     def get_standardized(self) -> CrystalStructure:
-        analzyer = SpacegroupAnalyzer(self.to_pymatgen())
-        standardized_pymatgen = analzyer.get_conventional_standard_structure()
+        from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
+        pymatgen_structure = self._get_pymatgen()
+        with stage(name='symmetry.spacegroup_analyzer'):
+            analzyer = SpacegroupAnalyzer(pymatgen_structure)
+            standardized_pymatgen = analzyer.get_conventional_standard_structure()
         return CrystalStructure.from_pymatgen(pymatgen_structure=standardized_pymatgen)
 
+    def expand_symmetry(self, spacegroup : Optional[int] = None, hall_number : Optional[int] = None) -> CrystalStructure:
+        """Treats the base as an asymmetric unit and returns the crystal with the full orbit of every site under
+        the operations of the space group in the setting given by hall_number, see get_symmetry_operations.
+        Defaults to the spacegroup of the crystal. Derived fields of the result are unknown"""
+        if spacegroup is None and hall_number is None:
+            spacegroup = self.get_cached('spacegroup')
+            if spacegroup is None:
+                raise ValueError('No spacegroup given and none assigned to the crystal')
+        rotations, translations = get_symmetry_operations(spacegroup=spacegroup, hall_number=hall_number)
+        base = expand_base(base=self.base.to_columnar(), rotations=rotations, translations=translations)
+        lengths, angles = Lengths(*self.lengths.as_tuple()), Angles(*self.angles.as_tuple())
+        return CrystalStructure(lengths=lengths, angles=angles, base=base)
+
+    def make_supercell(self, scaling : int | tuple[int, int, int]) -> CrystalStructure:
+        """Diagonal supercell repeating the cell scaling times along every lattice vector, or scaling[i] times along
+        the i-th one. Sites keep their species, occupancies and wyckoff letters"""
+        scaling = tuple(int(repetitions) for repetitions in np.broadcast_to(scaling, (3,)))
+        if min(scaling) < 1:
+            raise ValueError(f'Supercell scaling must be positive, got {scaling}')
+        base = make_supercell_base(base=self.base.to_columnar(), scaling=scaling)
+        lengths = Lengths(a=self.lengths.a * scaling[0], b=self.lengths.b * scaling[1], c=self.lengths.c * scaling[2])
+        return CrystalStructure(lengths=lengths, angles=Angles(*self.angles.as_tuple()), base=base)
+
     def scale(self, target_density: float):
+        """Isotropic rescaling keeps the symmetry fields and atomic_volume; volume_uc is rescaled"""
         volume_scaling = self.packing_density / target_density
-        cbrt_scaling = volume_scaling ** (1 / 3)
+        self.rescale_lengths(cbrt_scaling=volume_scaling ** (1 / 3), volume_uc=self.volume_uc * volume_scaling,
+                             atomic_volume=self.atomic_volume)
+
+    def rescale_lengths(self, cbrt_scaling : float, volume_uc : Optional[float], atomic_volume : Optional[float]):
+        """Multiplies the lengths by cbrt_scaling and stores the given volumes. The symmetry fields are carried
+        over since an isotropic rescaling cannot change them"""
+        symmetry = {name : self.get_cached(name) for name in SYMMETRY_FIELDS}
         self.lengths = self.lengths * cbrt_scaling
-        self.volume_uc = self.volume_uc * volume_scaling
+        for name, value in symmetry.items():
+            setattr(self, name, value)
+        self.volume_uc = volume_uc
+        self.atomic_volume = atomic_volume
 
     @property
     def packing_density(self) -> float:
-        volume_uc = self.volume_uc
-        atomic_volume = self.base.calculate_atomic_volume()
+        """Computes and stores volume_uc and atomic_volume if they are unknown"""
+        volume_uc = self.get_cached('volume_uc', calculate=True)
+        atomic_volume = self.get_cached('atomic_volume', calculate=True)
         return atomic_volume/volume_uc
 
     @property
     def num_atoms(self) -> int:
         return len(self.base)
 
+    @timed(name='crystal.get_neighbor_list')
+    def get_neighbor_list(self, cutoff : float) -> NeighborList:
+        """Periodic neighbors within cutoff (Angstrom) of every site, indexed like the base. Void and placeholder
+        sites have no neighbors"""
+        lattice_params = (*self.lengths.as_tuple(), *self.angles.as_tuple())
+        lattice_matrix = make_lattice_matrices(lattice_params=np.array(lattice_params, dtype=np.float64))[0]
+        base = self.base.to_columnar()
+        coords = np.where(base.get_standard_mask()[:, np.newaxis], base.coords, np.nan)
+        return NeighborList(lattice_matrix=lattice_matrix, coords=coords, cutoff=cutoff)
+
+    def get_fingerprint(self, symprec : float = 0.1) -> Fingerprint:
+        """Order, origin, cell choice and scale invariant descriptor for duplicate detection"""
+        return make_fingerprint(crystal=self, symprec=symprec)
+
+    # ---------------------------------------------------------
+    # derived fields
+
+    def refresh_derived(self):
+        """Resets the derived fields to None and drops the cached pymatgen structure if lengths, angles or base
+        changed since they were stored. In-place edits of base.atomic_sites are not tracked"""
+        base = self.__dict__.get('base')
+        state = (self.__dict__.get('lengths'), self.__dict__.get('angles'), base, getattr(base, 'version', 0))
+        stored_state = self.__dict__.get('_derived_state')
+        if stored_state is None or not (stored_state[0] == state[0] and stored_state[1] == state[1]
+                                        and stored_state[2] is state[2] and stored_state[3] == state[3]):
+            for name in DERIVED_FIELDS:
+                self.__dict__[name] = None
+            self.__dict__.pop('_pymatgen_structure', None)
+            self.__dict__['_derived_state'] = state
+
+    def get_cached(self, name : str, calculate : bool = False):
+        """Stored value of a derived field, also for the fields computed on read. With calculate=True an unknown
+        value is computed and stored first; the symmetry fields use the default tolerances of calculate_properties"""
+        if not name in DERIVED_FIELDS:
+            raise ValueError(f'{name} is not a derived field; derived fields are {DERIVED_FIELDS}')
+        self.refresh_derived()
+        if calculate and self.__dict__.get(name) is None:
+            getattr(self, vars(CrystalStructure)[name].calculate)()
+        return self.__dict__.get(name)
+
+    def _calculate_volume_uc(self):
+        lattice_params = (*self.lengths.as_tuple(), *self.angles.as_tuple())
+        if None in lattice_params:
+            return
+        matrix = make_lattice_matrices(lattice_params=np.array(lattice_params, dtype=np.float64))[0]
+        self.volume_uc = float(abs(np.dot(np.cross(matrix[0], matrix[1]), matrix[2])))
+
+    def _calculate_atomic_volume(self):
+        self.atomic_volume = self.base.calculate_atomic_volume()
+
+    def _calculate_symmetry(self):
+        if len(self.base) == 0 or None in (*self.lengths.as_tuple(), *self.angles.as_tuple()):
+            return
+        result = self._get_symmetry(symprec=0.1, angle_tolerance=10, use_cache=True)
+        self.spacegroup = result.spacegroup
+        self.wyckoff_symbols = list(result.wyckoff_symbols)
+        self.crystal_system = result.crystal_system
+
+    def _get_stored_items(self) -> list[tuple[str, object]]:
+        return [(f.name, self.get_cached(f.name) if f.name in DERIVED_FIELDS else getattr(self, f.name))
+                for f in fields(self)]
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._get_stored_items() == other._get_stored_items()
+
+    def __repr__(self):
+        values = ', '.join(f'{name}={value!r}' for name, value in self._get_stored_items())
+        return f'{self.__class__.__name__}({values})'
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_pymatgen_structure', None)
+        return state
+
 
     # ---------------------------------------------------------
     # conversion
 
+    @timed(name='crystal.to_cif')
     def to_cif(self) -> str:
-        pymatgen_structure = self.to_pymatgen()
+        pymatgen_structure = self._get_pymatgen()
         return pymatgen_structure.to(filename='', fmt='cif')
 
+    def to_spglib_cell(self, lattice_matrix : Optional[np.ndarray] = None) -> SpglibCell:
+        """(lattice matrix, fractional positions, type numbers) of the non-void sites as passed to spglib by
+        SpacegroupAnalyzer(self.to_pymatgen()), built without constructing a pymatgen Structure"""
+        if lattice_matrix is None:
+            lattice_params = (*self.lengths.as_tuple(), *self.angles.as_tuple())
+            lattice_matrix = make_lattice_matrices(lattice_params=np.array(lattice_params))[0]
+
+        base = self.base.to_columnar()
+        standard_mask = base.get_standard_mask()
+        type_numbers : dict[Species, int] = {}
+        species_numbers = []
+        for species_str in base.species_table:
+            pymatgen_type = AtomType.intern(symbol=species_str).pymatgen_type
+            number = 0 if pymatgen_type is None else type_numbers.setdefault(pymatgen_type, len(type_numbers) + 1)
+            species_numbers.append(number)
+
+        positions = base.coords[standard_mask]
+        numbers = np.array(species_numbers, dtype=np.int32)[base.species_ids[standard_mask]]
+        return lattice_matrix, positions, numbers
+
     def to_pymatgen(self) -> Structure:
+        """Copy of a structure that is cached until lengths, angles or base change"""
+        return self._get_pymatgen().copy()
+
+    def _get_pymatgen(self) -> Structure:
+        """The cached structure itself, for read-only use"""
+        self.refresh_derived()
+        pymatgen_structure = self.__dict__.get('_pymatgen_structure')
+        if pymatgen_structure is None:
+            pymatgen_structure = self._make_pymatgen()
+            self.__dict__['_pymatgen_structure'] = pymatgen_structure
+        return pymatgen_structure
+
+    @timed(name='crystal.to_pymatgen')
+    def _make_pymatgen(self) -> Structure:
+        from pymatgen.core import Structure, Lattice
         a, b, c = self.lengths.as_tuple()
         alpha, beta, gamma = self.angles.as_tuple()
         lattice = Lattice.from_parameters(a, b, c, alpha, beta, gamma)
@@ -115,16 +356,60 @@ class CrystalStructure(JsonDataclass):
         positions = [(site.x, site.y, site.z) for site in non_void_sites]
 
         if len(atoms) == 0:
-            logger.warning('Structure has no atoms!')
+            get_logger().warning('Structure has no atoms!')
 
         return Structure(lattice, atoms, positions)
 
+    @timed(name='crystal.to_bytes')
+    def to_bytes(self, precision : Precision = 'float64') -> bytes:
+        """Compact binary encoding; precision applies to the site coordinates and occupancies"""
+        crystal_fields = CrystalFields(lattice_params=(*self.lengths.as_tuple(), *self.angles.as_tuple()),
+                                       spacegroup=self.get_cached('spacegroup'), volume_uc=self.get_cached('volume_uc'),
+                                       atomic_volume=self.get_cached('atomic_volume'),
+                                       crystal_system=self.get_cached('crystal_system'),
+                                       wyckoff_symbols=self.get_cached('wyckoff_symbols'))
+        return pack_crystal(fields=crystal_fields, base_bytes=self.base.to_bytes(precision=precision), precision=precision)
+
+    @classmethod
+    @timed(name='crystal.from_bytes')
+    def from_bytes(cls, b : bytes) -> CrystalStructure:
+        """Inverse of to_bytes; the base is decoded in bulk into a ColumnarBase"""
+        fields, offset = unpack_crystal(buffer=b)
+        columns, _ = unpack_base(buffer=b, offset=offset)
+        a, b, c, alpha, beta, gamma = fields.lattice_params
+        return cls(lengths=Lengths(a=a, b=b, c=c), angles=Angles(alpha=alpha, beta=beta, gamma=gamma),
+                   base=ColumnarBase.from_columns(columns=columns), spacegroup=fields.spacegroup,
+                   volume_uc=fields.volume_uc, atomic_volume=fields.atomic_volume,
+                   wyckoff_symbols=fields.wyckoff_symbols, crystal_system=fields.crystal_system)
+
+    @timed(name='crystal.to_str')
+    def to_str(self) -> str:
+        self.refresh_derived()
+        return super().to_str()
+
+    @classmethod
+    @timed(name='crystal.from_str')
+    def from_str(cls, s : str) -> CrystalStructure:
+        return super().from_str(s)
+
     def as_str(self) -> str:
-        the_dict = asdict(self)
-        the_dict = {str(key) : str(value) for key, value in the_dict.items() if not isinstance(value, Structure)}
+        the_dict = {name : asdict(value) if is_dataclass(value) else value for name, value in self._get_stored_items()}
+        the_dict = {str(key) : str(value) for key, value in the_dict.items()}
         the_dict['base'] = f'{self.base[0]}, ...'
         return json.dumps(the_dict, indent='-')
 
     def __str__(self):
         return self.as_str()
 
+
+def get_species_str(species : SpeciesLike) -> str:
+    from pymatgen.core import Species, Element
+    if isinstance(species, Element):
+        species = Species(symbol=species.symbol, oxidation_state=0)
+    return str(species)
+
+
+@lru_cache(maxsize=None)
+def get_logger() -> Logger:
+    from holytools.logging import LoggerFactory
+    return LoggerFactory.get_logger(name=__name__)
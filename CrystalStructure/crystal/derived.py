@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from typing import Any
+
+
+# ---------------------------------------------------------
+
+class DerivedProperty:
+    """Data descriptor for a derived dataclass field. Computed or explicitly assigned values are stored in the
+    instance __dict__ under the field name, where JsonDataclass.to_str reads them. The owner's refresh_derived()
+    resets them to None once the values they depend on changed. calculate names the owner's method that computes
+    the field, which may store several derived fields at once. With lazy=True reading an unknown value computes and
+    memoizes it; otherwise it is only computed on request"""
+    def __init__(self, calculate : str, lazy : bool = False):
+        self.calculate : str = calculate
+        self.lazy : bool = lazy
+        self.name : str = ''
+
+    def __set_name__(self, owner, name : str):
+        self.name = name
+
+    def __get__(self, instance, owner=None) -> Any:
+        # dataclass reads the class attribute once to obtain the field default
+        if instance is None:
+            return None
+        instance.refresh_derived()
+        if self.lazy and instance.__dict__.get(self.name) is None:
+            getattr(instance, self.calculate)()
+        return instance.__dict__.get(self.name)
+
+    def __set__(self, instance, value : Any):
+        instance.refresh_derived()
+        instance.__dict__[self.name] = value
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from CrystalStructure.instrumentation import timed
+from .atomic_site import AtomType
+
+if TYPE_CHECKING:
+    from .crystal import CrystalStructure
+
+# Radial distribution in units of the cube root of the volume per atom
+RDF_CUTOFF = 3.0
+RDF_BINS = 30
+RDF_SMEARING = 0.1
+COINCIDENCE_TOL = 1e-3
+FINGERPRINT_DTYPE = np.float32
+# ---------------------------------------------------------
+
+@dataclass(frozen=True, eq=False)
+class Fingerprint:
+    """Descriptor of a crystal that does not depend on site order, origin, cell choice or overall scale.
+    composition holds the element fractions and spacegroup the detected space group; both have to agree exactly
+    for two crystals to be considered duplicates. vector holds the continuous part, the shape of the primitive
+    cell followed by the occupancy weighted radial site distribution, and is compared by euclidean distance"""
+    composition : str
+    spacegroup : int
+    vector : np.ndarray
+
+    @property
+    def bucket(self) -> str:
+        return f'{self.spacegroup}:{self.composition}'
+
+    def distance(self, other : Fingerprint) -> float:
+        return float(np.linalg.norm(self.vector - other.vector))
+
+    def __eq__(self, other):
+        if not isinstance(other, Fingerprint):
+            return NotImplemented
+        return self.bucket == other.bucket and np.array_equal(self.vector, other.vector)
+
+
+@timed(name='crystal.get_fingerprint')
+def make_fingerprint(crystal : CrystalStructure, symprec : float = 0.1) -> Fingerprint:
+    base = crystal.base.to_columnar()
+    standard_mask = base.get_standard_mask()
+    if not np.any(standard_mask):
+        raise ValueError('Cannot fingerprint a crystal without atoms')
+
+    element_symbols = np.array([AtomType.intern(symbol=species_str).element_symbol or ''
+                                for species_str in base.species_table])
+    site_elements = element_symbols[base.species_ids[standard_mask]]
+    site_occupancies = base.occupancies[standard_mask]
+    elements, element_indices = np.unique(site_elements, return_inverse=True)
+    fractions = np.bincount(element_indices, weights=site_occupancies) / site_occupancies.sum()
+    composition = ''.join(f'{element}{fraction:.4f}' for element, fraction in zip(elements, fractions))
+
+    import spglib
+    lattice_matrix, positions, numbers = crystal.to_spglib_cell()
+    dataset = spglib.get_symmetry_dataset((lattice_matrix, positions, numbers), symprec=symprec)
+    if dataset is None:
+        raise ValueError(f'Symmetry detection failed: {spglib.get_error_message()}')
+    spacegroup = int(dataset['number'] if isinstance(dataset, dict) else dataset.number)
+    primitive_lattice = dataset['primitive_lattice'] if isinstance(dataset, dict) else dataset.primitive_lattice
+
+    volume_per_atom = abs(np.linalg.det(lattice_matrix)) / site_occupancies.sum()
+    scale = volume_per_atom ** (1 / 3)
+    lattice_features = get_lattice_features(lattice_matrix=np.asarray(primitive_lattice))
+    occupancies = np.where(standard_mask, base.occupancies, 0)
+    rdf = get_radial_distribution(crystal=crystal, scale=scale, occupancies=occupancies)
+    vector = np.concatenate([lattice_features, rdf]).astype(FINGERPRINT_DTYPE)
+    return Fingerprint(composition=composition, spacegroup=spacegroup, vector=vector)
+
+
+def get_lattice_features(lattice_matrix : np.ndarray) -> np.ndarray:
+    """Sorted lengths of the cell scaled to unit volume and the sorted absolute cosines of its angles"""
+    lengths = np.linalg.norm(lattice_matrix, axis=1)
+    lengths_scaled = lengths / abs(np.linalg.det(lattice_matrix)) ** (1 / 3)
+    pairs = [(1, 2), (0, 2), (0, 1)]
+    cosines = [abs(np.dot(lattice_matrix[i], lattice_matrix[j])) / (lengths[i] * lengths[j]) for i, j in pairs]
+    return np.concatenate([np.sort(lengths_scaled), np.sort(cosines)])
+
+
+def get_radial_distribution(crystal : CrystalStructure, scale : float, occupancies : np.ndarray) -> np.ndarray:
+    """Gaussian smeared histogram of the pair distances up to RDF_CUTOFF * scale, weighted by the product of the
+    occupancies and normalized per atom of the cell"""
+    margin = 3 * RDF_SMEARING
+    neighbor_list = crystal.get_neighbor_list(cutoff=(RDF_CUTOFF + margin) * scale)
+    weights = occupancies[neighbor_list.centers] * occupancies[neighbor_list.indices]
+    scaled_distances = neighbor_list.distances / scale
+    # Partially occupied species sharing a position make up one site and are not neighbors of each other
+    weights[scaled_distances < COINCIDENCE_TOL] = 0
+
+    bin_centers = (np.arange(RDF_BINS) + 0.5) * RDF_CUTOFF / RDF_BINS
+    smearing = np.exp(-0.5 * ((scaled_distances[:, np.newaxis] - bin_centers) / RDF_SMEARING) ** 2)
+    smearing /= RDF_SMEARING * math.sqrt(2 * math.pi)
+    rdf = weights @ smearing / occupancies.sum()
+    # Shell volume normalization so that every bin contributes on a comparable scale
+    return rdf / (4 * math.pi * bin_centers ** 2)
@@ -4,6 +4,7 @@ import json
 from dataclasses import dataclass, asdict
 from typing import Optional
 
+import numpy as np
 from holytools.abstract import Serializable
 
 LatticeParams = tuple[float,float,float,float,float,float]
@@ -71,3 +72,21 @@ class Lengths(Serializable):
             raise TypeError(f"Unsupported operand type(s) for *: 'Primitives' and '{type(other).__name__}'")
 
 
+def make_lattice_matrices(lattice_params : np.ndarray) -> np.ndarray:
+    """Row-vector lattice matrices of shape (B, 3, 3) for lattice parameters of shape (B, 6) with angles in degrees.
+    Uses the same orientation convention as pymatgen's Lattice.from_parameters"""
+    lattice_params = np.asarray(lattice_params, dtype=np.float64).reshape(-1, 6)
+    a, b, c = lattice_params[:, :3].T
+    angles = np.radians(lattice_params[:, 3:])
+    cos_alpha, cos_beta, cos_gamma = np.cos(angles).T
+    sin_alpha, sin_beta, _ = np.sin(angles).T
+
+    gamma_star = np.arccos(np.clip((cos_alpha * cos_beta - cos_gamma) / (sin_alpha * sin_beta), -1, 1))
+    matrices = np.zeros((len(lattice_params), 3, 3))
+    matrices[:, 0, 0] = a * sin_beta
+    matrices[:, 0, 2] = a * cos_beta
+    matrices[:, 1, 0] = -b * sin_alpha * np.cos(gamma_star)
+    matrices[:, 1, 1] = b * sin_alpha * np.sin(gamma_star)
+    matrices[:, 1, 2] = b * cos_alpha
+    matrices[:, 2, 2] = c
+    return matrices
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+from typing import Optional, Sequence
+
+import numpy as np
+
+from CrystalStructure.instrumentation import timed
+
+# Largest number of candidate pairs examined at once
+MAX_CANDIDATES = 2 ** 22
+# ---------------------------------------------------------
+
+class NeighborList:
+    """Periodic neighbor list of all site pairs within cutoff, in CSR layout: the neighbors of site i are
+    indices[offsets[i]:offsets[i+1]] in the periodic images given by the integer lattice translations in images,
+    at the cartesian distances in distances. Rows are ordered by neighbor index and image. Sites with non-finite
+    coordinates are left out. Candidates are found with a cell list binned in fractional coordinates, so the cost
+    grows linearly with the number of sites. The list can be updated in place when only a few sites move"""
+    def __init__(self, lattice_matrix : np.ndarray, coords : np.ndarray, cutoff : float):
+        if cutoff <= 0:
+            raise ValueError(f'Cutoff must be positive, got {cutoff}')
+        self.lattice_matrix : np.ndarray = np.asarray(lattice_matrix, dtype=np.float64).reshape(3, 3)
+        self.cutoff : float = float(cutoff)
+        self.coords : np.ndarray = np.array(coords, dtype=np.float64).reshape(-1, 3)
+        self.offsets : np.ndarray = np.zeros(len(self.coords) + 1, dtype=np.int64)
+        self.indices : np.ndarray = np.zeros(0, dtype=np.int64)
+        self.images : np.ndarray = np.zeros((0, 3), dtype=np.int64)
+        self.distances : np.ndarray = np.zeros(0, dtype=np.float64)
+
+        cross_products = np.cross(self.lattice_matrix[[1, 2, 0]], self.lattice_matrix[[2, 0, 1]])
+        volume = abs(np.dot(self.lattice_matrix[0], cross_products[0]))
+        plane_spacings = volume / np.linalg.norm(cross_products, axis=1)
+        self.num_bins : np.ndarray = np.maximum(1, np.floor(plane_spacings / self.cutoff)).astype(np.int64)
+        self.search_ranges : np.ndarray = np.ceil(self.cutoff * self.num_bins / plane_spacings).astype(np.int64)
+
+        self._rebin()
+        active = np.flatnonzero(self._active)
+        self._set_edges(*self._search(centers=active))
+
+    def __len__(self):
+        return len(self.coords)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+    @property
+    def centers(self) -> np.ndarray:
+        """Site index of every edge, i.e. the row of the CSR layout expanded to one entry per edge"""
+        return np.repeat(np.arange(len(self)), np.diff(self.offsets))
+
+    def get_neighbors(self, site_index : int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        start, stop = self.offsets[site_index], self.offsets[site_index + 1]
+        return self.indices[start:stop], self.images[start:stop], self.distances[start:stop]
+
+    def get_edge_vectors(self) -> np.ndarray:
+        """Cartesian vectors (n_edges, 3) pointing from each site to its neighbors"""
+        delta = self.coords[self.indices] + self.images - self.coords[self.centers]
+        return delta @ self.lattice_matrix
+
+    @timed(name='neighbors.update')
+    def update(self, site_indices : Sequence[int], coords : np.ndarray):
+        """Moves the given sites to new fractional coordinates and recomputes only the edges involving them"""
+        site_indices = np.asarray(site_indices, dtype=np.int64).reshape(-1)
+        self.coords[site_indices] = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+        self._rebin()
+
+        moved = np.zeros(len(self), dtype=bool)
+        moved[site_indices] = True
+        centers = self.centers
+        kept = ~(moved[centers] | moved[self.indices])
+        new_centers, new_indices, new_images, new_distances = self._search(centers=np.flatnonzero(moved & self._active))
+        mirrored = ~moved[new_indices]
+        new_centers, new_indices = (np.concatenate([new_centers, new_indices[mirrored]]),
+                                    np.concatenate([new_indices, new_centers[mirrored]]))
+        new_images = np.concatenate([new_images, -new_images[mirrored]])
+        new_distances = np.concatenate([new_distances, new_distances[mirrored]])
+
+        # The kept edges are still sorted, so the few new ones are merged in instead of sorting all edges again
+        kept_centers, kept_indices, kept_images = centers[kept], self.indices[kept], self.images[kept]
+        keys = make_sort_keys(centers=np.concatenate([kept_centers, new_centers]),
+                              indices=np.concatenate([kept_indices, new_indices]),
+                              images=np.concatenate([kept_images, new_images]), num_sites=len(self))
+        if keys is None:
+            self._set_edges(centers=np.concatenate([kept_centers, new_centers]),
+                            indices=np.concatenate([kept_indices, new_indices]),
+                            images=np.concatenate([kept_images, new_images]),
+                            distances=np.concatenate([self.distances[kept], new_distances]))
+            return
+
+        kept_keys, new_keys = keys[:len(kept_centers)], keys[len(kept_centers):]
+        order = np.argsort(new_keys, kind='stable')
+        positions = np.searchsorted(kept_keys, new_keys[order])
+        self._store_edges(centers=np.insert(kept_centers, positions, new_centers[order]),
+                          indices=np.insert(kept_indices, positions, new_indices[order]),
+                          images=np.insert(kept_images, positions, new_images[order], axis=0),
+                          distances=np.insert(self.distances[kept], positions, new_distances[order]))
+
+    # ---------------------------------------------------------
+
+    def _rebin(self):
+        self._active = np.all(np.isfinite(self.coords), axis=1)
+        wrapped = np.where(self._active[:, np.newaxis], self.coords, 0.0) % 1.0
+        self._cartesian = wrapped @ self.lattice_matrix
+        # Lattice translations from the given coordinates to the wrapped ones
+        self._wrap_shifts = np.rint(wrapped - np.where(self._active[:, np.newaxis], self.coords, 0.0)).astype(np.int64)
+
+        site_bins = np.minimum((wrapped * self.num_bins).astype(np.int64), self.num_bins - 1)
+        self._site_bins = site_bins
+        flat_bins = np.ravel_multi_index(site_bins.T, self.num_bins)
+        flat_bins[~self._active] = -1
+        order = np.argsort(flat_bins, kind='stable')
+        self._bin_order = order[np.count_nonzero(~self._active):]
+        self._bin_counts = np.bincount(flat_bins[self._bin_order], minlength=int(np.prod(self.num_bins)))
+        self._bin_starts = np.cumsum(self._bin_counts) - self._bin_counts
+
+    @timed(name='neighbors.search')
+    def _search(self, centers : np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """All (center, neighbor, image, distance) edges of the given center sites"""
+        ranges = [np.arange(-search_range, search_range + 1) for search_range in self.search_ranges]
+        bin_offsets = np.stack(np.meshgrid(*ranges, indexing='ij'), axis=-1).reshape(-1, 3)
+        target_bins = (self._site_bins[centers][:, np.newaxis, :] + bin_offsets[np.newaxis]).reshape(-1, 3)
+        bin_shifts = np.floor_divide(target_bins, self.num_bins)
+        flat_bins = np.ravel_multi_index((target_bins - bin_shifts * self.num_bins).T, self.num_bins)
+        counts = self._bin_counts[flat_bins]
+        query_centers = np.repeat(centers, len(bin_offsets))
+
+        # Cartesian offset from each center to the origin of the shifted cell, shared by all candidates of a query
+        query_vectors = bin_shifts @ self.lattice_matrix - self._cartesian[query_centers]
+
+        results = []
+        chunk_bounds = np.searchsorted(np.cumsum(counts), np.arange(MAX_CANDIDATES, counts.sum(), MAX_CANDIDATES))
+        for chunk in np.split(np.arange(len(query_centers)), chunk_bounds):
+            results.append(self._check_candidates(query_centers=query_centers[chunk], bin_shifts=bin_shifts[chunk],
+                                                  query_vectors=query_vectors[chunk],
+                                                  starts=self._bin_starts[flat_bins[chunk]], counts=counts[chunk]))
+
+        if not results:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros((0, 3), np.int64), np.zeros(0)
+        return tuple(np.concatenate(parts) for parts in zip(*results))
+
+    def _check_candidates(self, query_centers : np.ndarray, bin_shifts : np.ndarray, query_vectors : np.ndarray,
+                          starts : np.ndarray, counts : np.ndarray) -> tuple[np.ndarray, ...]:
+        queries = np.repeat(np.arange(len(query_centers)), counts)
+        positions = np.arange(len(queries)) - np.repeat(np.cumsum(counts) - counts, counts)
+        neighbors = self._bin_order[np.repeat(starts, counts) + positions]
+
+        vectors = self._cartesian[neighbors] + query_vectors[queries]
+        squared_distances = np.einsum('ij,ij->i', vectors, vectors)
+        within = np.flatnonzero(squared_distances <= self.cutoff ** 2)
+        queries, neighbors = queries[within], neighbors[within]
+        centers, shifts = query_centers[queries], bin_shifts[queries]
+        not_self = (neighbors != centers) | np.any(shifts != 0, axis=1)
+        queries, neighbors, centers, shifts = queries[not_self], neighbors[not_self], centers[not_self], shifts[not_self]
+
+        # Images are expressed relative to the given, possibly unwrapped, coordinates
+        images = shifts + self._wrap_shifts[neighbors] - self._wrap_shifts[centers]
+        return centers, neighbors, images, np.sqrt(squared_distances[within[not_self]])
+
+    def _set_edges(self, centers : np.ndarray, indices : np.ndarray, images : np.ndarray, distances : np.ndarray):
+        keys = make_sort_keys(centers=centers, indices=indices, images=images, num_sites=len(self))
+        if keys is None:
+            order = np.lexsort((images[:, 2], images[:, 1], images[:, 0], indices, centers))
+        else:
+            order = np.argsort(keys, kind='stable')
+        self._store_edges(centers=centers[order], indices=indices[order], images=images[order],
+                          distances=distances[order])
+
+    def _store_edges(self, centers : np.ndarray, indices : np.ndarray, images : np.ndarray, distances : np.ndarray):
+        self.indices = indices
+        self.images = images
+        self.distances = distances
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(centers, minlength=len(self)))]).astype(np.int64)
+
+
+def make_sort_keys(centers : np.ndarray, indices : np.ndarray, images : np.ndarray,
+                   num_sites : int) -> Optional[np.ndarray]:
+    """Single int64 key per edge ordering edges by center, neighbor index and image, or None if it would overflow"""
+    if len(images) == 0:
+        return np.zeros(0, dtype=np.int64)
+    max_image = int(np.abs(images).max())
+    image_base = 2 * max_image + 1
+    if num_sites ** 2 * image_base ** 3 >= 2 ** 63:
+        return None
+    shifted = images + max_image
+    image_codes = (shifted[:, 0] * image_base + shifted[:, 1]) * image_base + shifted[:, 2]
+    return (centers.astype(np.int64) * num_sites + indices) * image_base ** 3 + image_codes
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import numpy as np
+
+from CrystalStructure.instrumentation import timed
+from .base import ColumnarBase
+from .cif_parser import SITE_TOLERANCE, FRAC_TOLERANCE
+
+# ---------------------------------------------------------
+
+@timed(name='transform.expand_base')
+def expand_base(base : ColumnarBase, rotations : np.ndarray, translations : np.ndarray,
+                tolerance : float = SITE_TOLERANCE) -> ColumnarBase:
+    """Images of every site under the symmetry operations (K, 3, 3) and (K, 3), wrapped into [0, 1). Coordinates
+    within FRAC_TOLERANCE of a multiple of 1/12 (e.g. 0.3333, 0.6667) are snapped to it first. Images of the same
+    species within tolerance of each other under periodic wrap are merged, keeping the first one, so the result
+    lists the orbit of each input site in input order. Species, occupancies and wyckoff letters are carried over
+    from the generating site. Void and placeholder sites are not expanded and follow the expanded sites"""
+    standard_mask = base.get_standard_mask()
+    site_rows = np.flatnonzero(standard_mask)
+    coords = wrap(snap_fractions(base.coords[site_rows]))
+    images = wrap(np.einsum('kij,nj->nki', rotations, coords) + translations[np.newaxis])
+    species_ids = base.species_ids[site_rows].astype(np.int64)
+
+    is_kept = get_first_images(coords=coords, images=images, tolerance=tolerance)
+    is_kept &= ~get_repeated_orbits(coords=coords, images=images, species_ids=species_ids, tolerance=tolerance)[:, None]
+    image_rows = np.repeat(site_rows, len(rotations))[is_kept.reshape(-1)]
+
+    rows = np.concatenate([image_rows, np.flatnonzero(~standard_mask)])
+    coords = np.concatenate([images[is_kept], base.coords[~standard_mask]])
+    return ColumnarBase.from_arrays(coords=coords, occupancies=base.occupancies[rows],
+                                    species_ids=base.species_ids[rows], species_table=list(base.species_table),
+                                    wyckoff_letters=base.wyckoff_letters[rows])
+
+
+@timed(name='transform.make_supercell_base')
+def make_supercell_base(base : ColumnarBase, scaling : tuple[int, int, int]) -> ColumnarBase:
+    """Base of the diagonal supercell with the given number of repetitions along each lattice vector, in
+    fractional coordinates of the supercell. The copies of each site follow each other"""
+    scaling = np.asarray(scaling, dtype=np.int64)
+    ranges = [np.arange(repetitions) for repetitions in scaling]
+    translations = np.stack(np.meshgrid(*ranges, indexing='ij'), axis=-1).reshape(-1, 3)
+    coords = (base.coords[:, np.newaxis, :] + translations[np.newaxis]) / scaling
+    num_copies = len(translations)
+    return ColumnarBase.from_arrays(coords=coords.reshape(-1, 3),
+                                    occupancies=np.repeat(base.occupancies, num_copies),
+                                    species_ids=np.repeat(base.species_ids, num_copies),
+                                    species_table=list(base.species_table),
+                                    wyckoff_letters=np.repeat(base.wyckoff_letters, num_copies))
+
+# ---------------------------------------------------------
+
+def get_first_images(coords : np.ndarray, images : np.ndarray, tolerance : float,
+                     chunk_size : int = 2 ** 20) -> np.ndarray:
+    """(N, K) mask of the images of each site that do not coincide with an earlier image of the same site. Images
+    only coincide for sites on special positions, i.e. mapped onto themselves by more than one operation, so only
+    those are compared pairwise"""
+    num_sites, num_images = images.shape[:2]
+    is_first = np.ones((num_sites, num_images), dtype=bool)
+    num_fixing = (get_periodic_distance(images, coords[:, np.newaxis, :]) < tolerance).sum(axis=1)
+    special_sites = np.flatnonzero(num_fixing > 1)
+    sites_per_chunk = max(1, chunk_size // num_images ** 2)
+    earlier = np.tril(np.ones((num_images, num_images), dtype=bool), k=-1)
+    for start in range(0, len(special_sites), sites_per_chunk):
+        chunk_sites = special_sites[start:start + sites_per_chunk]
+        chunk = images[chunk_sites]
+        is_close = get_periodic_distance(chunk[:, :, np.newaxis], chunk[:, np.newaxis, :]) < tolerance
+        is_first[chunk_sites] = ~(is_close & earlier).any(axis=2)
+    return is_first
+
+
+def get_repeated_orbits(coords : np.ndarray, images : np.ndarray, species_ids : np.ndarray,
+                        tolerance : float) -> np.ndarray:
+    """Mask of the sites that lie within tolerance of an image of an earlier site of the same species, i.e. whose
+    orbit has already been generated. Candidate images are looked up in the neighbouring cells of a grid with
+    cells at least tolerance wide"""
+    num_sites, num_images = images.shape[:2]
+    grid_size = max(1, int(1 / tolerance))
+    image_keys = get_cell_keys(species_ids=np.repeat(species_ids, num_images),
+                               cells=np.floor(images.reshape(-1, 3) * grid_size).astype(np.int64), grid_size=grid_size)
+    order = np.argsort(image_keys, kind='stable')
+    sorted_keys = image_keys[order]
+
+    offsets = np.array(np.meshgrid(*[[-1, 0, 1]] * 3, indexing='ij')).reshape(3, -1).T
+    site_cells = np.floor(coords * grid_size).astype(np.int64)[:, np.newaxis, :] + offsets[np.newaxis]
+    query_keys = get_cell_keys(species_ids=np.repeat(species_ids, len(offsets)), cells=site_cells.reshape(-1, 3),
+                               grid_size=grid_size)
+    starts = np.searchsorted(sorted_keys, query_keys, side='left')
+    counts = np.searchsorted(sorted_keys, query_keys, side='right') - starts
+    query_sites = np.repeat(np.repeat(np.arange(num_sites), len(offsets)), counts)
+    positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    candidates = order[positions]
+
+    source_sites = candidates // num_images
+    distances = get_periodic_distance(images.reshape(-1, 3)[candidates], coords[query_sites])
+    is_repeat = (distances < tolerance) & (source_sites < query_sites)
+    repeated = np.zeros(num_sites, dtype=bool)
+    repeated[query_sites[is_repeat]] = True
+    return repeated
+
+
+def get_cell_keys(species_ids : np.ndarray, cells : np.ndarray, grid_size : int) -> np.ndarray:
+    cells = cells % grid_size
+    return ((species_ids * grid_size + cells[:, 0]) * grid_size + cells[:, 1]) * grid_size + cells[:, 2]
+
+
+def get_periodic_distance(coords : np.ndarray, others : np.ndarray) -> np.ndarray:
+    """Largest per-axis distance between fractional coordinates under the minimum image convention"""
+    diff = coords - others
+    return np.abs(diff - np.rint(diff)).max(axis=-1)
+
+
+def snap_fractions(coords : np.ndarray) -> np.ndarray:
+    """Snaps finite precision fractions such as 0.3333 or 0.1667 to the nearest multiple of 1/12"""
+    fractions = np.rint(coords * 12) / 12
+    return np.where(np.abs(coords - fractions) <= FRAC_TOLERANCE, fractions, coords)
+
+
+def wrap(coords : np.ndarray) -> np.ndarray:
+    wrapped = coords - np.floor(coords)
+    return np.where(wrapped >= 1., 0., wrapped)
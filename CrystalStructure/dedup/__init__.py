@@ -0,0 +1 @@
+from .index import FingerprintIndex, find_duplicates
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Iterable, Optional, Sequence, TYPE_CHECKING
+
+import numpy as np
+
+from CrystalStructure.crystal import CrystalStructure
+from CrystalStructure.crystal.fingerprint import Fingerprint, FINGERPRINT_DTYPE
+
+if TYPE_CHECKING:
+    from pymatgen.analysis.structure_matcher import StructureMatcher
+
+# Bump whenever the fingerprint or the hashing changes in a way that invalidates stored indices
+INDEX_VERSION = 1
+# ---------------------------------------------------------
+
+class FingerprintIndex:
+    """Locality sensitive hash index over crystal fingerprints. Every fingerprint is hashed into num_tables buckets,
+    each combining its composition and space group with hashes_per_table quantized random projections of its
+    vector, so that fingerprints within tolerance of each other share at least one bucket with high probability.
+    A query therefore only looks at a handful of candidates regardless of the index size. Entries live in an
+    SQLite database, in memory unless db_fpath is given, and can be added at any time. An existing database keeps
+    the parameters it was created with"""
+    def __init__(self, db_fpath : Optional[str] = None, tolerance : float = 0.3, num_tables : int = 8,
+                 hashes_per_table : int = 4, seed : int = 0):
+        self.db_fpath : Optional[str] = db_fpath
+        self._lock = threading.Lock()
+        self._connection : Optional[sqlite3.Connection] = None
+        self._connection_pid : Optional[int] = None
+
+        params = {'version' : INDEX_VERSION, 'tolerance' : tolerance, 'num_tables' : num_tables,
+                  'hashes_per_table' : hashes_per_table, 'seed' : seed}
+        stored = self._read_params()
+        if stored is None:
+            self._write_params(params=params)
+        elif stored['version'] != INDEX_VERSION:
+            raise ValueError(f'Index {db_fpath} has version {stored["version"]}, expected {INDEX_VERSION}')
+        else:
+            params = stored
+        self.tolerance : float = params['tolerance']
+        self.num_tables : int = params['num_tables']
+        self.hashes_per_table : int = params['hashes_per_table']
+        self.seed : int = params['seed']
+        self._projections : Optional[np.ndarray] = None
+        self._shifts : Optional[np.ndarray] = None
+
+    def __len__(self):
+        with self._lock:
+            return self._get_connection().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def __contains__(self, key : str):
+        with self._lock:
+            row = self._get_connection().execute('SELECT 1 FROM entries WHERE key = ?', (key,)).fetchone()
+        return not row is None
+
+    # ---------------------------------------------------------
+    # access
+
+    def add(self, key : str, fingerprint : Fingerprint):
+        self.add_all(items=[(key, fingerprint)])
+
+    def add_all(self, items : Iterable[tuple[str, Fingerprint]]):
+        """Adds or replaces the fingerprints of the given keys in one transaction"""
+        entry_rows, hash_rows = [], []
+        for key, fingerprint in items:
+            vector_bytes = np.asarray(fingerprint.vector, dtype=FINGERPRINT_DTYPE).tobytes()
+            entry_rows.append((key, fingerprint.bucket, vector_bytes))
+            hash_rows += [(bucket_hash, key) for bucket_hash in self.get_bucket_hashes(fingerprint=fingerprint)]
+
+        with self._lock:
+            connection = self._get_connection()
+            with connection:
+                connection.executemany('DELETE FROM buckets WHERE key = ?', [(row[0],) for row in entry_rows])
+                connection.executemany('INSERT OR REPLACE INTO entries VALUES (?, ?, ?)', entry_rows)
+                connection.executemany('INSERT INTO buckets VALUES (?, ?)', hash_rows)
+
+    def remove(self, key : str):
+        with self._lock:
+            connection = self._get_connection()
+            with connection:
+                connection.execute('DELETE FROM buckets WHERE key = ?', (key,))
+                connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def query(self, fingerprint : Fingerprint, max_distance : Optional[float] = None) -> list[tuple[str, float]]:
+        """Keys of the indexed fingerprints with the same composition and space group within max_distance
+        (default: tolerance) of the fingerprint, sorted by distance"""
+        max_distance = self.tolerance if max_distance is None else max_distance
+        bucket_hashes = self.get_bucket_hashes(fingerprint=fingerprint)
+        placeholders = ', '.join('?' * len(bucket_hashes))
+        with self._lock:
+            rows = self._get_connection().execute(
+                f'SELECT key, bucket, vector FROM entries WHERE key IN '
+                f'(SELECT key FROM buckets WHERE hash IN ({placeholders}))', bucket_hashes).fetchall()
+
+        matches = []
+        for key, bucket, vector in rows:
+            if bucket != fingerprint.bucket:
+                continue
+            distance = float(np.linalg.norm(np.frombuffer(vector, dtype=FINGERPRINT_DTYPE) - fingerprint.vector))
+            if distance <= max_distance:
+                matches.append((key, distance))
+        return sorted(matches, key=lambda match : match[1])
+
+    def get_bucket_hashes(self, fingerprint : Fingerprint) -> list[int]:
+        """One signed 64 bit bucket hash per table"""
+        projections, shifts = self._get_projections(dimension=len(fingerprint.vector))
+        projected = projections @ fingerprint.vector.astype(np.float64) + shifts
+        codes = np.floor(projected / (4 * self.tolerance)).astype(np.int64).reshape(self.num_tables, -1)
+
+        bucket_hashes = []
+        for table, table_codes in enumerate(codes):
+            digest = hashlib.blake2b(f'{fingerprint.bucket}|{table}|'.encode() + table_codes.tobytes(), digest_size=8)
+            bucket_hashes.append(int.from_bytes(digest.digest(), byteorder='little', signed=True))
+        return bucket_hashes
+
+    # ---------------------------------------------------------
+    # storage
+
+    def _get_projections(self, dimension : int) -> tuple[np.ndarray, np.ndarray]:
+        if self._projections is None or self._projections.shape[1] != dimension:
+            rng = np.random.default_rng(seed=self.seed)
+            num_hashes = self.num_tables * self.hashes_per_table
+            self._projections = rng.standard_normal(size=(num_hashes, dimension))
+            self._shifts = rng.uniform(0, 4 * self.tolerance, size=num_hashes)
+        return self._projections, self._shifts
+
+    def _read_params(self) -> Optional[dict]:
+        with self._lock:
+            row = self._get_connection().execute("SELECT value FROM meta WHERE name = 'params'").fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def _write_params(self, params : dict):
+        with self._lock:
+            connection = self._get_connection()
+            with connection:
+                connection.execute("INSERT OR REPLACE INTO meta VALUES ('params', ?)", (json.dumps(params),))
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # sqlite connections must not be shared across forked processes
+        if self._connection is None or self._connection_pid != os.getpid():
+            if self.db_fpath:
+                os.makedirs(os.path.dirname(os.path.abspath(self.db_fpath)), exist_ok=True)
+                connection = sqlite3.connect(self.db_fpath, timeout=60, check_same_thread=False)
+                connection.execute('PRAGMA journal_mode=WAL')
+            elif self._connection is None:
+                connection = sqlite3.connect(':memory:', check_same_thread=False)
+            else:
+                raise RuntimeError('An in-memory FingerprintIndex cannot be used after forking; pass a db_fpath')
+            connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+            connection.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, bucket TEXT, vector BLOB)')
+            connection.execute('CREATE TABLE IF NOT EXISTS buckets (hash INTEGER, key TEXT)')
+            connection.execute('CREATE INDEX IF NOT EXISTS buckets_hash ON buckets (hash)')
+            connection.execute('CREATE INDEX IF NOT EXISTS buckets_key ON buckets (key)')
+            connection.commit()
+            self._connection, self._connection_pid = connection, os.getpid()
+        return self._connection
+
+
+def find_duplicates(crystals : Sequence[CrystalStructure], tolerance : float = 0.3,
+                    matcher : Optional[StructureMatcher] = None) -> dict[int, int]:
+    """Maps the position of every crystal that duplicates an earlier one to the position of that earlier crystal.
+    Only the candidates an in-memory FingerprintIndex returns are compared with the exact matcher (default:
+    StructureMatcher())"""
+    from pymatgen.analysis.structure_matcher import StructureMatcher
+    index = FingerprintIndex(tolerance=tolerance)
+    matcher = StructureMatcher() if matcher is None else matcher
+    duplicates = {}
+    for position, crystal in enumerate(crystals):
+        fingerprint = crystal.get_fingerprint()
+        for key, _ in index.query(fingerprint=fingerprint):
+            if matcher.fit(crystals[int(key)].to_pymatgen(), crystal.to_pymatgen()):
+                duplicates[position] = int(key)
+                break
+        else:
+            index.add(key=str(position), fingerprint=fingerprint)
+    return duplicates
@@ -0,0 +1 @@
+from .xrd import XrdPeaks, calculate_peaks, calculate_pattern, calculate_patterns, get_two_theta_grid, CU_KA
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import functools
+import math
+import multiprocessing
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import numpy as np
+
+from CrystalStructure.crystal import CrystalStructure
+from CrystalStructure.crystal.atomic_site import AtomType
+from CrystalStructure.crystal.lattice import make_lattice_matrices
+from CrystalStructure.instrumentation import timed
+
+CU_KA = 1.54184
+TWO_THETA_TOL = 1e-5
+SCALED_INTENSITY_TOL = 1e-3
+# Upper bound on the entries of one (hkl chunk x sites) phase matrix
+MAX_PHASE_ENTRIES = 2 ** 22
+# ---------------------------------------------------------
+
+@dataclass
+class XrdPeaks:
+    """Powder diffraction peaks sorted by two_theta (degrees). Reflections within TWO_THETA_TOL are merged into one
+    peak; multiplicities count the merged reflections and hkls holds one representative (h, k, l) per peak"""
+    two_theta : np.ndarray
+    intensities : np.ndarray
+    d_spacings : np.ndarray
+    multiplicities : np.ndarray
+    hkls : np.ndarray
+
+    def __len__(self):
+        return len(self.two_theta)
+
+
+@timed(name='xrd.calculate_peaks')
+def calculate_peaks(crystal : CrystalStructure, wavelength : float = CU_KA,
+                    two_theta_range : tuple[float, float] = (0, 90), scaled : bool = True) -> XrdPeaks:
+    """Same model as pymatgen's XRDCalculator without Debye-Waller factors: atomic form factors from the stored
+    scattering parameters, Lorentz-polarization correction and the structure factors of all reflections computed
+    as one (n_hkl x n_sites) complex matrix product. By Friedel's law only one half of reciprocal space is
+    evaluated and counted twice. Scaled intensities have a maximum of 100"""
+    min_g, max_g = [2 * math.sin(math.radians(angle / 2)) / wavelength for angle in two_theta_range]
+    lattice_params = (*crystal.lengths.as_tuple(), *crystal.angles.as_tuple())
+    lattice_matrix = make_lattice_matrices(lattice_params=np.array(lattice_params, dtype=np.float64))[0]
+    hkls, g_hkls = enumerate_reflections(lattice_matrix=lattice_matrix, min_g=min_g, max_g=max_g)
+
+    base = crystal.base.to_columnar()
+    standard_mask = base.get_standard_mask()
+    coords = base.coords[standard_mask]
+    species_ids = base.species_ids[standard_mask]
+    occupancies = base.occupancies[standard_mask]
+    if len(hkls) == 0 or len(coords) == 0:
+        return make_empty_peaks()
+
+    theta = np.arcsin(np.clip(wavelength * g_hkls / 2, -1, 1))
+    form_factors = get_form_factors(species_table=base.species_table, s2=(g_hkls / 2) ** 2)
+    structure_factors = get_structure_factors(hkls=hkls, coords=coords, species_ids=species_ids,
+                                              occupancies=occupancies, form_factors=form_factors)
+    lorentz_polarization = (1 + np.cos(2 * theta) ** 2) / (np.sin(theta) ** 2 * np.cos(theta))
+    intensities = 2 * np.abs(structure_factors) ** 2 * lorentz_polarization
+    two_theta = np.degrees(2 * theta)
+
+    keys, first_indices, peak_indices = np.unique(np.round(two_theta / TWO_THETA_TOL).astype(np.int64),
+                                                  return_index=True, return_inverse=True)
+    peak_intensities = np.bincount(peak_indices, weights=intensities, minlength=len(keys))
+    multiplicities = 2 * np.bincount(peak_indices, minlength=len(keys))
+
+    max_intensity = peak_intensities.max()
+    if max_intensity > 0:
+        keep = peak_intensities / max_intensity * 100 > SCALED_INTENSITY_TOL
+    else:
+        keep = np.zeros(len(keys), dtype=bool)
+    peak_intensities = peak_intensities[keep]
+    if scaled and len(peak_intensities) > 0:
+        peak_intensities = peak_intensities / peak_intensities.max() * 100
+    first_indices = first_indices[keep]
+    return XrdPeaks(two_theta=two_theta[first_indices], intensities=peak_intensities,
+                    d_spacings=1 / g_hkls[first_indices], multiplicities=multiplicities[keep], hkls=hkls[first_indices])
+
+
+def calculate_pattern(crystal : CrystalStructure, num_bins : int = 4500, wavelength : float = CU_KA,
+                      two_theta_range : tuple[float, float] = (0, 90), scaled : bool = True) -> np.ndarray:
+    """Peak intensities summed into num_bins equal bins spanning two_theta_range, centered on
+    get_two_theta_grid(two_theta_range, num_bins). Scaled patterns have a maximum of 100"""
+    peaks = calculate_peaks(crystal=crystal, wavelength=wavelength, two_theta_range=two_theta_range, scaled=False)
+    low, high = two_theta_range
+    bin_indices = np.clip(((peaks.two_theta - low) / (high - low) * num_bins).astype(np.int64), 0, num_bins - 1)
+    pattern = np.bincount(bin_indices, weights=peaks.intensities, minlength=num_bins)
+    if scaled and pattern.max(initial=0) > 0:
+        pattern *= 100 / pattern.max()
+    return pattern
+
+
+def calculate_patterns(crystals : Iterable[CrystalStructure], num_bins : int = 4500, wavelength : float = CU_KA,
+                       two_theta_range : tuple[float, float] = (0, 90), scaled : bool = True,
+                       num_workers : int = 0, chunk_size : int = 16) -> np.ndarray:
+    """Binned patterns of many crystals as an array of shape (n_crystals, num_bins). With num_workers > 0 the
+    crystals are distributed over that many processes in chunks of chunk_size"""
+    calculate = functools.partial(calculate_pattern, num_bins=num_bins, wavelength=wavelength,
+                                  two_theta_range=two_theta_range, scaled=scaled)
+    if num_workers > 0:
+        with multiprocessing.Pool(processes=num_workers) as pool:
+            patterns = list(pool.imap(calculate, crystals, chunksize=chunk_size))
+    else:
+        patterns = [calculate(crystal) for crystal in crystals]
+    return np.stack(patterns) if patterns else np.zeros((0, num_bins))
+
+
+def get_two_theta_grid(two_theta_range : tuple[float, float] = (0, 90), num_bins : int = 4500) -> np.ndarray:
+    low, high = two_theta_range
+    bin_width = (high - low) / num_bins
+    return low + bin_width * (np.arange(num_bins) + 0.5)
+
+# ---------------------------------------------------------
+
+def enumerate_reflections(lattice_matrix : np.ndarray, min_g : float, max_g : float) -> tuple[np.ndarray, np.ndarray]:
+    """Integer (h, k, l) with min_g <= |g_hkl| <= max_g in the half of reciprocal space where (h, k, l) is
+    lexicographically positive, together with |g_hkl| = 1/d_hkl"""
+    reciprocal_matrix = np.linalg.inv(lattice_matrix).T
+    limits = np.floor(max_g * np.linalg.norm(lattice_matrix, axis=1)).astype(np.int64)
+    h, k, l = [np.arange(-limit, limit + 1) for limit in limits]
+    hkls = np.stack(np.meshgrid(h, k, l, indexing='ij'), axis=-1).reshape(-1, 3)
+    h, k, l = hkls.T
+    hkls = hkls[(h > 0) | ((h == 0) & (k > 0)) | ((h == 0) & (k == 0) & (l > 0))]
+
+    g_hkls = np.linalg.norm(hkls @ reciprocal_matrix, axis=1)
+    in_range = (g_hkls <= max_g) & (g_hkls >= min_g)
+    hkls, g_hkls = hkls[in_range], g_hkls[in_range]
+    order = np.lexsort((-hkls[:, 2], -hkls[:, 1], -hkls[:, 0], g_hkls))
+    return hkls[order], g_hkls[order]
+
+
+def get_form_factors(species_table : list[str], s2 : np.ndarray) -> np.ndarray:
+    """Atomic form factors f(s) = Z - 41.78214 * s^2 * sum_i a_i exp(-b_i s^2) of shape (len(s2), n_species),
+    the parametrization of the stored scattering parameters. Columns of void and placeholder species are zero"""
+    atom_types = [AtomType.intern(symbol=species_str) for species_str in species_table]
+    atomic_numbers = np.array([atom_type.pymatgen_type.Z if atom_type.is_standard else 0 for atom_type in atom_types],
+                              dtype=np.float64)
+    params = np.array([atom_type.scattering_params if atom_type.is_standard else (0.0,) * 8
+                       for atom_type in atom_types], dtype=np.float64).reshape(-1, 4, 2)
+    missing = np.isnan(params).any(axis=(1, 2))
+    if np.any(missing):
+        raise ValueError(f'No scattering parameters available for species {np.array(species_table)[missing].tolist()}')
+
+    a, b = params[..., 0], params[..., 1]
+    decay = np.einsum('si,msi->ms', a, np.exp(-b[np.newaxis] * s2[:, np.newaxis, np.newaxis]))
+    form_factors = atomic_numbers - 41.78214 * s2[:, np.newaxis] * decay
+    form_factors[:, atomic_numbers == 0] = 0
+    return form_factors
+
+
+def get_structure_factors(hkls : np.ndarray, coords : np.ndarray, species_ids : np.ndarray,
+                          occupancies : np.ndarray, form_factors : np.ndarray) -> np.ndarray:
+    """F_hkl = sum_s f_s(hkl) sum_{j of species s} occupancy_j exp(2 pi i hkl . x_j). The phase matrix is
+    contracted with a (n_sites x n_species) occupancy matrix, in chunks of hkl rows to bound memory"""
+    num_species = form_factors.shape[1]
+    occupancy_matrix = np.zeros((len(coords), num_species), dtype=np.complex128)
+    occupancy_matrix[np.arange(len(coords)), species_ids] = occupancies
+
+    structure_factors = np.empty(len(hkls), dtype=np.complex128)
+    chunk_rows = max(1, MAX_PHASE_ENTRIES // len(coords))
+    coords_t = 2 * math.pi * coords.T
+    for start in range(0, len(hkls), chunk_rows):
+        rows = slice(start, start + chunk_rows)
+        phases = np.exp(1j * (hkls[rows] @ coords_t))
+        structure_factors[rows] = np.sum((phases @ occupancy_matrix) * form_factors[rows], axis=1)
+    return structure_factors
+
+
+def make_empty_peaks() -> XrdPeaks:
+    return XrdPeaks(two_theta=np.zeros(0), intensities=np.zeros(0), d_spacings=np.zeros(0),
+                    multiplicities=np.zeros(0, dtype=np.int64), hkls=np.zeros((0, 3), dtype=np.int64))
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import functools
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Callable, Iterator, TypeVar
+
+F = TypeVar('F', bound=Callable)
+# ---------------------------------------------------------
+
+@dataclass
+class StageStats:
+    """Wall times include nested stages. allocated_blocks is the net change of sys.getallocatedblocks() summed over
+    all calls and only recorded with track_allocations=True"""
+    calls : int = 0
+    errors : int = 0
+    total_s : float = 0.0
+    max_s : float = 0.0
+    allocated_blocks : int = 0
+
+    @property
+    def mean_s(self) -> float:
+        return self.total_s / self.calls if self.calls else 0.0
+
+
+class Instrumentation:
+    """Opt-in per-stage call counts, wall times and allocation counts of the hot paths of CrystalStructure,
+    CrystalBase and AtomicConstants. While disabled, an instrumented call costs a single attribute check.
+    Statistics are process-wide and shared between threads"""
+    enabled : bool = False
+    track_allocations : bool = False
+    _stats : dict[str, StageStats] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def enable(cls, track_allocations : bool = False):
+        cls.track_allocations = track_allocations
+        cls.enabled = True
+
+    @classmethod
+    def disable(cls):
+        cls.enabled = False
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._stats = {}
+
+    @classmethod
+    def snapshot(cls) -> dict[str, StageStats]:
+        """Copy of the statistics recorded so far, keyed by stage name"""
+        with cls._lock:
+            return {name : StageStats(**asdict(stats)) for name, stats in cls._stats.items()}
+
+    @classmethod
+    def record(cls, stage : str, elapsed_s : float, allocated_blocks : int = 0, failed : bool = False):
+        with cls._lock:
+            stats = cls._stats.get(stage)
+            if stats is None:
+                stats = cls._stats[stage] = StageStats()
+            stats.calls += 1
+            stats.errors += failed
+            stats.total_s += elapsed_s
+            stats.max_s = max(stats.max_s, elapsed_s)
+            stats.allocated_blocks += allocated_blocks
+
+    # ---------------------------------------------------------
+    # export
+
+    @classmethod
+    def to_dict(cls) -> dict[str, dict]:
+        return {name : {**asdict(stats), 'mean_s' : stats.mean_s} for name, stats in sorted(cls.snapshot().items())}
+
+    @classmethod
+    def to_prometheus(cls, prefix : str = 'crystalstructure') -> str:
+        """Statistics in the Prometheus text exposition format, one sample per stage and metric"""
+        snapshot = sorted(cls.snapshot().items())
+        metrics = [('stage_calls_total', 'counter', 'Number of calls of the stage', lambda s : s.calls),
+                   ('stage_errors_total', 'counter', 'Number of calls of the stage that raised', lambda s : s.errors),
+                   ('stage_seconds_total', 'counter', 'Cumulative wall time of the stage', lambda s : s.total_s),
+                   ('stage_seconds_max', 'gauge', 'Longest wall time of a single call', lambda s : s.max_s),
+                   ('stage_allocated_blocks', 'gauge', 'Net number of memory blocks allocated by the stage',
+                    lambda s : s.allocated_blocks)]
+
+        lines = []
+        for suffix, metric_type, description, get_value in metrics:
+            metric_name = f'{prefix}_{suffix}'
+            lines.append(f'# HELP {metric_name} {description}')
+            lines.append(f'# TYPE {metric_name} {metric_type}')
+            for stage, stats in snapshot:
+                lines.append(f'{metric_name}{{stage="{escape_label(stage)}"}} {get_value(stats)!r}')
+        return '\n'.join(lines) + '\n'
+
+
+@contextmanager
+def instrumented(track_allocations : bool = False, reset : bool = False) -> Iterator[type[Instrumentation]]:
+    """Enables instrumentation within the block and restores the previous setting afterwards"""
+    previous = Instrumentation.enabled, Instrumentation.track_allocations
+    if reset:
+        Instrumentation.reset()
+    Instrumentation.enable(track_allocations=track_allocations)
+    try:
+        yield Instrumentation
+    finally:
+        Instrumentation.enabled, Instrumentation.track_allocations = previous
+
+
+@contextmanager
+def stage(name : str) -> Iterator[None]:
+    """Records the enclosed block as one call of the stage if instrumentation is enabled"""
+    if not Instrumentation.enabled:
+        yield
+        return
+
+    track_allocations = Instrumentation.track_allocations
+    blocks = sys.getallocatedblocks() if track_allocations else 0
+    start = time.perf_counter()
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        elapsed_s = time.perf_counter() - start
+        blocks = sys.getallocatedblocks() - blocks if track_allocations else 0
+        Instrumentation.record(stage=name, elapsed_s=elapsed_s, allocated_blocks=blocks, failed=failed)
+
+
+def timed(name : str) -> Callable[[F], F]:
+    """Decorator recording every call of the function as one call of the stage"""
+    def decorator(func : F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not Instrumentation.enabled:
+                return func(*args, **kwargs)
+            with stage(name=name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def escape_label(value : str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,6 @@
+from .ingestion import IngestionResult, ingest_cifs, iter_cif_sources
+from .dataset import CrystalDataset, CrystalDatasetWriter, DatasetBatch, write_dataset
+from .jsonl import JsonlWriter, iter_jsonl, write_jsonl, count_jsonl
+from .sharded import ShardedDataset, ShardedDatasetWriter, write_sharded, get_shard, read_manifest
+from .convert import ConversionReport, convert_cifs
+from .query import CrystalIndex, Column, contains, contains_any, contains_only, index_dataset
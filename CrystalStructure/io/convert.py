@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterator, Literal, Optional
+
+from CrystalStructure.crystal import CrystalStructure
+from .dataset import CrystalDataset, CrystalDatasetWriter
+from .ingestion import ingest_cifs, iter_cif_names
+from .jsonl import write_jsonl, resolve_compression
+from .sharded import write_json_atomic
+
+OutputFormat = Literal['dataset', 'jsonl']
+STAGING_SUFFIX = '.partial'
+STATE_FNAME = 'state.json'
+# ---------------------------------------------------------
+
+@dataclass
+class ConversionReport:
+    """Progress of convert_cifs. processed counts the CIFs of the source handled so far, including the
+    resumed_from CIFs of earlier runs; throughput only refers to the current run"""
+    processed : int = 0
+    written : int = 0
+    failed : int = 0
+    resumed_from : int = 0
+    elapsed : float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        return (self.processed - self.resumed_from) / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def convert_cifs(source : str, output_fpath : str, num_workers : Optional[int] = None,
+                 calculate_properties : bool = False, standardize : bool = False, density : Optional[float] = None,
+                 checkpoint_every : int = 1000, failure_log_fpath : Optional[str] = None, restart : bool = False,
+                 progress_callback : Optional[Callable[[ConversionReport], None]] = None,
+                 progress_interval : float = 0.5) -> ConversionReport:
+    """Converts the CIFs of a directory, glob pattern, tar archive or file into a CrystalDataset file, or a JSON
+    lines file if output_fpath ends in .jsonl (optionally compressed). Every crystal is optionally standardized,
+    scaled to the given packing density and has its properties calculated, in that order, on num_workers processes.
+
+    Every checkpoint_every CIFs the converted crystals are committed as a dataset part in the staging directory
+    output_fpath + '.partial' and CIFs that failed are appended to the failure log (JSON lines of name and
+    error, default output_fpath + '.failures.jsonl'). Running the same conversion again after an interruption
+    resumes after the last commit, provided the CIFs committed so far are still the first CIFs of the source;
+    restart=True discards it instead. The output file is assembled from the parts once all CIFs are processed"""
+    if checkpoint_every < 1:
+        raise ValueError(f'Checkpoint interval must be positive, got {checkpoint_every}')
+    output_fpath = os.path.abspath(output_fpath)
+    output_format = get_output_format(fpath=output_fpath)
+    staging_dirpath = output_fpath + STAGING_SUFFIX
+    failure_log_fpath = failure_log_fpath or output_fpath + '.failures.jsonl'
+    options = {'source' : os.path.abspath(source) if os.path.exists(source) else source,
+               'calculate_properties' : calculate_properties, 'standardize' : standardize, 'density' : density}
+
+    if restart:
+        shutil.rmtree(staging_dirpath, ignore_errors=True)
+    state = open_state(staging_dirpath=staging_dirpath, options=options)
+    check_source(source=source, state=state)
+    truncate_lines(fpath=failure_log_fpath, num_lines=state['failed'])
+    report = ConversionReport(processed=state['processed'], written=state['written'], failed=state['failed'],
+                              resumed_from=state['processed'])
+
+    names_digest = state['names_digest']
+    process = functools.partial(process_crystal, standardize=standardize, density=density,
+                                calculate_properties=calculate_properties)
+    crystals, failures = [], []
+    start_time, last_progress = time.perf_counter(), 0.0
+    for result in ingest_cifs(source=source, num_workers=num_workers, process=process, start=report.processed):
+        report.processed += 1
+        names_digest = chain_digest(digest=names_digest, name=result.name)
+        if result.is_ok:
+            crystals.append(result.crystal)
+            report.written += 1
+        else:
+            failures.append({'name' : result.name, 'error' : result.error})
+            report.failed += 1
+        if len(crystals) + len(failures) >= checkpoint_every:
+            commit(staging_dirpath=staging_dirpath, state=state, report=report, names_digest=names_digest,
+                   crystals=crystals, failures=failures, failure_log_fpath=failure_log_fpath)
+            crystals, failures = [], []
+
+        report.elapsed = time.perf_counter() - start_time
+        if progress_callback and report.elapsed - last_progress >= progress_interval:
+            last_progress = report.elapsed
+            progress_callback(report)
+
+    commit(staging_dirpath=staging_dirpath, state=state, report=report, names_digest=names_digest,
+           crystals=crystals, failures=failures, failure_log_fpath=failure_log_fpath)
+    assemble(staging_dirpath=staging_dirpath, num_parts=state['num_parts'], output_fpath=output_fpath,
+             output_format=output_format)
+    shutil.rmtree(staging_dirpath, ignore_errors=True)
+
+    report.elapsed = time.perf_counter() - start_time
+    if progress_callback:
+        progress_callback(report)
+    return report
+
+
+def process_crystal(crystal : CrystalStructure, standardize : bool = False, density : Optional[float] = None,
+                    calculate_properties : bool = False) -> CrystalStructure:
+    if standardize:
+        crystal = crystal.get_standardized()
+    if not density is None:
+        crystal.scale(target_density=density)
+    if calculate_properties:
+        crystal.calculate_properties()
+    return crystal
+
+
+def get_output_format(fpath : str) -> OutputFormat:
+    fname = os.path.basename(fpath).lower()
+    return 'jsonl' if fname.endswith('.jsonl') or '.jsonl.' in fname else 'dataset'
+
+# ---------------------------------------------------------
+
+def open_state(staging_dirpath : str, options : dict) -> dict:
+    """State of the conversion staged in the directory, a fresh one if there is none"""
+    state_fpath = os.path.join(staging_dirpath, STATE_FNAME)
+    if not os.path.isfile(state_fpath):
+        os.makedirs(staging_dirpath, exist_ok=True)
+        return {'options' : options, 'processed' : 0, 'written' : 0, 'failed' : 0, 'num_parts' : 0,
+                'names_digest' : ''}
+
+    with open(state_fpath, 'r') as file:
+        state = json.load(file)
+    if state['options'] != options:
+        raise ValueError(f'{staging_dirpath} holds a conversion with options {state["options"]}, got {options}; '
+                         f'restart the conversion to discard it')
+    return state
+
+
+def check_source(source : str, state : dict):
+    """Raises if the first CIFs of the source are not the ones processed before the checkpoint, as resuming
+    would then skip or repeat the wrong CIFs"""
+    if state['processed'] == 0:
+        return
+    names_digest = ''
+    for name in itertools.islice(iter_cif_names(source=source), state['processed']):
+        names_digest = chain_digest(digest=names_digest, name=name)
+    if names_digest != state['names_digest']:
+        raise ValueError(f'The CIFs of {source} changed since {state["processed"]} of them were converted; '
+                         f'restart the conversion to discard the checkpoint')
+
+
+def chain_digest(digest : str, name : str) -> str:
+    """Digest of the CIF names processed so far, extended by one name"""
+    return hashlib.sha256(f'{digest}\n{name}'.encode('utf-8')).hexdigest()
+
+
+def commit(staging_dirpath : str, state : dict, report : ConversionReport, names_digest : str,
+           crystals : list[CrystalStructure], failures : list[dict], failure_log_fpath : str):
+    """Publishes the crystals as the next part, appends the failures to the log and records the progress.
+    Writing the state is the commit point: anything written after the last state is redone on resume"""
+    if crystals:
+        with CrystalDatasetWriter(fpath=get_part_fpath(staging_dirpath=staging_dirpath,
+                                                       part_index=state['num_parts'])) as writer:
+            writer.add_all(crystals=crystals)
+        state['num_parts'] += 1
+    if failures:
+        with open(failure_log_fpath, 'a', encoding='utf-8') as file:
+            file.write(''.join(json.dumps(failure) + '\n' for failure in failures))
+    state.update(processed=report.processed, written=state['written'] + len(crystals),
+                 failed=state['failed'] + len(failures), names_digest=names_digest)
+    write_json_atomic(fpath=os.path.join(staging_dirpath, STATE_FNAME), content=state)
+
+
+def assemble(staging_dirpath : str, num_parts : int, output_fpath : str, output_format : OutputFormat):
+    def iter_crystals() -> Iterator[CrystalStructure]:
+        for part_index in range(num_parts):
+            yield from CrystalDataset(fpath=get_part_fpath(staging_dirpath=staging_dirpath, part_index=part_index))
+
+    tmp_fpath = os.path.join(staging_dirpath, 'output.tmp')
+    if output_format == 'jsonl':
+        write_jsonl(fpath=tmp_fpath, crystals=iter_crystals(), compression=resolve_compression(fpath=output_fpath))
+    else:
+        with CrystalDatasetWriter(fpath=tmp_fpath) as writer:
+            writer.add_all(crystals=iter_crystals())
+    os.replace(tmp_fpath, output_fpath)
+
+
+def get_part_fpath(staging_dirpath : str, part_index : int) -> str:
+    return os.path.join(staging_dirpath, f'part-{part_index:06d}.dataset')
+
+
+def truncate_lines(fpath : str, num_lines : int):
+    """Keeps the first num_lines lines of the file, creating it if missing"""
+    if not os.path.isfile(fpath):
+        open(fpath, 'w').close()
+        return
+    with open(fpath, 'rb+') as file:
+        for _ in range(num_lines):
+            if not file.readline():
+                break
+        file.truncate(file.tell())
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import struct
+import tempfile
+from dataclasses import dataclass
+from typing import Iterable, Optional, Union
+
+import numpy as np
+
+from CrystalStructure.crystal import CrystalStructure, ColumnarBase, Lengths, Angles
+from CrystalStructure.crystal.binary import CRYSTAL_SYSTEMS, nan_if_none, none_if_nan
+
+DATASET_MAGIC = b'CSDS'
+DATASET_VERSION = 1
+ALIGNMENT = 64
+_HEADER = struct.Struct('<4sHQQQQ')
+
+# Sections in file order: (name, dtype, trailing shape, length key). Length keys refer to the header counts:
+# crystals (n), crystals + 1, sites (N), wyckoff symbols of all crystals (M) and bytes of the species table json
+SECTIONS = (
+    ('site_offsets', '<i8', (), 'crystals+1'),
+    ('lattice', '<f8', (6,), 'crystals'),
+    ('spacegroups', '<i4', (), 'crystals'),
+    ('volumes_uc', '<f8', (), 'crystals'),
+    ('atomic_volumes', '<f8', (), 'crystals'),
+    ('crystal_systems', '<u1', (), 'crystals'),
+    ('has_wyckoff_symbols', '<u1', (), 'crystals'),
+    ('wyckoff_offsets', '<i8', (), 'crystals+1'),
+    ('wyckoff_symbols', '<U1', (), 'wyckoffs'),
+    ('coords', '<f8', (3,), 'sites'),
+    ('occupancies', '<f8', (), 'sites'),
+    ('species_ids', '<u2', (), 'sites'),
+    ('wyckoff_letters', '<U1', (), 'sites'),
+    ('species_table', '<u1', (), 'species_bytes'),
+)
+# ---------------------------------------------------------
+
+@dataclass
+class DatasetBatch:
+    """Zero-copy views of a contiguous range of crystals. Site columns hold the sites of all crystals in the range,
+    site_offsets (relative to the range) delimit the sites of each crystal"""
+    site_offsets : np.ndarray
+    lattice : np.ndarray
+    spacegroups : np.ndarray
+    volumes_uc : np.ndarray
+    coords : np.ndarray
+    occupancies : np.ndarray
+    species_ids : np.ndarray
+
+
+class CrystalDataset:
+    """Read-only, memory-mapped collection of crystals stored in a single file written by CrystalDatasetWriter.
+    Indexing materializes CrystalStructures with a ColumnarBase, column properties and get_batch return views into
+    the mapped file, so several processes opening the same file share it through the page cache"""
+    def __init__(self, fpath : str):
+        self.fpath : str = fpath
+        self._mmap = np.memmap(fpath, dtype=np.uint8, mode='r')
+        magic, version, num_crystals, num_sites, num_wyckoffs, species_bytes = _HEADER.unpack_from(self._mmap, 0)
+        if magic != DATASET_MAGIC:
+            raise ValueError(f'File {fpath} is not a crystal dataset')
+        if version > DATASET_VERSION:
+            raise ValueError(f'Dataset version {version} is newer than supported version {DATASET_VERSION}')
+
+        counts = get_section_counts(num_crystals, num_sites, num_wyckoffs, species_bytes)
+        self._columns : dict[str, np.ndarray] = {}
+        offset = align(_HEADER.size)
+        for name, dtype, shape, length_key in SECTIONS:
+            dtype = np.dtype(dtype)
+            length = counts[length_key]
+            self._columns[name] = np.ndarray(shape=(length, *shape), dtype=dtype, buffer=self._mmap, offset=offset)
+            offset = align(offset + length * dtype.itemsize * int(np.prod(shape)))
+        self.species_table : list[str] = json.loads(self._columns['species_table'].tobytes().decode('utf-8'))
+
+    def __getstate__(self):
+        return {'fpath' : self.fpath}
+
+    def __setstate__(self, state):
+        self.__init__(state['fpath'])
+
+    # ---------------------------------------------------------
+    # columns
+
+    @property
+    def lattice(self) -> np.ndarray:
+        return self._columns['lattice']
+
+    @property
+    def spacegroups(self) -> np.ndarray:
+        """Spacegroup numbers, -1 where unknown"""
+        return self._columns['spacegroups']
+
+    @property
+    def volumes_uc(self) -> np.ndarray:
+        return self._columns['volumes_uc']
+
+    @property
+    def atomic_volumes(self) -> np.ndarray:
+        return self._columns['atomic_volumes']
+
+    @property
+    def crystal_systems(self) -> np.ndarray:
+        """Crystal system codes: 0 where unknown, otherwise 1 + index into CRYSTAL_SYSTEMS"""
+        return self._columns['crystal_systems']
+
+    @property
+    def site_offsets(self) -> np.ndarray:
+        return self._columns['site_offsets']
+
+    @property
+    def num_atoms(self) -> np.ndarray:
+        return np.diff(self.site_offsets)
+
+    # ---------------------------------------------------------
+    # access
+
+    def __len__(self):
+        return len(self.lattice)
+
+    def __getitem__(self, item : Union[int, slice]) -> Union[CrystalStructure, list[CrystalStructure]]:
+        if isinstance(item, slice):
+            return [self.get_crystal(index) for index in range(len(self))[item]]
+        return self.get_crystal(index=item)
+
+    def __iter__(self):
+        return (self.get_crystal(index) for index in range(len(self)))
+
+    def get_batch(self, start : int, stop : int) -> DatasetBatch:
+        start, stop, _ = slice(start, stop).indices(len(self))
+        site_start, site_stop = self.site_offsets[start], self.site_offsets[stop]
+        return DatasetBatch(site_offsets=self.site_offsets[start:stop + 1] - site_start,
+                            lattice=self.lattice[start:stop], spacegroups=self.spacegroups[start:stop],
+                            volumes_uc=self.volumes_uc[start:stop],
+                            coords=self._columns['coords'][site_start:site_stop],
+                            occupancies=self._columns['occupancies'][site_start:site_stop],
+                            species_ids=self._columns['species_ids'][site_start:site_stop])
+
+    def get_crystal(self, index : int) -> CrystalStructure:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f'Crystal index {index} out of range for dataset with {len(self)} crystals')
+
+        columns = self._columns
+        site_slice = slice(self.site_offsets[index], self.site_offsets[index + 1])
+        species_ids = columns['species_ids'][site_slice]
+        local_ids, inverse = np.unique(species_ids, return_inverse=True)
+        base = ColumnarBase.from_arrays(coords=columns['coords'][site_slice], occupancies=columns['occupancies'][site_slice],
+                                        species_ids=inverse, species_table=[self.species_table[i] for i in local_ids],
+                                        wyckoff_letters=columns['wyckoff_letters'][site_slice])
+
+        wyckoff_symbols = None
+        if columns['has_wyckoff_symbols'][index]:
+            wyckoff_slice = slice(columns['wyckoff_offsets'][index], columns['wyckoff_offsets'][index + 1])
+            wyckoff_symbols = columns['wyckoff_symbols'][wyckoff_slice].tolist()
+
+        a, b, c, alpha, beta, gamma = [none_if_nan(x) for x in self.lattice[index].tolist()]
+        system_code = int(self.crystal_systems[index])
+        spacegroup = int(self.spacegroups[index])
+        return CrystalStructure(lengths=Lengths(a=a, b=b, c=c), angles=Angles(alpha=alpha, beta=beta, gamma=gamma),
+                                base=base, spacegroup=None if spacegroup < 0 else spacegroup,
+                                volume_uc=none_if_nan(float(self.volumes_uc[index])),
+                                atomic_volume=none_if_nan(float(self.atomic_volumes[index])),
+                                wyckoff_symbols=wyckoff_symbols,
+                                crystal_system=None if system_code == 0 else CRYSTAL_SYSTEMS[system_code - 1])
+
+
+class CrystalDatasetWriter:
+    """Streams crystals into column files in a temporary directory next to fpath and assembles the final
+    dataset file on close, so memory use does not grow with the number of crystals"""
+    def __init__(self, fpath : str):
+        self.fpath : str = os.path.abspath(fpath)
+        self._tmp_dirpath = tempfile.mkdtemp(dir=os.path.dirname(self.fpath), prefix='.dataset_')
+        self._files = {name : open(os.path.join(self._tmp_dirpath, name), 'wb') for name, *_ in SECTIONS}
+        self._species_indices : dict[str, int] = {}
+        self._num_crystals, self._num_sites, self._num_wyckoffs = 0, 0, 0
+
+    def __enter__(self) -> CrystalDatasetWriter:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._discard()
+
+    def add_all(self, crystals : Iterable[CrystalStructure]):
+        for crystal in crystals:
+            self.add(crystal=crystal)
+
+    def add(self, crystal : CrystalStructure):
+        base = crystal.base.to_columnar()
+        id_map = np.array([self._intern(symbol) for symbol in base.species_table], dtype='<u2')
+        wyckoff_symbols = crystal.get_cached('wyckoff_symbols')
+        spacegroup, crystal_system = crystal.get_cached('spacegroup'), crystal.get_cached('crystal_system')
+
+        self._write('lattice', np.array([nan_if_none(x) for x in (*crystal.lengths, *crystal.angles)], dtype='<f8'))
+        self._write('spacegroups', np.array([-1 if spacegroup is None else spacegroup], dtype='<i4'))
+        self._write('volumes_uc', np.array([nan_if_none(crystal.get_cached('volume_uc'))], dtype='<f8'))
+        self._write('atomic_volumes', np.array([nan_if_none(crystal.get_cached('atomic_volume'))], dtype='<f8'))
+        system_code = 0 if crystal_system is None else CRYSTAL_SYSTEMS.index(crystal_system) + 1
+        self._write('crystal_systems', np.array([system_code], dtype='<u1'))
+        self._write('has_wyckoff_symbols', np.array([not wyckoff_symbols is None], dtype='<u1'))
+        self._write('wyckoff_symbols', np.array(wyckoff_symbols or [], dtype='<U1'))
+        self._write('site_offsets', np.array([len(base)], dtype='<i8'))
+        self._write('wyckoff_offsets', np.array([len(wyckoff_symbols or [])], dtype='<i8'))
+        self._write('coords', base.coords.astype('<f8'))
+        self._write('occupancies', base.occupancies.astype('<f8'))
+        self._write('species_ids', id_map[base.species_ids] if len(base) > 0 else np.zeros(0, dtype='<u2'))
+        self._write('wyckoff_letters', base.wyckoff_letters.astype('<U1'))
+
+        self._num_crystals += 1
+        self._num_sites += len(base)
+        self._num_wyckoffs += len(wyckoff_symbols or [])
+
+    def close(self):
+        for file in self._files.values():
+            file.close()
+        species_json = json.dumps(list(self._species_indices)).encode('utf-8')
+
+        tmp_fpath = os.path.join(self._tmp_dirpath, 'dataset')
+        with open(tmp_fpath, 'wb') as out:
+            out.write(_HEADER.pack(DATASET_MAGIC, DATASET_VERSION, self._num_crystals, self._num_sites,
+                                   self._num_wyckoffs, len(species_json)))
+            for name, *_ in SECTIONS:
+                out.write(b'\0' * (align(out.tell()) - out.tell()))
+                # offset columns are written as per-crystal lengths and accumulated here
+                if name in ['site_offsets', 'wyckoff_offsets']:
+                    lengths = np.fromfile(os.path.join(self._tmp_dirpath, name), dtype='<i8')
+                    out.write(np.concatenate([[0], np.cumsum(lengths)]).astype('<i8').tobytes())
+                elif name == 'species_table':
+                    out.write(species_json)
+                else:
+                    with open(os.path.join(self._tmp_dirpath, name), 'rb') as column_file:
+                        shutil.copyfileobj(column_file, out)
+        os.replace(tmp_fpath, self.fpath)
+        self._discard()
+
+    # ---------------------------------------------------------
+
+    def _write(self, name : str, array : np.ndarray):
+        self._files[name].write(np.ascontiguousarray(array).tobytes())
+
+    def _intern(self, species_str : str) -> int:
+        species_id = self._species_indices.setdefault(species_str, len(self._species_indices))
+        if species_id > np.iinfo(np.uint16).max:
+            raise ValueError(f'Datasets support at most {np.iinfo(np.uint16).max + 1} distinct species')
+        return species_id
+
+    def _discard(self):
+        for file in self._files.values():
+            file.close()
+        shutil.rmtree(self._tmp_dirpath, ignore_errors=True)
+
+
+def write_dataset(fpath : str, crystals : Iterable[CrystalStructure]) -> CrystalDataset:
+    with CrystalDatasetWriter(fpath=fpath) as writer:
+        writer.add_all(crystals=crystals)
+    return CrystalDataset(fpath=fpath)
+
+# ---------------------------------------------------------
+
+def get_section_counts(num_crystals : int, num_sites : int, num_wyckoffs : int, species_bytes : int) -> dict[str, int]:
+    return {'crystals' : num_crystals, 'crystals+1' : num_crystals + 1, 'sites' : num_sites,
+            'wyckoffs' : num_wyckoffs, 'species_bytes' : species_bytes}
+
+def align(offset : int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import glob
+import itertools
+import os
+import tarfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Optional, Iterable, Iterator, Union, Callable
+
+from holytools.logging import LoggerFactory
+
+from CrystalStructure.crystal import CrystalStructure
+
+logger = LoggerFactory.get_logger(name=__name__)
+CifSource = Union[str, Iterable[str]]
+CrystalProcessor = Callable[[CrystalStructure], CrystalStructure]
+# ---------------------------------------------------------
+
+@dataclass
+class IngestionResult:
+    """Outcome of parsing one CIF: either crystal or error is set"""
+    name : str
+    crystal : Optional[CrystalStructure] = None
+    error : Optional[str] = None
+
+    @property
+    def is_ok(self) -> bool:
+        return self.error is None
+
+
+def ingest_cifs(source : CifSource, num_workers : Optional[int] = None, calculate_properties : bool = False,
+                preserve_order : bool = True, max_in_flight : Optional[int] = None,
+                process : Optional[CrystalProcessor] = None, start : int = 0) -> Iterator[IngestionResult]:
+    """Parses CIFs from a directory, glob pattern, tar archive, single file or an iterable of CIF strings
+    and yields one IngestionResult per CIF. Parsing is fanned out to num_workers processes
+    (num_workers=0 parses in the calling process) with at most max_in_flight CIFs queued at any time.
+    A CIF that fails to parse yields a result carrying the error instead of aborting the run. If a worker process
+    dies (e.g. killed for running out of memory), the CIFs in flight are reported as failed and the pool restarted.
+    process, a picklable function, is applied to every parsed crystal in the worker; its errors are reported
+    like parsing errors. The first start CIFs of the source are skipped, e.g. to resume an interrupted run"""
+    cifs = itertools.islice(iter_cif_sources(source=source), start, None)
+    if num_workers == 0:
+        for name, cif_content in cifs:
+            result = parse_cif(name=name, cif_content=cif_content, calculate_properties=calculate_properties,
+                               process=process)
+            yield _log_failure(result)
+        return
+
+    num_workers = num_workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 4 * num_workers
+    pool = _RestartingPool(num_workers=num_workers)
+    pending : deque[tuple[str, Future]] = deque()
+    try:
+        for name, cif_content in cifs:
+            pending.append((name, pool.submit(parse_cif, name, cif_content, calculate_properties, process)))
+            if len(pending) >= max_in_flight:
+                yield from _collect(pending=pending, preserve_order=preserve_order, drain=False)
+        yield from _collect(pending=pending, preserve_order=preserve_order, drain=True)
+    finally:
+        for _, future in pending:
+            future.cancel()
+        pool.shutdown()
+
+
+def iter_cif_sources(source : CifSource) -> Iterator[tuple[str, str]]:
+    """Yields (name, cif_content) pairs; files are read lazily so only CIFs in flight are held in memory"""
+    if not isinstance(source, str):
+        for index, cif_content in enumerate(source):
+            yield f'<{index}>', cif_content
+        return
+
+    if _is_tar(source=source):
+        yield from _iter_tar(fpath=source)
+        return
+    for fpath in _get_cif_fpaths(source=source):
+        with open(fpath, 'r') as f:
+            yield fpath, f.read()
+
+
+def iter_cif_names(source : str) -> Iterator[str]:
+    """Names of the CIFs iter_cif_sources yields for a path or glob source, in the same order, without reading
+    the CIF files (tar archives are still scanned)"""
+    if _is_tar(source=source):
+        yield from (name for name, _ in _iter_tar(fpath=source, read=False))
+        return
+    yield from _get_cif_fpaths(source=source)
+
+
+def parse_cif(name : str, cif_content : str, calculate_properties : bool = False,
+              process : Optional[CrystalProcessor] = None) -> IngestionResult:
+    try:
+        crystal = CrystalStructure.from_cif(cif_content=cif_content)
+        if calculate_properties:
+            crystal.calculate_properties()
+        if not process is None:
+            crystal = process(crystal)
+    except Exception as e:
+        return IngestionResult(name=name, error=f'{type(e).__name__}: {e}')
+    return IngestionResult(name=name, crystal=crystal)
+
+# ---------------------------------------------------------
+
+def _is_tar(source : str) -> bool:
+    return os.path.isfile(source) and tarfile.is_tarfile(source)
+
+
+def _get_cif_fpaths(source : str) -> list[str]:
+    if os.path.isdir(source):
+        return sorted(glob.glob(os.path.join(source, '**', '*.cif'), recursive=True))
+    if os.path.isfile(source):
+        return [source]
+    fpaths = sorted(glob.glob(source, recursive=True))
+    if not fpaths:
+        raise FileNotFoundError(f'No CIF files found for source "{source}"')
+    return fpaths
+
+
+def _iter_tar(fpath : str, read : bool = True) -> Iterator[tuple[str, Optional[str]]]:
+    with tarfile.open(fpath, mode='r:*') as archive:
+        for member in archive:
+            if not member.isfile() or not member.name.endswith('.cif'):
+                continue
+            if not read:
+                yield f'{fpath}/{member.name}', None
+                continue
+            file = archive.extractfile(member)
+            yield f'{fpath}/{member.name}', file.read().decode('utf-8', errors='replace')
+
+
+class _RestartingPool:
+    """Process pool that is replaced by a fresh one once a dead worker has broken it"""
+    def __init__(self, num_workers : int):
+        self.num_workers : int = num_workers
+        self.executor : ProcessPoolExecutor = ProcessPoolExecutor(max_workers=num_workers)
+
+    def submit(self, fn : Callable, *args) -> Future:
+        try:
+            return self.executor.submit(fn, *args)
+        except BrokenProcessPool:
+            logger.warning(msg='A worker process died, restarting the process pool')
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = ProcessPoolExecutor(max_workers=self.num_workers)
+            return self.executor.submit(fn, *args)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _collect(pending : deque[tuple[str, Future]], preserve_order : bool, drain : bool) -> Iterator[IngestionResult]:
+    while pending:
+        if preserve_order:
+            name, future = pending.popleft()
+        else:
+            done, _ = wait([future for _, future in pending], return_when=FIRST_COMPLETED)
+            name, future = next(entry for entry in pending if entry[1] in done)
+            pending.remove((name, future))
+        yield _log_failure(_get_result(name=name, future=future))
+        if not drain:
+            return
+
+
+def _get_result(name : str, future : Future) -> IngestionResult:
+    try:
+        return future.result()
+    except BrokenProcessPool as e:
+        return IngestionResult(name=name, error=f'BrokenProcessPool: worker process died while the CIF was in flight ({e})')
+
+
+def _log_failure(result : IngestionResult) -> IngestionResult:
+    if not result.is_ok:
+        logger.warning(msg=f'Failed to parse CIF {result.name}: {result.error}')
+    return result
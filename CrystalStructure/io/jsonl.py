@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import bz2
+import dataclasses
+import gzip
+import json
+import lzma
+import os
+import tempfile
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional, Literal, IO, Any, Union, get_type_hints, get_origin, get_args
+
+from holytools.abstract import JsonDataclass
+from holytools.logging import LoggerFactory
+
+from CrystalStructure.crystal import CrystalStructure
+
+logger = LoggerFactory.get_logger(name=__name__)
+Compression = Literal['gzip', 'bz2', 'xz']
+COMPRESSION_SUFFIXES = {'.gz' : 'gzip', '.gzip' : 'gzip', '.bz2' : 'bz2', '.xz' : 'xz', '.lzma' : 'xz'}
+OPENERS = {'gzip' : gzip.open, 'bz2' : bz2.open, 'xz' : lzma.open}
+CRYSTAL_FIELDS = tuple(field.name for field in dataclasses.fields(CrystalStructure) if field.init)
+# ---------------------------------------------------------
+
+class JsonlWriter:
+    """Writes one CrystalStructure.to_str() per line. Lines are buffered and written in bulk every buffer_size
+    crystals. With append=True an existing file is continued after its last complete line, so an interrupted
+    run can be resumed by skipping count_jsonl(fpath) crystals of the input"""
+    def __init__(self, fpath : str, append : bool = False, compression : Union[Compression, None, str] = 'infer',
+                 buffer_size : int = 1000):
+        self.fpath : str = fpath
+        self.compression : Optional[Compression] = resolve_compression(fpath=fpath, compression=compression)
+        self.buffer_size : int = buffer_size
+        self.num_written : int = 0
+        self._buffer : list[str] = []
+        if append and os.path.isfile(fpath):
+            repair_tail(fpath=fpath, compression=self.compression)
+        self._file : IO[str] = open_text(fpath=fpath, mode='a' if append else 'w', compression=self.compression)
+
+    def __enter__(self) -> JsonlWriter:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write_all(self, crystals : Iterable[CrystalStructure]):
+        for crystal in crystals:
+            self.write(crystal=crystal)
+
+    def write(self, crystal : CrystalStructure):
+        self._buffer.append(crystal.to_str())
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._file.write('\n'.join(self._buffer) + '\n')
+            self.num_written += len(self._buffer)
+            self._buffer = []
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+
+def write_jsonl(fpath : str, crystals : Iterable[CrystalStructure], append : bool = False,
+                compression : Union[Compression, None, str] = 'infer', buffer_size : int = 1000) -> int:
+    """Streams crystals to a JSON lines file and returns the number of crystals written"""
+    with JsonlWriter(fpath=fpath, append=append, compression=compression, buffer_size=buffer_size) as writer:
+        writer.write_all(crystals=crystals)
+    return writer.num_written
+
+
+def iter_jsonl(fpath : str, fields : Optional[Iterable[str]] = None,
+               compression : Union[Compression, None, str] = 'infer') -> Iterator[Union[CrystalStructure, dict[str, Any]]]:
+    """Yields the crystals of a JSON lines file one at a time. If fields is given, only those CrystalStructure
+    fields are decoded and yielded as a dict; leaving out 'base' skips decoding the sites altogether.
+    A truncated last line, as left behind by an interrupted writer, is skipped with a warning"""
+    if not fields is None:
+        fields = tuple(fields)
+        unknown = set(fields) - set(CRYSTAL_FIELDS)
+        if unknown:
+            raise ValueError(f'Unknown CrystalStructure fields {sorted(unknown)}; available are {CRYSTAL_FIELDS}')
+
+    for line in iter_complete_lines(fpath=fpath, compression=resolve_compression(fpath, compression)):
+        if fields is None:
+            yield CrystalStructure.from_str(line)
+        else:
+            json_dict = json.loads(line)
+            yield {name : decode_field(name=name, entry=json_dict.get(name)) for name in fields}
+
+
+def count_jsonl(fpath : str, compression : Union[Compression, None, str] = 'infer') -> int:
+    """Number of complete crystal lines in the file"""
+    return sum(1 for _ in iter_complete_lines(fpath=fpath, compression=resolve_compression(fpath, compression)))
+
+# ---------------------------------------------------------
+
+def decode_field(name : str, entry : Any) -> Any:
+    """Decodes one entry of a CrystalStructure.to_str() dict the same way CrystalStructure.from_str does"""
+    if entry is None:
+        return None
+    dtype = _get_field_types()[name]
+    if get_origin(dtype) is list:
+        item_type = get_args(dtype)[0]
+        return [JsonDataclass.make_basic(basic_cls=item_type, s=item) for item in entry]
+    return JsonDataclass.make_basic(basic_cls=dtype, s=entry)
+
+
+@lru_cache(maxsize=None)
+def _get_field_types() -> dict[str, type]:
+    field_types = {}
+    for name, dtype in get_type_hints(CrystalStructure).items():
+        if get_origin(dtype) is Union:
+            dtype = next(arg for arg in get_args(dtype) if not arg is type(None))
+        field_types[name] = dtype
+    return field_types
+
+
+def iter_complete_lines(fpath : str, compression : Optional[Compression]) -> Iterator[str]:
+    with open_text(fpath=fpath, mode='r', compression=compression) as file:
+        try:
+            for line in file:
+                if not line.endswith('\n'):
+                    logger.warning(msg=f'Skipping truncated last line of {fpath}')
+                    return
+                if line.strip():
+                    yield line
+        except EOFError:
+            logger.warning(msg=f'Compressed stream {fpath} ends prematurely, skipping its truncated tail')
+
+
+def repair_tail(fpath : str, compression : Optional[Compression]):
+    """Drops a partially written last line so that appended lines start on a fresh line. Compressed files
+    cannot be truncated in place and are rewritten if their stream is incomplete"""
+    if compression is None:
+        with open(fpath, 'rb+') as file:
+            end = file.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                chunk_start = max(0, position - 65536)
+                file.seek(chunk_start)
+                newline_index = file.read(position - chunk_start).rfind(b'\n')
+                if newline_index >= 0:
+                    file.truncate(chunk_start + newline_index + 1)
+                    return
+                position = chunk_start
+            file.truncate(0)
+        return
+
+    try:
+        with open_text(fpath=fpath, mode='r', compression=compression) as file:
+            last_line = ''
+            for last_line in file:
+                pass
+        if last_line == '' or last_line.endswith('\n'):
+            return
+    except EOFError:
+        pass
+
+    tmp_fd, tmp_fpath = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(fpath)), prefix='.jsonl_')
+    os.close(tmp_fd)
+    with open_text(fpath=tmp_fpath, mode='w', compression=compression) as out:
+        for line in iter_complete_lines(fpath=fpath, compression=compression):
+            out.write(line)
+    os.replace(tmp_fpath, fpath)
+
+
+def open_text(fpath : str, mode : str, compression : Optional[Compression]) -> IO[str]:
+    if compression is None:
+        return open(fpath, mode, encoding='utf-8')
+    return OPENERS[compression](fpath, f'{mode}t', encoding='utf-8')
+
+
+def resolve_compression(fpath : str, compression : Union[Compression, None, str] = 'infer') -> Optional[Compression]:
+    if compression == 'infer':
+        return COMPRESSION_SUFFIXES.get(os.path.splitext(fpath)[1].lower())
+    if not compression is None and not compression in OPENERS:
+        raise ValueError(f'Unsupported compression "{compression}"; supported are {list(OPENERS)}')
+    return compression
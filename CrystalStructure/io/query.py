@@ -0,0 +1,367 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Iterable, Optional
+
+import numpy as np
+
+from CrystalStructure.crystal.atomic_site import AtomType
+from CrystalStructure.crystal.binary import CRYSTAL_SYSTEMS
+from CrystalStructure.instrumentation import timed
+from .dataset import CrystalDataset
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = '.index'
+SORTED_COLUMNS = ('spacegroup', 'num_atoms', 'volume_uc', 'packing_density')
+CATEGORY_COLUMNS = ('crystal_system',)
+# Ranges matching more than 1/SCAN_FRACTION of the records are evaluated by scanning the column
+SCAN_FRACTION = 16
+POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.int64)
+# ---------------------------------------------------------
+
+class CrystalIndex:
+    """Columnar index over the crystals of a CrystalDataset, answering predicates with record ids (positions in
+    the dataset) without materializing any structure. Every predicate is evaluated to a packed bitmap with one
+    bit per record:
+    - contains(element) and friends read a precomputed bitmap per element
+    - comparisons on spacegroup, num_atoms, volume_uc and packing_density binary search a sorted copy of the
+      column and set the bits of the matching range, or scan the column if the range is broad; unknown values
+      never match a comparison
+    - crystal_system is a category column with one bitmap per crystal system
+    Saved indices are memory-mapped on loading, so opening one costs next to nothing"""
+    def __init__(self, num_crystals : int, values : dict[str, np.ndarray], sorted_values : dict[str, np.ndarray],
+                 orders : dict[str, np.ndarray], elements : list[str], element_bitmaps : np.ndarray, category_bitmaps : dict[str, np.ndarray],
+                 source : Optional[dict] = None):
+        self.num_crystals : int = num_crystals
+        self.values : dict[str, np.ndarray] = values
+        self.sorted_values : dict[str, np.ndarray] = sorted_values
+        self.orders : dict[str, np.ndarray] = orders
+        self.elements : list[str] = elements
+        self.element_bitmaps : np.ndarray = element_bitmaps
+        self.category_bitmaps : dict[str, np.ndarray] = category_bitmaps
+        self.source : dict = source or {}
+        self._element_rows : dict[str, int] = {element : row for row, element in enumerate(elements)}
+        self._num_valid : dict[str, int] = {name : int(np.count_nonzero(~np.isnan(values)))
+                                            for name, values in sorted_values.items()}
+
+    def __len__(self):
+        return self.num_crystals
+
+    @classmethod
+    @timed(name='query.build_index')
+    def build(cls, dataset : CrystalDataset, chunk_size : int = 2 ** 16) -> CrystalIndex:
+        num_crystals = len(dataset)
+        columns = {'spacegroup' : np.where(dataset.spacegroups < 0, np.nan, dataset.spacegroups).astype(np.float64),
+                   'num_atoms' : dataset.num_atoms.astype(np.float64),
+                   'volume_uc' : np.array(dataset.volumes_uc, dtype=np.float64),
+                   'packing_density' : dataset.atomic_volumes / dataset.volumes_uc}
+        order_dtype = np.int32 if num_crystals < 2 ** 31 else np.int64
+        orders = {name : np.argsort(values, kind='stable').astype(order_dtype) for name, values in columns.items()}
+        sorted_values = {name : columns[name][order] for name, order in orders.items()}
+
+        system_codes = np.asarray(dataset.crystal_systems)
+        category_bitmaps = {'crystal_system' : np.stack([np.packbits(system_codes == code)
+                                                         for code in range(len(CRYSTAL_SYSTEMS) + 1)])}
+
+        species_elements = [AtomType.intern(symbol=species_str).element_symbol or '' for species_str in dataset.species_table]
+        elements = sorted(set(species_elements) - {''})
+        element_rows = {element : row for row, element in enumerate(elements)}
+        species_rows = np.array([element_rows.get(element, -1) for element in species_elements] or [-1], dtype=np.int64)
+
+        chunk_size = max(8, chunk_size - chunk_size % 8)
+        element_bitmaps = np.zeros((len(elements), get_num_bytes(num_crystals)), dtype=np.uint8)
+        for start in range(0, num_crystals, chunk_size):
+            batch = dataset.get_batch(start, start + chunk_size)
+            num_records = len(batch.site_offsets) - 1
+            site_records = np.repeat(np.arange(num_records), np.diff(batch.site_offsets))
+            site_rows = species_rows[batch.species_ids]
+            is_element = site_rows >= 0
+            present = np.zeros((len(elements), num_records), dtype=bool)
+            present[site_rows[is_element], site_records[is_element]] = True
+            element_bitmaps[:, start // 8 : start // 8 + get_num_bytes(num_records)] = np.packbits(present, axis=1)
+
+        return cls(num_crystals=num_crystals, values=columns, sorted_values=sorted_values, orders=orders, elements=elements,
+                   element_bitmaps=element_bitmaps, category_bitmaps=category_bitmaps,
+                   source=get_source_stamp(fpath=dataset.fpath))
+
+    # ---------------------------------------------------------
+    # queries
+
+    @timed(name='query.select')
+    def select(self, predicate : Predicate) -> np.ndarray:
+        """Ascending record ids of the crystals matching the predicate"""
+        bitmap = predicate.evaluate(index=self)
+        nonzero_bytes = np.flatnonzero(bitmap)
+        if len(nonzero_bytes) > len(bitmap) // 8:
+            return np.flatnonzero(np.unpackbits(bitmap, count=self.num_crystals))
+        rows, bits = np.nonzero(np.unpackbits(bitmap[nonzero_bytes]).reshape(-1, 8))
+        return nonzero_bytes[rows] * 8 + bits
+
+    def count(self, predicate : Predicate) -> int:
+        return int(POPCOUNT[predicate.evaluate(index=self)].sum())
+
+    def get_mask(self, predicate : Predicate) -> np.ndarray:
+        return np.unpackbits(predicate.evaluate(index=self), count=self.num_crystals).astype(bool)
+
+    def get_element_bitmap(self, element : str) -> np.ndarray:
+        row = self._element_rows.get(element)
+        return self.make_bitmap(fill=False) if row is None else self.element_bitmaps[row]
+
+    def get_category_bitmap(self, name : str, values : Iterable[Optional[str]]) -> np.ndarray:
+        if name != 'crystal_system':
+            raise ValueError(f'{name} is not a category column; category columns are {CATEGORY_COLUMNS}')
+        bitmap = self.make_bitmap(fill=False)
+        for value in values:
+            if not value is None and not value in CRYSTAL_SYSTEMS:
+                raise ValueError(f'Unknown crystal system "{value}"; crystal systems are {CRYSTAL_SYSTEMS}')
+            code = 0 if value is None else CRYSTAL_SYSTEMS.index(value) + 1
+            bitmap |= self.category_bitmaps[name][code]
+        return bitmap
+
+    def get_range_bitmap(self, name : str, ranges : list[tuple[float, float, bool, bool]]) -> np.ndarray:
+        """Records whose value lies in any of the (low, high, include_low, include_high) ranges"""
+        if not name in self.sorted_values:
+            raise ValueError(f'Unknown column {name}; columns are {SORTED_COLUMNS + CATEGORY_COLUMNS}')
+        valid_values = self.sorted_values[name][:self._num_valid[name]]
+        slices = []
+        for low, high, include_low, include_high in ranges:
+            start = np.searchsorted(valid_values, low, side='left' if include_low else 'right')
+            stop = np.searchsorted(valid_values, high, side='right' if include_high else 'left')
+            if stop > start:
+                slices.append((start, stop))
+
+        # Setting the bits of a sorted range costs one random write per match, so broad ranges scan the column instead
+        if sum(stop - start for start, stop in slices) > self.num_crystals // SCAN_FRACTION:
+            values = self.values[name]
+            mask = np.zeros(self.num_crystals, dtype=bool)
+            for low, high, include_low, include_high in ranges:
+                above = values >= low if include_low else values > low
+                below = values <= high if include_high else values < high
+                mask |= above & below
+            return np.packbits(mask)
+        mask = np.zeros(self.num_crystals, dtype=bool)
+        for start, stop in slices:
+            mask[self.orders[name][start:stop]] = True
+        return np.packbits(mask)
+
+    # ---------------------------------------------------------
+    # bitmaps
+
+    def make_bitmap(self, fill : bool) -> np.ndarray:
+        bitmap = np.full(get_num_bytes(self.num_crystals), 255 if fill else 0, dtype=np.uint8)
+        return self.clear_padding(bitmap) if fill else bitmap
+
+    def clear_padding(self, bitmap : np.ndarray) -> np.ndarray:
+        num_padding = -self.num_crystals % 8
+        if num_padding and len(bitmap) > 0:
+            bitmap[-1] &= (0xFF << num_padding) & 0xFF
+        return bitmap
+
+    # ---------------------------------------------------------
+    # save/load
+
+    def save(self, dirpath : str):
+        """Writes the index as a directory of .npy files, replacing an existing index there"""
+        dirpath = os.path.abspath(dirpath)
+        tmp_dirpath = tempfile.mkdtemp(dir=os.path.dirname(dirpath), prefix='.index_')
+        arrays = {'elements' : self.element_bitmaps,
+                  **{f'{name}.values' : values for name, values in self.values.items()},
+                  **{f'{name}.sorted' : values for name, values in self.sorted_values.items()},
+                  **{f'{name}.order' : order for name, order in self.orders.items()},
+                  **{f'{name}.categories' : bitmaps for name, bitmaps in self.category_bitmaps.items()}}
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dirpath, f'{name}.npy'), np.ascontiguousarray(array))
+        with open(os.path.join(tmp_dirpath, 'meta.json'), 'w') as file:
+            json.dump({'version' : INDEX_VERSION, 'num_crystals' : self.num_crystals, 'elements' : self.elements,
+                       'columns' : list(self.sorted_values), 'categories' : list(self.category_bitmaps),
+                       'source' : self.source}, file)
+        shutil.rmtree(dirpath, ignore_errors=True)
+        os.replace(tmp_dirpath, dirpath)
+
+    @classmethod
+    def load(cls, dirpath : str) -> CrystalIndex:
+        with open(os.path.join(dirpath, 'meta.json'), 'r') as file:
+            meta = json.load(file)
+        if meta['version'] != INDEX_VERSION:
+            raise ValueError(f'Index {dirpath} has version {meta["version"]}, expected {INDEX_VERSION}')
+
+        def load_array(name : str) -> np.ndarray:
+            return np.load(os.path.join(dirpath, f'{name}.npy'), mmap_mode='r')
+
+        return cls(num_crystals=meta['num_crystals'],
+                   values={name : load_array(f'{name}.values') for name in meta['columns']},
+                   sorted_values={name : load_array(f'{name}.sorted') for name in meta['columns']},
+                   orders={name : load_array(f'{name}.order') for name in meta['columns']},
+                   elements=meta['elements'], element_bitmaps=load_array('elements'),
+                   category_bitmaps={name : load_array(f'{name}.categories') for name in meta['categories']},
+                   source=meta['source'])
+
+
+def index_dataset(dataset_fpath : str, rebuild : bool = False) -> CrystalIndex:
+    """Index stored next to the dataset file (dataset_fpath + '.index'), built and saved if it is missing or
+    the dataset has been rewritten since"""
+    index_dirpath = dataset_fpath + INDEX_SUFFIX
+    if not rebuild and os.path.isfile(os.path.join(index_dirpath, 'meta.json')):
+        index = CrystalIndex.load(dirpath=index_dirpath)
+        if index.source == get_source_stamp(fpath=dataset_fpath):
+            return index
+    index = CrystalIndex.build(dataset=CrystalDataset(fpath=dataset_fpath))
+    index.save(dirpath=index_dirpath)
+    return index
+
+# ---------------------------------------------------------
+# predicates
+
+class Predicate(ABC):
+    """Condition on the records of a CrystalIndex; combine with &, | and ~"""
+    @abstractmethod
+    def evaluate(self, index : CrystalIndex) -> np.ndarray:
+        """Packed bitmap of the matching records"""
+
+    def __and__(self, other : Predicate) -> Predicate:
+        return Combination(predicates=(self, other), operator='and')
+
+    def __or__(self, other : Predicate) -> Predicate:
+        return Combination(predicates=(self, other), operator='or')
+
+    def __invert__(self) -> Predicate:
+        return Negation(predicate=self)
+
+
+class Combination(Predicate):
+    def __init__(self, predicates : tuple[Predicate, ...], operator : str):
+        self.predicates : tuple[Predicate, ...] = predicates
+        self.operator : str = operator
+
+    def evaluate(self, index : CrystalIndex) -> np.ndarray:
+        bitmaps = [predicate.evaluate(index=index) for predicate in self.predicates]
+        combine = np.bitwise_and if self.operator == 'and' else np.bitwise_or
+        return combine.reduce(bitmaps) if len(bitmaps) > 1 else np.array(bitmaps[0])
+
+
+class Negation(Predicate):
+    """Records not matching the predicate, including those whose compared value is unknown: ~(Column(x) == v)
+    matches records with an unknown x while Column(x) != v does not"""
+    def __init__(self, predicate : Predicate):
+        self.predicate : Predicate = predicate
+
+    def evaluate(self, index : CrystalIndex) -> np.ndarray:
+        return index.clear_padding(~self.predicate.evaluate(index=index))
+
+
+class Elements(Predicate):
+    """Records containing all (mode='all') or any (mode='any') of the elements, or only elements among them
+    (mode='only'). Void and placeholder sites are ignored"""
+    def __init__(self, elements : Iterable[str], mode : str = 'all'):
+        if not mode in ('all', 'any', 'only'):
+            raise ValueError(f'Mode must be "all", "any" or "only", got "{mode}"')
+        self.elements : tuple[str, ...] = tuple(elements)
+        self.mode : str = mode
+
+    def evaluate(self, index : CrystalIndex) -> np.ndarray:
+        if self.mode == 'only':
+            others = [index.get_element_bitmap(element) for element in index.elements if not element in self.elements]
+            return index.make_bitmap(fill=True) if not others else index.clear_padding(~np.bitwise_or.reduce(others))
+        bitmaps = [index.get_element_bitmap(element) for element in self.elements]
+        if not bitmaps:
+            return index.make_bitmap(fill=self.mode == 'all')
+        return (np.bitwise_and if self.mode == 'all' else np.bitwise_or).reduce(bitmaps)
+
+
+class Comparison(Predicate):
+    def __init__(self, name : str, ranges : list[tuple[float, float, bool, bool]]):
+        self.name : str = name
+        self.ranges : list[tuple[float, float, bool, bool]] = ranges
+
+    def evaluate(self, index : CrystalIndex) -> np.ndarray:
+        return index.get_range_bitmap(name=self.name, ranges=self.ranges)
+
+
+class Membership(Predicate):
+    def __init__(self, name : str, values : tuple, negate : bool = False):
+        self.name : str = name
+        self.values : tuple = values
+        self.negate : bool = negate
+
+    def evaluate(self, index : CrystalIndex) -> np.ndarray:
+        if self.name in CATEGORY_COLUMNS:
+            bitmap = index.get_category_bitmap(name=self.name, values=self.values)
+            if not self.negate:
+                return bitmap
+            return index.clear_padding(~bitmap) & ~index.get_category_bitmap(name=self.name, values=[None])
+        if any(isinstance(value, str) for value in self.values):
+            raise ValueError(f'Column {self.name} holds numbers, got {self.values}')
+        values = sorted(float(value) for value in self.values)
+        if not self.negate:
+            return index.get_range_bitmap(name=self.name, ranges=[(value, value, True, True) for value in values])
+        bounds = [-np.inf, *values, np.inf]
+        ranges = [(low, high, low == -np.inf, high == np.inf) for low, high in zip(bounds[:-1], bounds[1:])]
+        return index.get_range_bitmap(name=self.name, ranges=ranges)
+
+
+class Column:
+    """Builds predicates on a column of the index, e.g. (Column('num_atoms') < 50) & (Column('crystal_system') ==
+    'trigonal'). Numeric columns support all comparisons, category columns ==, != and isin. Like every comparison,
+    != never matches records whose value is unknown; negate with ~ to include them"""
+    def __init__(self, name : str):
+        if not name in SORTED_COLUMNS + CATEGORY_COLUMNS:
+            raise ValueError(f'Unknown column {name}; columns are {SORTED_COLUMNS + CATEGORY_COLUMNS}')
+        self.name : str = name
+
+    def __eq__(self, value) -> Predicate:
+        return self.isin([value])
+
+    def __ne__(self, value) -> Predicate:
+        return Membership(name=self.name, values=(value,), negate=True)
+
+    def __lt__(self, value : float) -> Predicate:
+        return self._compare(low=-np.inf, high=value, include_low=True, include_high=False)
+
+    def __le__(self, value : float) -> Predicate:
+        return self._compare(low=-np.inf, high=value, include_low=True, include_high=True)
+
+    def __gt__(self, value : float) -> Predicate:
+        return self._compare(low=value, high=np.inf, include_low=False, include_high=True)
+
+    def __ge__(self, value : float) -> Predicate:
+        return self._compare(low=value, high=np.inf, include_low=True, include_high=True)
+
+    __hash__ = None
+
+    def between(self, low : float, high : float) -> Predicate:
+        """Values in the closed interval [low, high]"""
+        return self._compare(low=low, high=high, include_low=True, include_high=True)
+
+    def isin(self, values : Iterable) -> Predicate:
+        return Membership(name=self.name, values=tuple(values))
+
+    def _compare(self, low : float, high : float, include_low : bool, include_high : bool) -> Predicate:
+        if self.name in CATEGORY_COLUMNS:
+            raise ValueError(f'Category column {self.name} only supports ==, != and isin')
+        return Comparison(name=self.name, ranges=[(float(low), float(high), include_low, include_high)])
+
+
+def contains(*elements : str) -> Predicate:
+    return Elements(elements=elements, mode='all')
+
+
+def contains_any(*elements : str) -> Predicate:
+    return Elements(elements=elements, mode='any')
+
+
+def contains_only(*elements : str) -> Predicate:
+    return Elements(elements=elements, mode='only')
+
+# ---------------------------------------------------------
+
+def get_num_bytes(num_bits : int) -> int:
+    return (num_bits + 7) // 8
+
+
+def get_source_stamp(fpath : str) -> dict:
+    stat = os.stat(fpath)
+    return {'size' : stat.st_size, 'mtime_ns' : stat.st_mtime_ns}
@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import socket
+import struct
+import uuid
+from typing import Iterable, Iterator, Optional, Union
+
+import numpy as np
+
+from CrystalStructure.crystal import CrystalStructure
+from CrystalStructure.crystal.binary import nan_if_none
+from .dataset import CrystalDataset, CrystalDatasetWriter
+
+SHARDED_VERSION = 1
+CONFIG_FNAME = 'sharded.json'
+PART_SUFFIX = '.dataset'
+MANIFEST_SUFFIX = '.json'
+CHECKSUM_CHUNK_SIZE = 2 ** 20
+ShardKey = Union[str, bytes]
+# ---------------------------------------------------------
+
+class ShardedDatasetWriter:
+    """Distributes crystals over a fixed number of shards of a directory by a deterministic hash of their key:
+    the CIF content if given, otherwise the exact structure (see make_structure_key). Crystals are buffered per
+    shard and every part_size crystals of a shard are written as one immutable CrystalDataset part named after
+    writer_id. Parts are published atomically, followed by a manifest holding their count and sha256 checksum,
+    so readers only ever see complete parts. Writers never touch each other's files, hence any number of
+    processes on any number of nodes can append to the same directory without locking.
+
+    writer_id defaults to a name unique to the process. Opening a writer with an explicit writer_id removes the
+    parts a previous run with that writer_id left behind, so a failed worker can simply be run again"""
+    def __init__(self, dirpath : str, num_shards : Optional[int] = None, writer_id : Optional[str] = None,
+                 part_size : int = 1000):
+        if part_size < 1:
+            raise ValueError(f'Part size must be positive, got {part_size}')
+        self.dirpath : str = os.path.abspath(dirpath)
+        self.num_shards : int = open_config(dirpath=self.dirpath, num_shards=num_shards)
+        self.part_size : int = part_size
+        self.num_written : int = 0
+        self._buffers : dict[int, list[CrystalStructure]] = {}
+        self._num_parts : dict[int, int] = {}
+
+        if writer_id is None:
+            self.writer_id : str = f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        else:
+            if not writer_id or any(char in writer_id for char in './\\'):
+                raise ValueError(f'Writer id must be non-empty and must not contain ".", "/" or "\\", got "{writer_id}"')
+            self.writer_id = writer_id
+            self.discard_parts()
+
+    def __enter__(self) -> ShardedDatasetWriter:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def add_all(self, crystals : Iterable[CrystalStructure], keys : Optional[Iterable[ShardKey]] = None):
+        keys = iter([None]) if keys is None else iter(keys)
+        for crystal in crystals:
+            self.add(crystal=crystal, key=next(keys, None))
+
+    def add(self, crystal : CrystalStructure, key : Optional[ShardKey] = None) -> int:
+        """Queues the crystal for the shard of its key and returns that shard"""
+        key = make_structure_key(crystal=crystal) if key is None else key
+        shard = get_shard(key=key, num_shards=self.num_shards)
+        buffer = self._buffers.setdefault(shard, [])
+        buffer.append(crystal)
+        if len(buffer) >= self.part_size:
+            self._write_part(shard=shard)
+        return shard
+
+    def flush(self):
+        for shard in sorted(self._buffers):
+            self._write_part(shard=shard)
+
+    def close(self):
+        self.flush()
+
+    def discard_parts(self):
+        """Removes all parts and leftover temporary files of this writer_id"""
+        for shard in range(self.num_shards):
+            shard_dirpath = get_shard_dirpath(dirpath=self.dirpath, shard=shard)
+            if not os.path.isdir(shard_dirpath):
+                continue
+            for fname in os.listdir(shard_dirpath):
+                if fname.split('.')[0] == self.writer_id or fname.startswith(f'.{self.writer_id}.'):
+                    os.remove(os.path.join(shard_dirpath, fname))
+
+    # ---------------------------------------------------------
+
+    def _write_part(self, shard : int):
+        crystals = self._buffers.pop(shard, [])
+        if not crystals:
+            return
+        part_index = self._num_parts.get(shard, 0)
+        self._num_parts[shard] = part_index + 1
+        shard_dirpath = get_shard_dirpath(dirpath=self.dirpath, shard=shard)
+        os.makedirs(shard_dirpath, exist_ok=True)
+
+        part_name = f'{self.writer_id}.{part_index:06d}'
+        tmp_fpath = os.path.join(shard_dirpath, f'.{part_name}.tmp')
+        with CrystalDatasetWriter(fpath=tmp_fpath) as writer:
+            writer.add_all(crystals=crystals)
+        manifest = {'count' : len(crystals), 'size' : os.path.getsize(tmp_fpath), 'sha256' : get_checksum(tmp_fpath)}
+        os.replace(tmp_fpath, os.path.join(shard_dirpath, part_name + PART_SUFFIX))
+        write_json_atomic(fpath=os.path.join(shard_dirpath, part_name + MANIFEST_SUFFIX), content=manifest)
+        self.num_written += len(crystals)
+
+
+class ShardedDataset:
+    """Read-only view of the shards of a directory written by ShardedDatasetWriter that belong to worker
+    worker_index of num_workers, i.e. shards worker_index, worker_index + num_workers, ... Only the published
+    parts of these shards are opened, in a fixed order, so every worker sees the same crystals on every run.
+    With verify=True the size and checksum of every part are checked against its manifest on opening"""
+    def __init__(self, dirpath : str, worker_index : int = 0, num_workers : int = 1, verify : bool = False):
+        if not 0 <= worker_index < num_workers:
+            raise ValueError(f'Worker index must be in [0, {num_workers}), got {worker_index}')
+        self.dirpath : str = os.path.abspath(dirpath)
+        self.worker_index : int = worker_index
+        self.num_workers : int = num_workers
+        self.num_shards : int = open_config(dirpath=self.dirpath)
+        self.shards : list[int] = get_worker_shards(num_shards=self.num_shards, worker_index=worker_index,
+                                                    num_workers=num_workers)
+        self.manifest : dict[int, dict[str, dict]] = read_manifest(dirpath=self.dirpath, shards=self.shards)
+        if verify:
+            verify_parts(dirpath=self.dirpath, manifest=self.manifest)
+
+        self._part_shards : list[int] = []
+        self._parts : list[CrystalDataset] = []
+        for shard, parts in self.manifest.items():
+            shard_dirpath = get_shard_dirpath(dirpath=self.dirpath, shard=shard)
+            for part_name in parts:
+                self._part_shards.append(shard)
+                self._parts.append(CrystalDataset(fpath=os.path.join(shard_dirpath, part_name + PART_SUFFIX)))
+        self._offsets = np.cumsum([0] + [len(part) for part in self._parts])
+
+    def __getstate__(self):
+        return {'dirpath' : self.dirpath, 'worker_index' : self.worker_index, 'num_workers' : self.num_workers}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __len__(self):
+        return int(self._offsets[-1])
+
+    def __iter__(self) -> Iterator[CrystalStructure]:
+        for part in self._parts:
+            yield from part
+
+    def __getitem__(self, index : int) -> CrystalStructure:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f'Crystal index {index} out of range for sharded dataset with {len(self)} crystals')
+        part_index = int(np.searchsorted(self._offsets, index, side='right')) - 1
+        return self._parts[part_index][index - int(self._offsets[part_index])]
+
+    def get_counts(self) -> dict[int, int]:
+        """Number of crystals per shard of this worker"""
+        counts = {shard : 0 for shard in self.shards}
+        for shard, part in zip(self._part_shards, self._parts):
+            counts[shard] += len(part)
+        return counts
+
+    def iter_shard(self, shard : int) -> Iterator[CrystalStructure]:
+        if not shard in self.manifest:
+            raise ValueError(f'Shard {shard} does not belong to worker {self.worker_index} of {self.num_workers}')
+        for part_shard, part in zip(self._part_shards, self._parts):
+            if part_shard == shard:
+                yield from part
+
+
+def write_sharded(dirpath : str, crystals : Iterable[CrystalStructure], num_shards : int,
+                  keys : Optional[Iterable[ShardKey]] = None, writer_id : Optional[str] = None,
+                  part_size : int = 1000) -> int:
+    """Writes crystals into a sharded directory and returns the number of crystals written"""
+    with ShardedDatasetWriter(dirpath=dirpath, num_shards=num_shards, writer_id=writer_id,
+                              part_size=part_size) as writer:
+        writer.add_all(crystals=crystals, keys=keys)
+    return writer.num_written
+
+# ---------------------------------------------------------
+
+def get_shard(key : ShardKey, num_shards : int) -> int:
+    """Shard of a key; stable across processes, machines and Python versions"""
+    key = key.encode('utf-8') if isinstance(key, str) else key
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return int.from_bytes(digest, byteorder='little') % num_shards
+
+
+def make_structure_key(crystal : CrystalStructure) -> bytes:
+    """Binary encoding of the lattice parameters and the sites. Derived fields are left out so that a crystal
+    lands in the same shard whether or not its properties have been calculated"""
+    lattice_params = [nan_if_none(x) for x in (*crystal.lengths.as_tuple(), *crystal.angles.as_tuple())]
+    return struct.pack('<6d', *lattice_params) + crystal.base.to_bytes()
+
+
+def get_worker_shards(num_shards : int, worker_index : int, num_workers : int) -> list[int]:
+    return list(range(worker_index, num_shards, num_workers))
+
+
+def get_shard_dirpath(dirpath : str, shard : int) -> str:
+    return os.path.join(dirpath, f'shard-{shard:05d}')
+
+
+def open_config(dirpath : str, num_shards : Optional[int] = None) -> int:
+    """Number of shards of the directory. The configuration is created on first use; concurrent writers race
+    to create it and all of them end up with the one that was published first"""
+    config_fpath = os.path.join(dirpath, CONFIG_FNAME)
+    if not os.path.isfile(config_fpath):
+        if num_shards is None:
+            raise FileNotFoundError(f'No sharded dataset found at {dirpath}')
+        if num_shards < 1:
+            raise ValueError(f'Number of shards must be positive, got {num_shards}')
+        os.makedirs(dirpath, exist_ok=True)
+        tmp_fpath = os.path.join(dirpath, f'.{CONFIG_FNAME}.{uuid.uuid4().hex}')
+        with open(tmp_fpath, 'w') as file:
+            json.dump({'version' : SHARDED_VERSION, 'num_shards' : num_shards}, file)
+        try:
+            os.link(tmp_fpath, config_fpath)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_fpath)
+
+    with open(config_fpath, 'r') as file:
+        config = json.load(file)
+    if config['version'] > SHARDED_VERSION:
+        raise ValueError(f'Sharded dataset version {config["version"]} is newer than supported version {SHARDED_VERSION}')
+    if not num_shards is None and num_shards != config['num_shards']:
+        raise ValueError(f'Sharded dataset at {dirpath} has {config["num_shards"]} shards, got num_shards={num_shards}')
+    return config['num_shards']
+
+
+def read_manifest(dirpath : str, shards : Optional[Iterable[int]] = None) -> dict[int, dict[str, dict]]:
+    """Published parts of the given shards (default: all) as {shard : {part name : manifest}}, parts sorted by name"""
+    shards = range(open_config(dirpath=dirpath)) if shards is None else shards
+    manifest = {}
+    for shard in shards:
+        shard_dirpath = get_shard_dirpath(dirpath=dirpath, shard=shard)
+        fnames = sorted(os.listdir(shard_dirpath)) if os.path.isdir(shard_dirpath) else []
+        parts = {}
+        for fname in fnames:
+            if fname.startswith('.') or not fname.endswith(MANIFEST_SUFFIX):
+                continue
+            with open(os.path.join(shard_dirpath, fname), 'r') as file:
+                parts[fname[:-len(MANIFEST_SUFFIX)]] = json.load(file)
+        manifest[shard] = parts
+    return manifest
+
+
+def verify_parts(dirpath : str, manifest : dict[int, dict[str, dict]]):
+    for shard, parts in manifest.items():
+        for part_name, part_manifest in parts.items():
+            fpath = os.path.join(get_shard_dirpath(dirpath=dirpath, shard=shard), part_name + PART_SUFFIX)
+            if os.path.getsize(fpath) != part_manifest['size'] or get_checksum(fpath) != part_manifest['sha256']:
+                raise ValueError(f'Part {fpath} does not match its manifest')
+
+
+def get_checksum(fpath : str) -> str:
+    checksum = hashlib.sha256()
+    with open(fpath, 'rb') as file:
+        for chunk in iter(lambda : file.read(CHECKSUM_CHUNK_SIZE), b''):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def write_json_atomic(fpath : str, content : dict):
+    tmp_fpath = os.path.join(os.path.dirname(fpath), f'.{os.path.basename(fpath)}.tmp')
+    with open(tmp_fpath, 'w') as file:
+        json.dump(content, file)
+    os.replace(tmp_fpath, fpath)
@@ -0,0 +1,4 @@
+from .cache import SymmetryCache, SymmetryResult
+from .analysis import SpglibCell, analyze_cell, analyze_cells, get_crystal_system
+
+from .operations import get_symmetry_operations
\ No newline at end of file
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+
+from CrystalStructure.instrumentation import timed
+from .cache import SymmetryResult
+
+SpglibCell = tuple[np.ndarray, np.ndarray, np.ndarray]
+# ---------------------------------------------------------
+
+@timed(name='symmetry.spglib')
+def analyze_cell(cell : SpglibCell, symprec : float, angle_tolerance : float) -> SymmetryResult:
+    """Runs spglib on a (lattice matrix, fractional positions, type numbers) cell"""
+    import spglib
+    dataset = spglib.get_symmetry_dataset(cell, symprec=symprec, angle_tolerance=angle_tolerance)
+    if dataset is None:
+        raise ValueError(f'Symmetry detection failed: {spglib.get_error_message()}')
+
+    if isinstance(dataset, dict):
+        spacegroup, wyckoffs = dataset['number'], dataset['wyckoffs']
+    else:
+        spacegroup, wyckoffs = dataset.number, dataset.wyckoffs
+    spacegroup = int(spacegroup)
+    return SymmetryResult(spacegroup=spacegroup, wyckoff_symbols=tuple(wyckoffs),
+                          crystal_system=get_crystal_system(spacegroup=spacegroup))
+
+
+def analyze_cells(cells : Iterable[SpglibCell], symprec : float, angle_tolerance : float) -> list[SymmetryResult]:
+    return [analyze_cell(cell=cell, symprec=symprec, angle_tolerance=angle_tolerance) for cell in cells]
+
+
+def get_crystal_system(spacegroup : int) -> str:
+    if not 1 <= spacegroup <= 230:
+        raise ValueError(f'Spacegroup number must be in [1, 230], got {spacegroup}')
+    if spacegroup <= 2:
+        return 'triclinic'
+    if spacegroup <= 15:
+        return 'monoclinic'
+    if spacegroup <= 74:
+        return 'orthorhombic'
+    if spacegroup <= 142:
+        return 'tetragonal'
+    if spacegroup <= 167:
+        return 'trigonal'
+    if spacegroup <= 194:
+        return 'hexagonal'
+    return 'cubic'
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+
+# Bump whenever the symmetry analysis changes in a way that invalidates stored results
+CACHE_VERSION = 1
+# ---------------------------------------------------------
+
+@dataclass(frozen=True)
+class SymmetryResult:
+    spacegroup : int
+    wyckoff_symbols : tuple[str, ...]
+    crystal_system : str
+
+
+class SymmetryCache:
+    """Content-addressed cache of symmetry analysis results. Entries are keyed by a hash of the lattice parameters,
+    species and rounded fractional coordinates of the analyzed sites together with the analysis tolerances.
+    Lookups go through an in-memory LRU first and fall back to an optional SQLite database on disk that can be
+    shared between runs and processes"""
+    _default : Optional[SymmetryCache] = None
+
+    def __init__(self, db_fpath : Optional[str] = None, max_memory_entries : int = 100_000, decimals : int = 4):
+        self.db_fpath : Optional[str] = db_fpath
+        self.max_memory_entries : int = max_memory_entries
+        self.decimals : int = decimals
+        self.hits : int = 0
+        self.misses : int = 0
+        self._memory : OrderedDict[str, SymmetryResult] = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection : Optional[sqlite3.Connection] = None
+        self._connection_pid : Optional[int] = None
+
+    @classmethod
+    def get_default(cls) -> SymmetryCache:
+        """Process-wide cache consulted by CrystalStructure.calculate_properties; in-memory only unless replaced"""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    @classmethod
+    def set_default(cls, cache : SymmetryCache):
+        cls._default = cache
+
+    # ---------------------------------------------------------
+    # access
+
+    def make_key(self, lattice_params : Sequence[float], species_strs : Sequence[str], coords : np.ndarray,
+                 symprec : float, angle_tolerance : float) -> str:
+        lattice = np.round(np.asarray(lattice_params, dtype=np.float64), self.decimals) + 0.0
+        wrapped = np.round(np.mod(np.asarray(coords, dtype=np.float64), 1.0), self.decimals) % 1.0 + 0.0
+
+        digest = hashlib.sha256()
+        digest.update(f'{CACHE_VERSION}|{symprec!r}|{angle_tolerance!r}|{self.decimals}|'.encode())
+        digest.update(lattice.tobytes())
+        digest.update('\x1f'.join(species_strs).encode())
+        digest.update(np.ascontiguousarray(wrapped).tobytes())
+        return digest.hexdigest()
+
+    def get(self, key : str) -> Optional[SymmetryResult]:
+        with self._lock:
+            result = self._memory.get(key)
+            if not result is None:
+                self._memory.move_to_end(key)
+        if result is None and self.db_fpath:
+            result = self._read_db(key=key)
+            if not result is None:
+                self._remember(key=key, result=result)
+
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def put(self, key : str, result : SymmetryResult):
+        self._remember(key=key, result=result)
+        if self.db_fpath:
+            self._write_db(key=key, result=result)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.db_fpath:
+            connection = self._get_connection()
+            with connection:
+                connection.execute('DELETE FROM symmetry')
+        self.hits, self.misses = 0, 0
+
+    def __len__(self):
+        return len(self._memory)
+
+    # ---------------------------------------------------------
+    # storage
+
+    def _remember(self, key : str, result : SymmetryResult):
+        with self._lock:
+            self._memory[key] = result
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # sqlite connections must not be shared across forked processes
+        if self._connection is None or self._connection_pid != os.getpid():
+            dirpath = os.path.dirname(os.path.abspath(self.db_fpath))
+            os.makedirs(dirpath, exist_ok=True)
+            connection = sqlite3.connect(self.db_fpath, timeout=60, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS symmetry '
+                               '(key TEXT PRIMARY KEY, spacegroup INTEGER, wyckoffs TEXT, crystal_system TEXT)')
+            connection.commit()
+            self._connection, self._connection_pid = connection, os.getpid()
+        return self._connection
+
+    def _read_db(self, key : str) -> Optional[SymmetryResult]:
+        with self._lock:
+            row = self._get_connection().execute(
+                'SELECT spacegroup, wyckoffs, crystal_system FROM symmetry WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        spacegroup, wyckoffs, crystal_system = row
+        return SymmetryResult(spacegroup=spacegroup, wyckoff_symbols=tuple(json.loads(wyckoffs)), crystal_system=crystal_system)
+
+    def _write_db(self, key : str, result : SymmetryResult):
+        with self._lock:
+            connection = self._get_connection()
+            with connection:
+                connection.execute('INSERT OR REPLACE INTO symmetry VALUES (?, ?, ?, ?)',
+                                   (key, result.spacegroup, json.dumps(list(result.wyckoff_symbols)), result.crystal_system))
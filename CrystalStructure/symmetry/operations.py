@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+# ---------------------------------------------------------
+
+def get_symmetry_operations(spacegroup : Optional[int] = None,
+                            hall_number : Optional[int] = None) -> tuple[np.ndarray, np.ndarray]:
+    """Rotations (K, 3, 3) and translations (K, 3) of a space group in fractional coordinates, taken from the spglib
+    database. hall_number selects a setting; by default the first setting of the space group, the standard one for
+    most groups and the hexagonal axes for rhombohedral groups. The returned arrays are cached and read-only"""
+    if hall_number is None:
+        if spacegroup is None:
+            raise ValueError('Either spacegroup or hall_number must be given')
+        hall_number = get_default_hall_number(spacegroup=spacegroup)
+    return _get_symmetry_operations(hall_number=hall_number)
+
+
+@lru_cache(maxsize=None)
+def get_default_hall_number(spacegroup : int) -> int:
+    if not 1 <= spacegroup <= 230:
+        raise ValueError(f'Spacegroup number must be in [1, 230], got {spacegroup}')
+    return next(hall_number for hall_number in range(1, 531) if get_spacegroup_number(hall_number) == spacegroup)
+
+
+@lru_cache(maxsize=None)
+def _get_symmetry_operations(hall_number : int) -> tuple[np.ndarray, np.ndarray]:
+    if not 1 <= hall_number <= 530:
+        raise ValueError(f'Hall number must be in [1, 530], got {hall_number}')
+    import spglib
+    operations = spglib.get_symmetry_from_database(hall_number)
+    rotations = np.array(operations['rotations'], dtype=np.float64)
+    translations = np.array(operations['translations'], dtype=np.float64)
+    rotations.flags.writeable = False
+    translations.flags.writeable = False
+    return rotations, translations
+
+
+def get_spacegroup_number(hall_number : int) -> int:
+    import spglib
+    spacegroup_type = spglib.get_spacegroup_type(hall_number)
+    return int(spacegroup_type['number'] if isinstance(spacegroup_type, dict) else spacegroup_type.number)
@@ -0,0 +1,4 @@
+from .generator import make_synthetic_crystal
+from .runner import Benchmark, BenchmarkResult, BenchmarkReport, Case, Regression, measure, compare
+from .suite import BENCHMARKS, DEFAULT_SIZES, run_suite
+from .imports import IMPORT_MODULES, HEAVY_MODULES, measure_import, get_heavy_imports, run_import_suite
\ No newline at end of file
@@ -0,0 +1,49 @@
+import argparse
+import sys
+
+from .imports import IMPORT_BENCHMARK
+from .runner import BenchmarkReport, BenchmarkResult, compare
+from .suite import BENCHMARKS, DEFAULT_SIZES, run_suite
+
+# ---------------------------------------------------------
+
+def print_result(result : BenchmarkResult):
+    print(f'{result.name:<24} {result.case:<28} {result.num_sites:>7} sites  p50 {result.p50_s * 1e3:>10.3f} ms  '
+          f'p99 {result.p99_s * 1e3:>10.3f} ms  {result.sites_per_s:>12.0f} sites/s  '
+          f'peak {result.peak_memory_bytes / 2**20:>8.2f} MiB', flush=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Runs the CrystalStructure benchmarks')
+    parser.add_argument('--sizes', type=int, nargs='*', default=list(DEFAULT_SIZES),
+                        help='Site counts of the synthetic crystals')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic crystal generator')
+    parser.add_argument('--only', nargs='+', choices=[benchmark.name for benchmark in BENCHMARKS] + [IMPORT_BENCHMARK],
+                        help='Only run these benchmarks')
+    parser.add_argument('--no-cifs', action='store_true', help='Skip the bundled test CIFs')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Minimum timed seconds per benchmark and case')
+    parser.add_argument('--output', help='Save the results as JSON to this path')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed relative increase of median latency and peak memory over the baseline')
+    args = parser.parse_args(argv)
+
+    report = run_suite(sizes=args.sizes, seed=args.seed, names=args.only, include_cifs=not args.no_cifs,
+                       min_time=args.min_time, progress_callback=print_result)
+    if args.output:
+        report.save(fpath=args.output)
+        print(f'Saved results to {args.output}')
+    if not args.baseline:
+        return 0
+
+    baseline = BenchmarkReport.load(fpath=args.baseline)
+    regressions = compare(current=report, baseline=baseline, tolerance=args.tolerance, memory_tolerance=args.tolerance)
+    print(f'Compared against {args.baseline} (commit {baseline.metadata.get("commit")}): '
+          f'{len(regressions)} regression(s)')
+    for regression in regressions:
+        print(f'  {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import numpy as np
+
+from CrystalStructure.crystal import CrystalStructure, ColumnarBase, Lengths, Angles
+
+SPECIES_POOL = ('H0+', 'C0+', 'N0+', 'O0+', 'Na0+', 'Mg0+', 'Al0+', 'Si0+', 'Cl0+', 'Ti0+', 'Fe0+', 'Zr0+', 'Er0+', 'Pb0+')
+VOLUME_PER_SITE = 15.0
+# ---------------------------------------------------------
+
+def make_synthetic_crystal(num_sites : int, seed : int = 0) -> CrystalStructure:
+    """Random triclinic P1 crystal with num_sites fully occupied sites drawn from SPECIES_POOL. The cell volume grows
+    with the number of sites so that the packing density stays realistic. The same (num_sites, seed) always gives
+    the same crystal"""
+    rng = np.random.default_rng(seed=(seed, num_sites))
+    aspect = rng.uniform(0.8, 1.2, size=3)
+    side = (VOLUME_PER_SITE * num_sites / np.prod(aspect)) ** (1 / 3)
+    a, b, c = (side * aspect).tolist()
+    alpha, beta, gamma = rng.uniform(80, 100, size=3).tolist()
+
+    coords = rng.random(size=(num_sites, 3))
+    species_ids = rng.integers(len(SPECIES_POOL), size=num_sites)
+    base = ColumnarBase.from_arrays(coords=coords, occupancies=np.ones(num_sites), species_ids=species_ids,
+                                    species_table=list(SPECIES_POOL))
+    return CrystalStructure(lengths=Lengths(a=a, b=b, c=c), angles=Angles(alpha=alpha, beta=beta, gamma=gamma),
+                            base=base)
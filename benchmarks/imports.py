@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+from typing import Iterable
+
+import numpy as np
+
+import CrystalStructure
+from .runner import BenchmarkResult
+
+IMPORT_BENCHMARK = 'import'
+IMPORT_MODULES = ('CrystalStructure.crystal', 'CrystalStructure.io', 'CrystalStructure.batch',
+                  'CrystalStructure.diffraction', 'CrystalStructure.dedup')
+# Dependencies that must only be imported once a code path needs them
+HEAVY_MODULES = ('pymatgen', 'spglib', 'scipy')
+
+_CHILD_CODE = '''
+import json, sys, time, tracemalloc
+trace = sys.argv[2] == '1'
+if trace:
+    tracemalloc.start()
+start = time.perf_counter()
+__import__(sys.argv[1])
+elapsed_s = time.perf_counter() - start
+peak_memory = tracemalloc.get_traced_memory()[1] if trace else 0
+heavy_modules = sorted({name.split('.')[0] for name in sys.modules} & set(sys.argv[3].split(',')))
+print(json.dumps({'elapsed_s' : elapsed_s, 'peak_memory' : peak_memory, 'heavy_modules' : heavy_modules}))
+'''
+# ---------------------------------------------------------
+
+def import_in_fresh_interpreter(module : str, trace_memory : bool = False) -> dict:
+    """Imports module in a new interpreter and returns its import time, peak traced memory (only with
+    trace_memory=True, which slows the import down) and the heavy dependencies it pulled in"""
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(CrystalStructure.__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_parent, env.get('PYTHONPATH')]))
+    args = [sys.executable, '-c', _CHILD_CODE, module, '1' if trace_memory else '0', ','.join(HEAVY_MODULES)]
+    completed = subprocess.run(args, capture_output=True, text=True, env=env, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure_import(module : str, repeats : int = 5) -> BenchmarkResult:
+    """Cold import time of module in repeats fresh interpreters; peak memory is taken from one extra traced import"""
+    latencies = np.array([import_in_fresh_interpreter(module=module)['elapsed_s'] for _ in range(repeats)])
+    peak_memory = import_in_fresh_interpreter(module=module, trace_memory=True)['peak_memory']
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]).tolist()
+    mean = float(latencies.mean())
+    return BenchmarkResult(name=IMPORT_BENCHMARK, case=module, num_sites=0, repeats=repeats, mean_s=mean,
+                           min_s=float(latencies.min()), p50_s=p50, p90_s=p90, p99_s=p99, calls_per_s=1 / mean,
+                           sites_per_s=0.0, peak_memory_bytes=int(peak_memory))
+
+
+def get_heavy_imports(module : str) -> list[str]:
+    return import_in_fresh_interpreter(module=module)['heavy_modules']
+
+
+def run_import_suite(modules : Iterable[str] = IMPORT_MODULES, repeats : int = 5) -> list[BenchmarkResult]:
+    return [measure_import(module=module, repeats=repeats) for module in modules]
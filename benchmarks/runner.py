@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import gc
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict, field
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from CrystalStructure.crystal import CrystalStructure
+
+RESULTS_VERSION = 1
+# ---------------------------------------------------------
+
+@dataclass
+class Case:
+    """A crystal to run the benchmarks on; cif is set for the bundled CIF files"""
+    name : str
+    crystal : CrystalStructure
+    cif : Optional[str] = None
+
+    @property
+    def num_sites(self) -> int:
+        return len(self.crystal.base)
+
+
+@dataclass
+class Benchmark:
+    """prepare turns a case into the benchmark input once, setup derives the input of every timed call to run
+    from it. Neither is timed; setup runs before every repeat so that memoization inside the measured objects
+    cannot leak from one repeat into the next"""
+    name : str
+    run : Callable[[Any], Any]
+    prepare : Callable[[Case], Any] = lambda case : case.crystal
+    setup : Callable[[Any], Any] = lambda prepared : prepared
+    max_sites : int = 100_000
+
+
+@dataclass
+class BenchmarkResult:
+    name : str
+    case : str
+    num_sites : int
+    repeats : int
+    mean_s : float
+    min_s : float
+    p50_s : float
+    p90_s : float
+    p99_s : float
+    calls_per_s : float
+    sites_per_s : float
+    peak_memory_bytes : int
+
+
+@dataclass
+class Regression:
+    name : str
+    case : str
+    metric : str
+    baseline : float
+    current : float
+
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline
+
+    def __str__(self):
+        return f'{self.name} [{self.case}] {self.metric}: {self.baseline:.4g} -> {self.current:.4g} ({self.ratio:.2f}x)'
+
+
+@dataclass
+class BenchmarkReport:
+    results : list[BenchmarkResult]
+    metadata : dict = field(default_factory=dict)
+
+    def save(self, fpath : str):
+        with open(fpath, 'w') as file:
+            json.dump({'version' : RESULTS_VERSION, 'metadata' : self.metadata,
+                       'results' : [asdict(result) for result in self.results]}, file, indent=2)
+
+    @classmethod
+    def load(cls, fpath : str) -> BenchmarkReport:
+        with open(fpath) as file:
+            the_dict = json.load(file)
+        return cls(results=[BenchmarkResult(**result) for result in the_dict['results']], metadata=the_dict['metadata'])
+
+# ---------------------------------------------------------
+
+def measure(benchmark : Benchmark, case : Case, min_time : float = 0.2, min_repeats : int = 3,
+            max_repeats : int = 50) -> BenchmarkResult:
+    """Repeats the benchmark until min_time seconds have been spent in run (within the repeat bounds), then
+    measures peak traced memory of one extra call. The first call is a warm-up and is not recorded"""
+    source = benchmark.prepare(case)
+    benchmark.run(benchmark.setup(source))
+
+    latencies = []
+    while len(latencies) < max_repeats and (len(latencies) < min_repeats or sum(latencies) < min_time):
+        item = benchmark.setup(source)
+        gc.collect()
+        start = time.perf_counter()
+        benchmark.run(item)
+        latencies.append(time.perf_counter() - start)
+
+    item = benchmark.setup(source)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        benchmark.run(item)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies = np.array(latencies)
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]).tolist()
+    mean = float(latencies.mean())
+    return BenchmarkResult(name=benchmark.name, case=case.name, num_sites=case.num_sites, repeats=len(latencies),
+                           mean_s=mean, min_s=float(latencies.min()), p50_s=p50, p90_s=p90, p99_s=p99,
+                           calls_per_s=1 / mean, sites_per_s=case.num_sites / mean, peak_memory_bytes=int(peak_memory))
+
+
+def compare(current : BenchmarkReport, baseline : BenchmarkReport, tolerance : float = 0.25,
+            memory_tolerance : float = 0.25) -> list[Regression]:
+    """Results whose median latency or peak memory exceeds the baseline by more than the given relative tolerance.
+    Benchmarks missing from either report are ignored"""
+    baseline_results = {(result.name, result.case) : result for result in baseline.results}
+    regressions = []
+    for result in current.results:
+        reference = baseline_results.get((result.name, result.case))
+        if reference is None:
+            continue
+        if result.p50_s > reference.p50_s * (1 + tolerance):
+            regressions.append(Regression(result.name, result.case, 'p50_s', reference.p50_s, result.p50_s))
+        if result.peak_memory_bytes > reference.peak_memory_bytes * (1 + memory_tolerance):
+            regressions.append(Regression(result.name, result.case, 'peak_memory_bytes',
+                                          reference.peak_memory_bytes, result.peak_memory_bytes))
+    return regressions
+
+
+def get_metadata(seed : int) -> dict:
+    import pymatgen.core
+    import spglib
+
+    return {'timestamp' : time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit' : get_commit(), 'seed' : seed,
+            'python' : platform.python_version(), 'platform' : platform.platform(), 'numpy' : np.__version__,
+            'pymatgen' : pymatgen.core.__version__, 'spglib' : spglib.__version__}
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from typing import Callable, Iterable, Optional
+
+from CrystalStructure.crystal import CrystalStructure
+from CrystalStructure.diffraction import calculate_pattern
+from CrystalStructure.examples import CrystalExamples
+from .generator import make_synthetic_crystal
+from .imports import IMPORT_BENCHMARK, IMPORT_MODULES, measure_import
+from .runner import Benchmark, BenchmarkReport, BenchmarkResult, Case, measure, get_metadata
+
+DEFAULT_SIZES = (1, 10, 100, 1_000, 10_000, 100_000)
+BUNDLED_CIFS = (1, 2)
+# ---------------------------------------------------------
+
+def fresh_copy(crystal : CrystalStructure) -> CrystalStructure:
+    """Same lattice and base without any memoized properties or cached pymatgen structure"""
+    return CrystalStructure(lengths=crystal.lengths, angles=crystal.angles, base=crystal.base)
+
+
+def get_cif(case : Case) -> str:
+    return case.cif if case.cif is not None else case.crystal.to_cif()
+
+
+# Both CIF parsers merge sites pairwise and to_cif/spglib go through pymatgen, hence the lower size caps
+BENCHMARKS = (
+    Benchmark(name='from_cif', prepare=get_cif, run=lambda cif : CrystalStructure.from_cif(cif_content=cif),
+              max_sites=1_000),
+    Benchmark(name='from_pymatgen', prepare=lambda case : fresh_copy(case.crystal).to_pymatgen(),
+              run=lambda structure : CrystalStructure.from_pymatgen(pymatgen_structure=structure)),
+    Benchmark(name='to_pymatgen', setup=fresh_copy, run=lambda crystal : crystal.to_pymatgen()),
+    Benchmark(name='to_cif', setup=fresh_copy, run=lambda crystal : crystal.to_cif(), max_sites=10_000),
+    Benchmark(name='calculate_properties', setup=fresh_copy,
+              run=lambda crystal : crystal.calculate_properties(use_cache=False), max_sites=10_000),
+    Benchmark(name='calculate_atomic_volume', prepare=lambda case : case.crystal.base,
+              run=lambda base : base.calculate_atomic_volume()),
+    Benchmark(name='xrd_pattern', run=lambda crystal : calculate_pattern(crystal=crystal), max_sites=1_000),
+    Benchmark(name='neighbor_list', run=lambda crystal : crystal.get_neighbor_list(cutoff=4.0)),
+    Benchmark(name='make_supercell', run=lambda crystal : crystal.make_supercell(scaling=2), max_sites=10_000),
+    Benchmark(name='expand_symmetry', run=lambda crystal : crystal.expand_symmetry(spacegroup=221), max_sites=10_000),
+    Benchmark(name='to_str', run=lambda crystal : crystal.to_str()),
+    Benchmark(name='from_str', prepare=lambda case : case.crystal.to_str(),
+              run=lambda s : CrystalStructure.from_str(s)),
+)
+
+
+def make_cases(sizes : Iterable[int] = DEFAULT_SIZES, seed : int = 0, include_cifs : bool = True) -> list[Case]:
+    cases = []
+    if include_cifs:
+        for num in BUNDLED_CIFS:
+            cif = CrystalExamples.get_cif_content(num=num)
+            cases.append(Case(name=f'test{num}.cif', crystal=CrystalStructure.from_cif(cif_content=cif), cif=cif))
+    for num_sites in sizes:
+        cases.append(Case(name=f'synthetic-{num_sites}', crystal=make_synthetic_crystal(num_sites=num_sites, seed=seed)))
+    return cases
+
+
+def run_suite(sizes : Iterable[int] = DEFAULT_SIZES, seed : int = 0, names : Optional[Iterable[str]] = None,
+              include_cifs : bool = True, min_time : float = 0.2, max_repeats : int = 50, import_repeats : int = 5,
+              progress_callback : Optional[Callable[[BenchmarkResult], None]] = None) -> BenchmarkReport:
+    """Runs every selected benchmark on the bundled CIFs and on seeded synthetic crystals of the given sizes,
+    skipping cases above a benchmark's max_sites. The import benchmark times the cold import of each of
+    IMPORT_MODULES in import_repeats fresh interpreters"""
+    names = None if names is None else set(names)
+    benchmarks = [benchmark for benchmark in BENCHMARKS if names is None or benchmark.name in names]
+    available = [benchmark.name for benchmark in BENCHMARKS] + [IMPORT_BENCHMARK]
+    if not names is None and not names <= set(available):
+        raise ValueError(f'Unknown benchmarks {sorted(names - set(available))}; available are {available}')
+
+    results = []
+    if names is None or IMPORT_BENCHMARK in names:
+        for module in IMPORT_MODULES:
+            result = measure_import(module=module, repeats=import_repeats)
+            results.append(result)
+            if progress_callback:
+                progress_callback(result)
+    for case in make_cases(sizes=sizes, seed=seed, include_cifs=include_cifs):
+        for benchmark in benchmarks:
+            if case.num_sites > benchmark.max_sites:
+                continue
+            result = measure(benchmark=benchmark, case=case, min_time=min_time, max_repeats=max_repeats)
+            results.append(result)
+            if progress_callback:
+                progress_callback(result)
+    return BenchmarkReport(results=results, metadata=get_metadata(seed=seed))
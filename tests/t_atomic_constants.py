@@ -0,0 +1,62 @@
+import os
+import tempfile
+
+import numpy as np
+from holytools.devtools import Unittest
+
+from CrystalStructure.atomic_constants import AtomicConstants
+from CrystalStructure.atomic_constants.atomic_constants import ConstantTables
+
+
+# ---------------------------------------------------------
+
+class TestAtomicConstants(Unittest):
+    def test_vectorized_matches_scalar(self):
+        symbols = ['H', 'O', 'Si', 'Pb', 'Si']
+        species_ids = AtomicConstants.get_species_ids(symbols)
+        self.assertEqual(species_ids.tolist(), [1, 8, 14, 82, 14])
+
+        vdw_radii = AtomicConstants.get_vdw_radii(species_ids)
+        covalent_radii = AtomicConstants.get_covalent_radii(species_ids)
+        scattering_params = AtomicConstants.get_scattering_params_array(species_ids)
+        self.assertEqual(scattering_params.shape, (5, 4, 2))
+        for j, symbol in enumerate(symbols):
+            self.assertEqual(vdw_radii[j], AtomicConstants.get_vdw_radius(element_symbol=symbol))
+            self.assertEqual(covalent_radii[j], AtomicConstants.get_covalent(element_symbol=symbol))
+            self.assertEqual(scattering_params[j].tolist(), [list(p) for p in AtomicConstants.get_scattering_params(symbol)])
+
+    def test_missing_values(self):
+        self.assertTrue(np.isnan(AtomicConstants.get_vdw_radii(np.array([0])))[0])
+        with self.assertRaises(KeyError):
+            AtomicConstants.get_scattering_params(species_symbol='Db')
+        with self.assertRaises(KeyError):
+            AtomicConstants.get_covalent(element_symbol='Xx')
+
+    def test_binary_roundtrip(self):
+        tables = ConstantTables.from_json()
+        fpath = os.path.join(tempfile.mkdtemp(), 'constants.npz')
+        tables.save_binary(fpath=fpath)
+        restored = ConstantTables.from_binary(fpath=fpath)
+
+        self.assertEqual(restored.symbols, tables.symbols)
+        self.assertTrue(np.array_equal(restored.scattering_params, tables.scattering_params, equal_nan=True))
+        self.assertTrue(np.array_equal(restored.vdw, tables.vdw, equal_nan=True))
+
+    def test_binary_cache(self):
+        fpath = os.path.join(tempfile.mkdtemp(), 'cache', 'constants.npz')
+        AtomicConstants.binary_cache_fpath, AtomicConstants._tables = fpath, None
+        try:
+            AtomicConstants.get_tables()
+            self.assertTrue(os.path.isfile(fpath))
+
+            with open(fpath, 'r+b') as file:
+                file.truncate(100)
+            AtomicConstants._tables = None
+            self.assertEqual(AtomicConstants.get_vdw_radius(element_symbol='O'), ConstantTables.from_json().vdw[8])
+            self.assertEqual(ConstantTables.from_binary(fpath=fpath).symbols, ConstantTables.from_json().symbols)
+        finally:
+            AtomicConstants.binary_cache_fpath, AtomicConstants._tables = None, None
+
+
+if __name__ == '__main__':
+    TestAtomicConstants.execute_all()
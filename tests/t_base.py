@@ -28,6 +28,22 @@ class TestCrystalBase(Unittest):
                     print(f'Scattering params for species \"{atomic_site.species_str}:\n a1, a2, a3, a4, b1, b2, b3, b4 = {params}')
                 seen_species.add(atomic_site.atom_type)
 
+    def test_atom_type_interning(self):
+        AtomType.clear_cache()
+        first = AtomicSite(x=0.5, y=0.5, z=0.5, occupancy=1.0, species_str="Si0+")
+        second = AtomicSite(x=0.1, y=0.1, z=0.1, occupancy=1.0, species_str="Si0+")
+        self.assertIs(first.atom_type, second.atom_type)
+        self.assertIs(first.pymatgen_species, second.pymatgen_species)
+        self.assertEqual(first.element_symbol, 'Si')
+
+        cache_info = AtomType.cache_info()
+        self.assertEqual(cache_info.misses, 1)
+        self.assertEqual(cache_info.hits, 1)
+
+        void_type = AtomType.intern(AtomType.void_symbol)
+        self.assertIsNone(void_type.pymatgen_type)
+        self.assertIsNone(void_type.covalent_radius)
+
 
 if __name__ == '__main__':
     TestCrystalBase.execute_all()
\ No newline at end of file
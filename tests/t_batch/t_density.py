@@ -0,0 +1,50 @@
+from holytools.devtools import Unittest
+
+from CrystalStructure.batch import calculate_atomic_volumes, calculate_packing_densities, scale_to_density
+from CrystalStructure.crystal import CrystalStructure, CrystalBase, AtomicSite, Lengths, Angles
+from CrystalStructure.examples import CrystalExamples
+
+
+# ---------------------------------------------------------
+
+class TestBatchDensity(Unittest):
+    def setUp(self):
+        self.crystals = [CrystalExamples.get_crystal(num=j) for j in range(1, 3)]
+        self.crystals.append(CrystalStructure(lengths=Lengths(5, 3, 4), angles=Angles(90, 90, 90), base=CrystalBase([
+            AtomicSite(x=0.5, y=0.5, z=0.5, occupancy=0.5, species_str="Si0+"),
+            AtomicSite.make_void(),
+            AtomicSite.make_placeholder()
+        ])))
+        columnar = CrystalExamples.get_crystal(num=1)
+        self.crystals.append(CrystalStructure(lengths=columnar.lengths, angles=columnar.angles,
+                                              base=columnar.base.to_columnar()))
+
+    def test_matches_single_crystal(self):
+        atomic_volumes = calculate_atomic_volumes(self.crystals)
+        packing_densities = calculate_packing_densities(self.crystals)
+        for crystal in self.crystals:
+            crystal.calculate_properties()
+
+        for j, crystal in enumerate(self.crystals):
+            self.assertAlmostEqual(atomic_volumes[j], crystal.base.calculate_atomic_volume())
+            self.assertAlmostEqual(packing_densities[j], crystal.packing_density)
+
+    def test_scaling(self):
+        target_density = 0.5
+        for crystal in self.crystals:
+            crystal.calculate_properties()
+        spacegroups = [crystal.spacegroup for crystal in self.crystals]
+        crystal_systems = [crystal.crystal_system for crystal in self.crystals]
+
+        scale_to_density(self.crystals, target_density=target_density)
+        for crystal in self.crystals:
+            self.assertAlmostEqual(crystal.packing_density, target_density)
+        self.assertEqual([crystal.spacegroup for crystal in self.crystals], spacegroups)
+        self.assertEqual([crystal.crystal_system for crystal in self.crystals], crystal_systems)
+        self.assertNotIn(None, spacegroups)
+        for density in calculate_packing_densities(self.crystals):
+            self.assertAlmostEqual(density, target_density)
+
+
+if __name__ == '__main__':
+    TestBatchDensity.execute_all()
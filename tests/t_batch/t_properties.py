@@ -0,0 +1,60 @@
+from holytools.devtools import Unittest
+
+from CrystalStructure.batch import calculate_properties_batch, BatchReport
+from CrystalStructure.crystal import CrystalStructure, CrystalBase, AtomicSite, Lengths, Angles
+from CrystalStructure.examples import CrystalExamples
+
+
+# ---------------------------------------------------------
+
+class TestBatchProperties(Unittest):
+    def setUp(self):
+        self.cifs = [CrystalExamples.get_cif_content(num=j) for j in range(1, 3)] * 6
+        self.expected = [CrystalStructure.from_cif(cif_content=cif) for cif in self.cifs]
+        for crystal in self.expected:
+            crystal.calculate_properties(use_cache=False)
+
+    def test_matches_single_crystal(self):
+        for num_workers in [0, 2]:
+            crystals = [CrystalStructure.from_cif(cif_content=cif) for cif in self.cifs]
+            reports : list[BatchReport] = []
+            report = calculate_properties_batch(crystals, num_workers=num_workers, chunk_size=5, use_cache=False,
+                                                progress_callback=reports.append)
+            self.assertEqual((report.completed, report.failed), (len(crystals), 0))
+            self.assertEqual(reports[-1].completed, len(crystals))
+
+            for crystal, expected in zip(crystals, self.expected):
+                self.assertEqual(crystal.spacegroup, expected.spacegroup)
+                self.assertEqual(crystal.wyckoff_symbols, expected.wyckoff_symbols)
+                self.assertEqual(crystal.crystal_system, expected.crystal_system)
+                self.assertAlmostEqual(crystal.volume_uc, expected.volume_uc)
+
+    def test_failures_are_reported(self):
+        empty = CrystalStructure(lengths=Lengths.make_example(), angles=Angles.make_example(), base=CrystalBase())
+        crystals = [CrystalStructure.from_cif(cif_content=self.cifs[0]), empty]
+        report = calculate_properties_batch(iter(crystals), num_workers=1, timeout=60)
+        self.assertEqual(report.failed, 1)
+        self.assertIn(1, report.errors)
+        self.assertIsNone(empty.spacegroup)
+
+    def test_invalid_crystal(self):
+        for use_cache in [True, False]:
+            crystals = [CrystalStructure.from_cif(cif_content=cif) for cif in self.cifs[:4]]
+            crystals[1].base = CrystalBase([AtomicSite(x=0.1, y=0.2, z=0.3, occupancy=1.0, species_str='Xx')])
+            report = calculate_properties_batch(crystals, num_workers=0, chunk_size=4, use_cache=use_cache)
+            self.assertEqual((report.completed, report.failed), (4, 1))
+            self.assertEqual(list(report.errors), [1])
+            self.assertIsNone(crystals[1].spacegroup)
+            for crystal, expected in zip(crystals[2:], self.expected[2:4]):
+                self.assertEqual(crystal.spacegroup, expected.spacegroup)
+
+    def test_timeout(self):
+        crystals = [CrystalStructure.from_cif(cif_content=cif) for cif in self.cifs]
+        report = calculate_properties_batch(crystals, num_workers=2, chunk_size=4, timeout=1e-6, use_cache=False)
+        self.assertEqual(report.completed, len(crystals))
+        for index, crystal in enumerate(crystals):
+            self.assertEqual(crystal.get_cached('spacegroup') is None, index in report.errors)
+
+
+if __name__ == '__main__':
+    TestBatchProperties.execute_all()
@@ -0,0 +1,59 @@
+import numpy as np
+from holytools.devtools import Unittest
+
+from CrystalStructure.batch import make_batch
+from CrystalStructure.crystal import AtomicSite, CrystalStructure
+from CrystalStructure.crystal.atomic_site import AtomType
+from CrystalStructure.examples import CrystalExamples
+
+
+# ---------------------------------------------------------
+
+class TestBatchExport(Unittest):
+    def setUp(self):
+        self.crystals = [CrystalExamples.get_crystal(num=j) for j in range(1, 3)]
+
+    def test_shapes(self):
+        batch = make_batch(self.crystals, max_sites=20)
+        self.assertEqual(batch.sites.shape, (2, 20, 12))
+        self.assertEqual(batch.mask.shape, (2, 20))
+        self.assertEqual(batch.lattice.shape, (2, 6))
+        self.assertEqual(batch.num_sites.tolist(), [16, 6])
+
+    def test_rows_match_sites(self):
+        batch = make_batch(self.crystals)
+        for crystal, sites, species in zip(self.crystals, batch.sites, batch.species):
+            for j, site in enumerate(crystal.base):
+                self.assertTrue(np.allclose(sites[j], site.as_list()))
+                self.assertEqual(batch.species_table[species[j]], site.species_str)
+        self.assertAlmostEqual(batch.lattice[1, 3], self.crystals[1].angles.alpha)
+
+    def test_mixed_containers(self):
+        columnar = [CrystalStructure(lengths=crystal.lengths, angles=crystal.angles, base=crystal.base.to_columnar())
+                    for crystal in self.crystals]
+        expected = make_batch(self.crystals)
+        mixed = make_batch([columnar[0], self.crystals[1], columnar[1]])
+        self.assertTrue(np.array_equal(mixed.sites[:2], expected.sites, equal_nan=True))
+        self.assertTrue(np.array_equal(mixed.sites[2], expected.sites[1], equal_nan=True))
+        self.assertEqual([mixed.species_table[j] for j in mixed.species[2]],
+                         [expected.species_table[j] for j in expected.species[1]])
+
+    def test_padding(self):
+        void_batch = make_batch(self.crystals)
+        void_row = np.array(AtomicSite.make_void().as_list(), dtype=float)
+        self.assertTrue(np.array_equal(void_batch.sites[1, -1], void_row, equal_nan=True))
+        self.assertEqual(void_batch.species_table[void_batch.species[1, -1]], AtomType.void_symbol)
+
+        placeholder_batch = make_batch(self.crystals, padding=AtomType.placeholder_symbol)
+        self.assertTrue(np.all(np.isnan(placeholder_batch.sites[1, -1])))
+        self.assertFalse(placeholder_batch.mask[1, -1])
+
+    def test_fixed_species_table(self):
+        with self.assertRaises(ValueError):
+            make_batch(self.crystals, species_table=[AtomType.void_symbol])
+        with self.assertRaises(ValueError):
+            make_batch(self.crystals, max_sites=10)
+
+
+if __name__ == '__main__':
+    TestBatchExport.execute_all()
@@ -0,0 +1,43 @@
+import os
+import tempfile
+
+from holytools.devtools import Unittest
+
+from benchmarks import make_synthetic_crystal, compare, BenchmarkReport, run_suite, get_heavy_imports, IMPORT_MODULES
+
+
+# ---------------------------------------------------------
+
+class TestBenchmarks(Unittest):
+    def test_generator_deterministic(self):
+        for num_sites in [1, 50]:
+            crystal = make_synthetic_crystal(num_sites=num_sites, seed=3)
+            self.assertEqual(len(crystal.base), num_sites)
+            self.assertEqual(crystal.to_str(), make_synthetic_crystal(num_sites=num_sites, seed=3).to_str())
+        self.assertNotEqual(make_synthetic_crystal(num_sites=50, seed=3).to_str(),
+                            make_synthetic_crystal(num_sites=50, seed=4).to_str())
+
+    def test_report_and_regressions(self):
+        report = run_suite(sizes=[5], names=['to_str', 'from_str'], include_cifs=False, min_time=0, max_repeats=3)
+        self.assertEqual([(result.name, result.case) for result in report.results],
+                         [('to_str', 'synthetic-5'), ('from_str', 'synthetic-5')])
+
+        fpath = os.path.join(tempfile.mkdtemp(), 'baseline.json')
+        report.save(fpath=fpath)
+        baseline = BenchmarkReport.load(fpath=fpath)
+        self.assertEqual(compare(current=report, baseline=baseline), [])
+
+        baseline.results[0].p50_s = report.results[0].p50_s / 2
+        regressions = compare(current=report, baseline=baseline)
+        self.assertEqual([(regression.name, regression.metric) for regression in regressions], [('to_str', 'p50_s')])
+
+    def test_imports_stay_light(self):
+        for module in IMPORT_MODULES:
+            self.assertEqual(get_heavy_imports(module=module), [])
+        report = run_suite(sizes=[], names=['import'], include_cifs=False, import_repeats=1)
+        self.assertEqual([result.case for result in report.results], list(IMPORT_MODULES))
+        self.assertTrue(all(result.p50_s > 0 for result in report.results))
+
+
+if __name__ == '__main__':
+    TestBenchmarks.execute_all()
@@ -0,0 +1,28 @@
+import os
+import tempfile
+
+from holytools.devtools import Unittest
+
+from CrystalStructure.cli import main
+from CrystalStructure.examples import CrystalExamples
+from CrystalStructure.io import CrystalDataset
+
+
+# ---------------------------------------------------------
+
+class TestCli(Unittest):
+    def test_convert(self):
+        dirpath = tempfile.mkdtemp()
+        cif_fpath = os.path.join(dirpath, 'test1.cif')
+        with open(cif_fpath, 'w') as file:
+            file.write(CrystalExamples.get_cif_content(num=1))
+        output_fpath = os.path.join(dirpath, 'crystals.dataset')
+
+        exit_code = main(['convert', cif_fpath, output_fpath, '--workers', '1', '--properties', '--quiet'])
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(CrystalDataset(fpath=output_fpath).spacegroups.tolist(), [57])
+        self.assertEqual(main(['convert', os.path.join(dirpath, 'missing', '*.cif'), output_fpath, '-q']), 2)
+
+
+if __name__ == '__main__':
+    TestCli.execute_all()
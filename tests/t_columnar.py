@@ -0,0 +1,87 @@
+from holytools.devtools import Unittest
+
+from CrystalStructure.crystal import CrystalBase, ColumnarBase, AtomicSite, CrystalStructure
+from CrystalStructure.crystal.atomic_site import AtomType
+from CrystalStructure.examples import CrystalExamples
+
+
+# ---------------------------------------------------------
+
+class TestColumnarBase(Unittest):
+    def setUp(self):
+        self.list_base = CrystalBase(list(CrystalExamples.get_base()))
+        self.columnar_base = self.list_base.to_columnar()
+
+    def test_list_interface(self):
+        self.assertEqual(len(self.columnar_base), len(self.list_base))
+        for expected, actual in zip(self.list_base, self.columnar_base):
+            self.assertEqual(expected.species_str, actual.species_str)
+            self.assertAlmostEqual(expected.x, actual.x)
+            self.assertEqual(expected.occupancy, actual.occupancy)
+        self.assertEqual(self.columnar_base[-1].species_str, self.list_base[-1].species_str)
+        self.assertEqual(len(self.columnar_base[2:5]), 3)
+
+    def test_concatenation(self):
+        combined = self.columnar_base + self.list_base
+        self.assertIsInstance(combined, ColumnarBase)
+        self.assertEqual(len(combined), 2 * len(self.list_base))
+        self.assertEqual(combined.species_table, self.columnar_base.species_table)
+
+        self.columnar_base += combined
+        self.assertEqual(len(self.columnar_base), 3 * len(self.list_base))
+        self.assertEqual(self.columnar_base.coords.shape, (3 * len(self.list_base), 3))
+
+    def test_nonstandard_sites(self):
+        base = ColumnarBase()
+        base.append(AtomicSite(x=0.5, y=0.5, z=0.5, occupancy=1.0, species_str="Si0+", wyckoff_letter='a'))
+        base.append(AtomicSite.make_void())
+        base.append(AtomicSite.make_placeholder())
+
+        placeholder = base[2]
+        self.assertIsNone(placeholder.x)
+        self.assertIsNone(placeholder.occupancy)
+        self.assertIsNone(placeholder.wyckoff_letter)
+        self.assertEqual(base[1].species_str, AtomType.void_symbol)
+        self.assertEqual(len(base.get_non_void_sites()), 1)
+        self.assertAlmostEqual(base.calculate_atomic_volume(), CrystalBase(base.atomic_sites).calculate_atomic_volume())
+
+    def test_read_only_sites(self):
+        with self.assertRaises(AttributeError):
+            self.columnar_base.atomic_sites.append(AtomicSite.make_void())
+
+    def test_long_wyckoff_letters(self):
+        site = AtomicSite(x=0.5, y=0.5, z=0.5, occupancy=1.0, species_str="Si0+", wyckoff_letter='4a')
+        self.columnar_base.append(site)
+        self.columnar_base += ColumnarBase([site] * 2)
+        self.assertEqual(self.columnar_base.wyckoff_letters.tolist()[-3:], ['4a'] * 3)
+        self.assertEqual(self.columnar_base[0].wyckoff_letter, self.list_base[0].wyckoff_letter)
+        restored = ColumnarBase.from_bytes(self.columnar_base.to_bytes())
+        self.assertEqual(restored.to_str(), self.columnar_base.to_str())
+
+        crystal = CrystalExamples.get_crystal(num=1)
+        crystal.base = CrystalBase(list(crystal.base) + [site])
+        crystal.calculate_properties()
+        self.assertIsNotNone(crystal.spacegroup)
+
+    def test_default_container(self):
+        crystal = CrystalExamples.get_crystal(num=1)
+        self.assertNotIsInstance(crystal.base, ColumnarBase)
+        crystal.base[0].wyckoff_letter = 'z'
+        self.assertEqual(crystal.base[0].wyckoff_letter, 'z')
+
+        columnar = CrystalStructure.from_cif(cif_content=crystal.to_cif(), columnar=True)
+        self.assertIsInstance(columnar.base, ColumnarBase)
+        self.assertEqual(columnar.base.to_str(), CrystalStructure.from_cif(cif_content=crystal.to_cif()).base.to_str())
+
+    def test_atomic_volume(self):
+        expected = self.list_base.calculate_atomic_volume()
+        self.assertAlmostEqual(self.columnar_base.calculate_atomic_volume(), expected)
+
+    def test_serialization(self):
+        restored = ColumnarBase.from_str(self.columnar_base.to_str())
+        self.assertIsInstance(restored, ColumnarBase)
+        self.assertEqual(restored.to_str(), self.list_base.to_str())
+
+
+if __name__ == '__main__':
+    TestColumnarBase.execute_all()
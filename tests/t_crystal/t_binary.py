@@ -0,0 +1,42 @@
+import tests.t_crystal.crystal_test as BaseTest
+from CrystalStructure.crystal import CrystalStructure, CrystalBase, AtomicSite, Lengths, Angles
+
+
+# ---------------------------------------------------------
+
+class TestBinarySerialization(BaseTest.CrystalTest):
+    def test_roundtrip(self):
+        for crystal in self.crystals:
+            crystal.calculate_properties()
+            restored = CrystalStructure.from_bytes(crystal.to_bytes())
+            self.assertEqual(restored.to_str(), crystal.to_str())
+            self.assertEqual(restored.wyckoff_symbols, crystal.wyckoff_symbols)
+            self.assertEqual(restored.crystal_system, crystal.crystal_system)
+            self.assertLess(len(crystal.to_bytes()), len(crystal.to_str()) / 2)
+
+    def test_float32(self):
+        crystal = self.crystals[0]
+        restored = CrystalStructure.from_bytes(crystal.to_bytes(precision='float32'))
+        self.assertEqual(restored.lengths, crystal.lengths)
+        for expected, actual in zip(crystal.base, restored.base):
+            self.assertAlmostEqual(expected.x, actual.x, places=6)
+            self.assertEqual(expected.species_str, actual.species_str)
+
+    def test_partial_information(self):
+        base = CrystalBase([
+            AtomicSite(x=0.5, y=0.5, z=0.5, occupancy=1.0, species_str="Si0+", wyckoff_letter='a'),
+            AtomicSite.make_void(),
+            AtomicSite.make_placeholder()
+        ])
+        crystal = CrystalStructure(lengths=Lengths(a=None, b=3.0, c=4.0), angles=Angles(90.0, 90.0, 90.0), base=base)
+        restored = CrystalStructure.from_bytes(crystal.to_bytes())
+        self.assertEqual(restored.to_str(), crystal.to_str())
+        self.assertEqual(CrystalBase.from_bytes(base.to_bytes()).to_str(), base.to_str())
+
+    def test_invalid_data(self):
+        with self.assertRaises(ValueError):
+            CrystalStructure.from_bytes(self.crystals[0].base.to_bytes())
+
+
+if __name__ == "__main__":
+    TestBinarySerialization.execute_all()
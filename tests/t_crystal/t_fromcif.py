@@ -1,4 +1,6 @@
 import tests.t_crystal.crystal_test as BaseTest
+from CrystalStructure.crystal import CrystalStructure
+from CrystalStructure.crystal.cif_parser import UnsupportedCifError, parse_simple_cif
 
 # ---------------------------------------------------------
 
@@ -25,6 +27,37 @@ class TestCifParsing(BaseTest.CrystalTest):
         for crystal, num_atoms_exp in zip(self.crystals, expected_atom_counts):
             self.assertEqual(len(crystal.base), num_atoms_exp)
 
+    def test_native_parser_matches_pymatgen(self):
+        for cif, crystal in zip(self.cifs, self.crystals):
+            expected = CrystalStructure.from_cif(cif_content=cif, use_native_parser=False)
+            self.assertEqual(crystal.lengths, expected.lengths)
+            self.assertEqual(crystal.angles, expected.angles)
+            self.assertEqual(len(crystal.base), len(expected.base))
+            for site, expected_site in zip(crystal.base, expected.base):
+                self.assertEqual(site.species_str, expected_site.species_str)
+                self.assertEqual(site.occupancy, expected_site.occupancy)
+                for coord, expected_coord in zip((site.x, site.y, site.z), (expected_site.x, expected_site.y, expected_site.z)):
+                    self.assertAlmostEqual(coord, expected_coord, places=9)
+
+    def test_unsupported_fallback(self):
+        no_symops = self.cifs[0].replace('_space_group_symop_operation_xyz', '_space_group_symop_unknown')
+        with self.assertRaises(UnsupportedCifError):
+            parse_simple_cif(cif_content=no_symops)
+        crystal = CrystalStructure.from_cif(cif_content=no_symops)
+        self.assertEqual(len(crystal.base), len(self.crystals[0].base))
+
+    def test_from_pymatgen_supercell(self):
+        structure = self.pymatgen_structures[1].copy()
+        structure.make_supercell([2, 2, 2])
+        crystal = CrystalStructure.from_pymatgen(pymatgen_structure=structure, columnar=True)
+        self.assertEqual(len(crystal.base), 8 * len(self.crystals[1].base))
+
+        expected_sites = [(species, occupancy) for site in structure for species, occupancy in site.species.items()]
+        for site, (species, occupancy) in zip(crystal.base, expected_sites):
+            self.assertEqual(site.species_str, f'{species.symbol}0+')
+            self.assertEqual(site.occupancy, occupancy)
+        self.assertEqual(crystal.base.coords[:2].tolist(), [structure[0].frac_coords.tolist()] * 2)
+
 
 if __name__ == "__main__":
     TestCifParsing.execute_all()
\ No newline at end of file
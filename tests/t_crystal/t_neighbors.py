@@ -0,0 +1,44 @@
+import numpy as np
+
+import tests.t_crystal.crystal_test as BaseTest
+from CrystalStructure.crystal import AtomicSite, CrystalStructure, NeighborList
+
+
+# ---------------------------------------------------------
+
+class TestNeighborList(BaseTest.CrystalTest):
+    def test_matches_pymatgen(self):
+        crystal = self.crystals[0]
+        for cutoff in [3.0, 12.0]:
+            neighbor_list = crystal.get_neighbor_list(cutoff=cutoff)
+            centers, indices, images, distances = crystal.to_pymatgen().get_neighbor_list(r=cutoff)
+            expected = sorted(zip(centers.tolist(), indices.tolist(), images.astype(int).tolist(), np.round(distances, 8)))
+            actual = sorted(zip(neighbor_list.centers.tolist(), neighbor_list.indices.tolist(),
+                                neighbor_list.images.tolist(), np.round(neighbor_list.distances, 8)))
+            self.assertEqual(actual, expected)
+            self.assertEqual(neighbor_list.offsets[-1], neighbor_list.num_edges)
+            self.assertTrue(np.allclose(np.linalg.norm(neighbor_list.get_edge_vectors(), axis=1), neighbor_list.distances))
+
+    def test_void_sites(self):
+        crystal = self.crystals[1]
+        crystal.base = crystal.base + [AtomicSite.make_void()]
+        neighbor_list = crystal.get_neighbor_list(cutoff=4.0)
+        void_index = len(crystal.base) - 1
+        self.assertEqual(len(neighbor_list.get_neighbors(site_index=void_index)[0]), 0)
+        self.assertFalse(void_index in neighbor_list.indices)
+
+    def test_update(self):
+        rng = np.random.default_rng(seed=0)
+        neighbor_list = self.crystals[0].get_neighbor_list(cutoff=5.0)
+        for _ in range(3):
+            moved = rng.choice(len(neighbor_list), size=2, replace=False)
+            neighbor_list.update(site_indices=moved, coords=rng.uniform(-1, 2, size=(2, 3)))
+            fresh = NeighborList(lattice_matrix=neighbor_list.lattice_matrix, coords=neighbor_list.coords, cutoff=5.0)
+            self.assertTrue(np.array_equal(neighbor_list.offsets, fresh.offsets))
+            self.assertTrue(np.array_equal(neighbor_list.indices, fresh.indices))
+            self.assertTrue(np.array_equal(neighbor_list.images, fresh.images))
+            self.assertTrue(np.allclose(neighbor_list.distances, fresh.distances))
+
+
+if __name__ == '__main__':
+    TestNeighborList.execute_all()
@@ -1,4 +1,6 @@
+import json
 import math
+from dataclasses import fields
 from typing import Union
 
 import numpy as np
@@ -60,6 +62,45 @@ class TestPropertyCalculation(BaseTest.CrystalTest):
         for crystal, symbols_exp in zip(self.crystals, expected_symbols):
             self.assertEqual(crystal.wyckoff_symbols, symbols_exp)
 
+    def test_explicit_properties(self):
+        crystal = self.crystals[1]
+        self.assertIsNone(crystal.spacegroup)
+        self.assertIn('"volume_uc":null', crystal.to_str())
+        self.assertAlmostEqual(crystal.volume_uc, 67.96, places=1)
+        self.assertIsNone(crystal.spacegroup)
+        self.assertIn('"spacegroup":null', crystal.to_str())
+        self.assertNotIn('"volume_uc":null', crystal.to_str())
+
+        self.assertEqual(crystal.get_cached('spacegroup', calculate=True), self.spgs[1])
+        self.assertEqual(crystal.crystal_system, 'trigonal')
+        crystal.spacegroup = None
+        crystal.base = crystal.base
+        self.assertIsNone(crystal.spacegroup)
+
+        structure = crystal.to_pymatgen()
+        structure.replace_species({species : 'Li' for species in structure.composition})
+        self.assertNotIn('Li', crystal.to_cif())
+
+    def test_invalidation(self):
+        crystal = self.crystals[1]
+        crystal.calculate_properties()
+        volume_uc, atomic_volume = crystal.volume_uc, crystal.packing_density * crystal.volume_uc
+
+        crystal.scale(target_density=crystal.packing_density / 2)
+        self.assertAlmostEqual(crystal.volume_uc, 2 * volume_uc)
+        self.assertAlmostEqual(crystal.atomic_volume, atomic_volume)
+        self.assertEqual(crystal.spacegroup, self.spgs[1])
+        self.assertEqual(crystal.crystal_system, 'trigonal')
+        self.assertIsNotNone(crystal.wyckoff_symbols)
+        self.assertEqual(sorted(json.loads(crystal.to_str())), sorted(f.name for f in fields(crystal)))
+
+        crystal.spacegroup = 1
+        crystal.base.append(AtomicSite(x=0.5, y=0.5, z=0.5, occupancy=1.0, species_str='O0+'))
+        self.assertIsNone(crystal.spacegroup)
+        self.assertIsNone(crystal.get_cached('atomic_volume'))
+        self.assertGreater(crystal.atomic_volume, atomic_volume)
+        self.assertIsNotNone(crystal.get_cached('atomic_volume'))
+
     # ---------------------------------------------------------
 
     def check_sites_equal(self, s1 : Site, s2 : Site):
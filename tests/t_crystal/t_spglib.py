@@ -0,0 +1,29 @@
+from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
+from pymatgen.symmetry.groups import SpaceGroup
+
+import tests.t_crystal.crystal_test as BaseTest
+from CrystalStructure.batch import calculate_symmetries
+from CrystalStructure.symmetry import get_crystal_system
+
+
+# ---------------------------------------------------------
+
+class TestSpglibPath(BaseTest.CrystalTest):
+    def test_matches_pymatgen(self):
+        results = calculate_symmetries(self.crystals)
+        for crystal, result in zip(self.crystals, results):
+            analyzer = SpacegroupAnalyzer(structure=crystal.to_pymatgen(), symprec=0.1, angle_tolerance=10)
+            self.assertEqual(result.spacegroup, analyzer.get_space_group_number())
+            self.assertEqual(list(result.wyckoff_symbols), list(analyzer.get_symmetry_dataset().wyckoffs))
+
+            crystal.calculate_properties(use_cache=False)
+            self.assertEqual(crystal.spacegroup, result.spacegroup)
+            self.assertEqual(crystal.crystal_system, result.crystal_system)
+
+    def test_crystal_systems(self):
+        for spacegroup in [1, 2, 3, 15, 16, 74, 75, 142, 143, 167, 168, 194, 195, 230]:
+            self.assertEqual(get_crystal_system(spacegroup), SpaceGroup.from_int_number(spacegroup).crystal_system)
+
+
+if __name__ == "__main__":
+    TestSpglibPath.execute_all()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+
+import tests.t_crystal.crystal_test as BaseTest
+from CrystalStructure.crystal import CrystalStructure
+from CrystalStructure.symmetry import SymmetryCache
+
+
+# ---------------------------------------------------------
+
+class TestSymmetryCache(BaseTest.CrystalTest):
+    def setUp(self):
+        super().setUp()
+        self.db_fpath = os.path.join(tempfile.mkdtemp(), 'symmetry.sqlite')
+        SymmetryCache.set_default(SymmetryCache(db_fpath=self.db_fpath))
+
+    def tearDown(self):
+        SymmetryCache.set_default(SymmetryCache())
+
+    def test_cached_results_match(self):
+        for crystal in self.crystals:
+            crystal.calculate_properties()
+        cache = SymmetryCache.get_default()
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+        for cif, expected in zip(self.cifs, self.crystals):
+            crystal = CrystalStructure.from_cif(cif_content=cif)
+            crystal.calculate_properties()
+            self.assertEqual(crystal.spacegroup, expected.spacegroup)
+            self.assertEqual(crystal.wyckoff_symbols, expected.wyckoff_symbols)
+            self.assertEqual(crystal.crystal_system, expected.crystal_system)
+            self.assertEqual(crystal.volume_uc, expected.volume_uc)
+        self.assertEqual(cache.hits, 2)
+
+    def test_persistence(self):
+        for crystal in self.crystals:
+            crystal.calculate_properties()
+
+        fresh_cache = SymmetryCache(db_fpath=self.db_fpath)
+        SymmetryCache.set_default(fresh_cache)
+        for crystal in self.crystals:
+            crystal.calculate_properties()
+        self.assertEqual((fresh_cache.hits, fresh_cache.misses), (2, 0))
+
+    def test_key_depends_on_tolerance(self):
+        crystal = self.crystals[1]
+        crystal.calculate_properties(symprec=0.1)
+        crystal.calculate_properties(symprec=0.01)
+        self.assertEqual(SymmetryCache.get_default().misses, 2)
+
+
+if __name__ == "__main__":
+    TestSymmetryCache.execute_all()
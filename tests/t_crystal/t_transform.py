@@ -0,0 +1,76 @@
+import numpy as np
+
+import tests.t_crystal.crystal_test as BaseTest
+from CrystalStructure.crystal import AtomicSite, ColumnarBase, CrystalStructure, Lengths, Angles
+from CrystalStructure.symmetry import get_symmetry_operations
+
+
+# ---------------------------------------------------------
+
+class TestTransform(BaseTest.CrystalTest):
+    def test_expand_symmetry(self):
+        crystal = self.crystals[0]
+        asymmetric_unit = ColumnarBase.from_arrays(coords=[[0.931, 0.25, 0], [0.688, 0.102, 0.25],
+                                                           [0.16, 0.015, 0.25], [0.402, 0.333, 0.25]],
+                                                   occupancies=[1, 1, 1, 1], species_ids=[0, 0, 1, 1],
+                                                   species_table=['Al0+', 'Er0+'],
+                                                   wyckoff_letters=np.array(['c', 'd', 'd', 'd']))
+        asymmetric_unit = asymmetric_unit + [AtomicSite.make_void()]
+        reduced = CrystalStructure(lengths=crystal.lengths, angles=crystal.angles, base=asymmetric_unit)
+        expanded = reduced.expand_symmetry(spacegroup=57)
+        expanded.calculate_properties()
+
+        self.assertEqual(len(expanded.base), len(crystal.base) + 1)
+        self.assertEqual(expanded.base.wyckoff_letters.tolist(), ['c'] * 4 + ['d'] * 12 + [''])
+        self.assertEqual(self.get_site_keys(expanded), self.get_site_keys(crystal))
+        self.assertEqual(expanded.spacegroup, 57)
+
+        reduced.spacegroup = 57
+        self.assertEqual(self.get_site_keys(reduced.expand_symmetry()), self.get_site_keys(crystal))
+
+    def test_special_positions(self):
+        hexagonal_unit = ColumnarBase.from_arrays(coords=[[0, 0, 0], [0.3333, 0.6667, 0.5]], occupancies=[1, 1],
+                                                  species_ids=[0, 1], species_table=['Mg0+', 'B0+'])
+        mgb2 = CrystalStructure(lengths=Lengths(3.086, 3.086, 3.524), angles=Angles(90, 90, 120), base=hexagonal_unit)
+        expanded = mgb2.expand_symmetry(spacegroup=191)
+        self.assertEqual(expanded.base.species_strs, ['Mg0+', 'B0+', 'B0+'])
+        self.assertTrue(np.allclose(expanded.base.coords[1:], [[1 / 3, 2 / 3, 0.5], [2 / 3, 1 / 3, 0.5]]))
+
+        trigonal_unit = ColumnarBase.from_arrays(coords=[[0.3333, 0.6667, 0.2345], [0.1667, 0.8333, 0.75]],
+                                                 occupancies=[1, 1], species_ids=[0, 1], species_table=['Se0+', 'O0+'])
+        trigonal = CrystalStructure(lengths=Lengths(4.0, 4.0, 6.0), angles=Angles(90, 90, 120), base=trigonal_unit)
+        self.assertEqual(len(trigonal.expand_symmetry(spacegroup=164).base), 2 + 6)
+
+        # Two copies of one site on either side of a rounding edge and a slightly off image are merged
+        duplicated_unit = ColumnarBase.from_arrays(coords=[[0.00004, 0.5, 0.5], [0.000099, 0.5, 0.5]],
+                                                   occupancies=[1, 1], species_ids=[0, 0], species_table=['Na0+'])
+        duplicated = CrystalStructure(lengths=Lengths(4.0, 4.0, 4.0), angles=Angles(90, 90, 90), base=duplicated_unit)
+        self.assertEqual(len(duplicated.expand_symmetry(spacegroup=2).base), 1)
+
+    def test_symmetry_operations(self):
+        rotations, translations = get_symmetry_operations(spacegroup=160)
+        self.assertEqual(len(rotations), 18)
+        rotations, translations = get_symmetry_operations(hall_number=451)
+        self.assertEqual((rotations.shape, translations.shape), ((6, 3, 3), (6, 3)))
+        self.assertFalse(rotations.flags.writeable)
+
+    def test_make_supercell(self):
+        for crystal in self.crystals:
+            supercell = crystal.make_supercell(scaling=(2, 1, 3))
+            expected = crystal.to_pymatgen().copy()
+            expected.make_supercell([2, 1, 3])
+            self.assertTrue(np.allclose(supercell.to_pymatgen().lattice.matrix, expected.lattice.matrix))
+            self.assertEqual(self.get_site_keys(supercell), self.get_site_keys(CrystalStructure.from_pymatgen(expected)))
+            self.assertEqual(len(crystal.make_supercell(scaling=2).base), 8 * len(crystal.base))
+
+    @staticmethod
+    def get_site_keys(crystal : CrystalStructure) -> list[tuple]:
+        base = crystal.base.to_columnar()
+        standard_mask = base.get_standard_mask()
+        coords = np.round(base.coords[standard_mask] % 1, 4) % 1
+        species_strs = np.array(base.species_strs)[standard_mask]
+        return sorted((species_str, *coord) for species_str, coord in zip(species_strs.tolist(), coords.tolist()))
+
+
+if __name__ == '__main__':
+    TestTransform.execute_all()
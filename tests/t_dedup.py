@@ -0,0 +1,55 @@
+import os
+import tempfile
+
+from holytools.devtools import Unittest
+from pymatgen.core import Structure
+
+from CrystalStructure.crystal import CrystalStructure
+from CrystalStructure.dedup import FingerprintIndex, find_duplicates
+from CrystalStructure.examples import CrystalExamples
+
+
+# ---------------------------------------------------------
+
+class TestDeduplication(Unittest):
+    def setUp(self):
+        self.crystals = [CrystalExamples.get_crystal(num=j) for j in range(1, 3)]
+        structure = self.crystals[0].to_pymatgen()
+        supercell = structure.copy()
+        supercell.make_supercell([1, 2, 1])
+        shifted = Structure.from_sites(structure.sites[::-1])
+        shifted.translate_sites(list(range(len(shifted))), [0.2, 0.1, 0.4])
+        self.variants = [CrystalStructure.from_pymatgen(supercell), CrystalStructure.from_pymatgen(shifted)]
+
+    def test_fingerprint_invariance(self):
+        fingerprint = self.crystals[0].get_fingerprint()
+        for variant in self.variants:
+            other = variant.get_fingerprint()
+            self.assertEqual(other.bucket, fingerprint.bucket)
+            self.assertLess(other.distance(fingerprint), 1e-4)
+        self.assertNotEqual(self.crystals[1].get_fingerprint().bucket, fingerprint.bucket)
+
+    def test_find_duplicates(self):
+        crystals = [self.crystals[0], self.crystals[1], *self.variants]
+        self.assertEqual(find_duplicates(crystals=crystals), {2 : 0, 3 : 0})
+
+    def test_persisted_index(self):
+        db_fpath = os.path.join(tempfile.mkdtemp(), 'fingerprints.sqlite')
+        index = FingerprintIndex(db_fpath=db_fpath, tolerance=0.2)
+        index.add_all(items=[(f'crystal-{j}', crystal.get_fingerprint()) for j, crystal in enumerate(self.crystals)])
+
+        reopened = FingerprintIndex(db_fpath=db_fpath)
+        self.assertEqual(reopened.tolerance, 0.2)
+        self.assertEqual(len(reopened), 2)
+        matches = reopened.query(fingerprint=self.variants[0].get_fingerprint())
+        self.assertEqual([key for key, _ in matches], ['crystal-0'])
+
+        reopened.add(key='variant', fingerprint=self.variants[1].get_fingerprint())
+        reopened.remove(key='crystal-0')
+        self.assertFalse('crystal-0' in reopened)
+        matches = reopened.query(fingerprint=self.crystals[0].get_fingerprint())
+        self.assertEqual([key for key, _ in matches], ['variant'])
+
+
+if __name__ == '__main__':
+    TestDeduplication.execute_all()
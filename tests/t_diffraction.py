@@ -0,0 +1,44 @@
+import numpy as np
+from holytools.devtools import Unittest
+from pymatgen.analysis.diffraction.xrd import XRDCalculator
+from pymatgen.core import Structure
+
+from CrystalStructure.diffraction import calculate_peaks, calculate_pattern, calculate_patterns, get_two_theta_grid
+from CrystalStructure.examples import CrystalExamples
+
+
+# ---------------------------------------------------------
+
+class TestXrd(Unittest):
+    def setUp(self):
+        self.crystals = [CrystalExamples.get_crystal(num=j) for j in range(1, 3)]
+        self.structures = [Structure.from_str(CrystalExamples.get_cif_content(num=j), fmt='cif') for j in range(1, 3)]
+
+    def test_matches_pymatgen(self):
+        for crystal, structure in zip(self.crystals, self.structures):
+            expected = XRDCalculator().get_pattern(structure, two_theta_range=(10, 80))
+            peaks = calculate_peaks(crystal=crystal, two_theta_range=(10, 80))
+            multiplicities = [sum(family['multiplicity'] for family in hkls) for hkls in expected.hkls]
+
+            self.assertEqual(len(peaks), len(expected.x))
+            self.assertTrue(np.allclose(peaks.two_theta, expected.x))
+            self.assertTrue(np.allclose(peaks.intensities, expected.y))
+            self.assertTrue(np.allclose(peaks.d_spacings, expected.d_hkls))
+            self.assertEqual(peaks.multiplicities.tolist(), multiplicities)
+
+    def test_binned_patterns(self):
+        patterns = calculate_patterns(crystals=self.crystals, num_bins=900)
+        self.assertEqual(patterns.shape, (2, 900))
+        self.assertTrue(np.allclose(patterns.max(axis=1), 100))
+        self.assertTrue(np.allclose(patterns[1], calculate_pattern(crystal=self.crystals[1], num_bins=900)))
+
+        peaks = calculate_peaks(crystal=self.crystals[0], scaled=False)
+        pattern = calculate_pattern(crystal=self.crystals[0], num_bins=900, scaled=False)
+        grid = get_two_theta_grid(num_bins=900)
+        self.assertAlmostEqual(pattern.sum(), peaks.intensities.sum(), places=6)
+        strongest = peaks.two_theta[np.argmax(peaks.intensities)]
+        self.assertLessEqual(abs(grid[np.argmax(pattern)] - strongest), 0.05)
+
+
+if __name__ == '__main__':
+    TestXrd.execute_all()
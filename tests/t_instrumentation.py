@@ -0,0 +1,50 @@
+from holytools.devtools import Unittest
+
+from CrystalStructure.crystal import CrystalStructure
+from CrystalStructure.examples import CrystalExamples
+from CrystalStructure.instrumentation import Instrumentation, instrumented, stage
+
+
+# ---------------------------------------------------------
+
+class TestInstrumentation(Unittest):
+    def setUp(self):
+        self.cif_content = CrystalExamples.get_cif_content(num=1)
+        Instrumentation.reset()
+
+    def test_disabled_records_nothing(self):
+        CrystalStructure.from_cif(cif_content=self.cif_content).to_str()
+        self.assertEqual(Instrumentation.snapshot(), {})
+
+    def test_stage_stats(self):
+        with instrumented(track_allocations=True):
+            crystal = CrystalStructure.from_cif(cif_content=self.cif_content)
+            crystal.calculate_properties(use_cache=False)
+            CrystalStructure.from_str(crystal.to_str())
+        self.assertFalse(Instrumentation.enabled)
+
+        snapshot = Instrumentation.snapshot()
+        for name in ['crystal.from_cif', 'cif.parse_native', 'symmetry.spglib', 'crystal.to_str', 'crystal.from_str']:
+            self.assertEqual(snapshot[name].calls, 1)
+            self.assertGreater(snapshot[name].total_s, 0)
+            self.assertEqual(snapshot[name].max_s, snapshot[name].total_s)
+        self.assertGreaterEqual(snapshot['crystal.from_cif'].total_s, snapshot['cif.parse_native'].total_s)
+
+        Instrumentation.reset()
+        self.assertEqual(Instrumentation.snapshot(), {})
+        self.assertEqual(snapshot['crystal.from_cif'].calls, 1)
+
+    def test_errors_and_export(self):
+        with instrumented():
+            with self.assertRaises(ValueError):
+                with stage(name='failing "stage"'):
+                    raise ValueError
+        self.assertEqual(Instrumentation.to_dict()['failing "stage"']['errors'], 1)
+
+        text = Instrumentation.to_prometheus(prefix='test')
+        self.assertIn('# TYPE test_stage_calls_total counter', text)
+        self.assertIn('test_stage_errors_total{stage="failing \\"stage\\""} 1', text)
+
+
+if __name__ == '__main__':
+    TestInstrumentation.execute_all()
@@ -0,0 +1,75 @@
+import json
+import os
+import shutil
+import tempfile
+
+from holytools.devtools import Unittest
+
+from CrystalStructure.examples import CrystalExamples
+from CrystalStructure.io import CrystalDataset, ConversionReport, convert_cifs, iter_jsonl
+
+
+# ---------------------------------------------------------
+
+class TestConvert(Unittest):
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.cif_dirpath = os.path.join(self.dirpath, 'cifs')
+        os.makedirs(self.cif_dirpath)
+        for index in range(6):
+            with open(os.path.join(self.cif_dirpath, f'{index}.cif'), 'w') as file:
+                file.write(CrystalExamples.get_cif_content(num=1 + index % 2))
+        with open(os.path.join(self.cif_dirpath, '6_broken.cif'), 'w') as file:
+            file.write('data_broken\n')
+
+    def test_convert(self):
+        output_fpath = os.path.join(self.dirpath, 'crystals.dataset')
+        report = convert_cifs(source=self.cif_dirpath, output_fpath=output_fpath, num_workers=0,
+                              calculate_properties=True, checkpoint_every=2)
+        self.assertEqual((report.processed, report.written, report.failed), (7, 6, 1))
+        self.assertEqual(CrystalDataset(fpath=output_fpath).spacegroups.tolist(), [57, 160] * 3)
+        self.assertFalse(os.path.exists(output_fpath + '.partial'))
+        with open(output_fpath + '.failures.jsonl') as file:
+            failures = [json.loads(line) for line in file]
+        self.assertEqual([os.path.basename(failure['name']) for failure in failures], ['6_broken.cif'])
+
+        jsonl_fpath = os.path.join(self.dirpath, 'crystals.jsonl')
+        convert_cifs(source=self.cif_dirpath, output_fpath=jsonl_fpath, num_workers=0, density=0.5)
+        self.assertEqual([round(crystal.packing_density, 6) for crystal in iter_jsonl(jsonl_fpath)], [0.5] * 6)
+
+    def test_resume(self):
+        output_fpath = os.path.join(self.dirpath, 'crystals.dataset')
+        failure_log_fpath = os.path.join(self.dirpath, 'failures.jsonl')
+
+        def interrupt(report : ConversionReport):
+            if report.processed == 5:
+                raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            convert_cifs(source=self.cif_dirpath, output_fpath=output_fpath, num_workers=0, checkpoint_every=2,
+                         failure_log_fpath=failure_log_fpath, progress_callback=interrupt, progress_interval=0)
+        with self.assertRaises(ValueError):
+            convert_cifs(source=self.cif_dirpath, output_fpath=output_fpath, num_workers=0, standardize=True)
+        inserted_fpath = os.path.join(self.cif_dirpath, '00.cif')
+        shutil.copy(os.path.join(self.cif_dirpath, '1.cif'), inserted_fpath)
+        with self.assertRaises(ValueError):
+            convert_cifs(source=self.cif_dirpath, output_fpath=output_fpath, num_workers=0, checkpoint_every=2,
+                         failure_log_fpath=failure_log_fpath)
+        os.remove(inserted_fpath)
+
+        report = convert_cifs(source=self.cif_dirpath, output_fpath=output_fpath, num_workers=0, checkpoint_every=2,
+                              failure_log_fpath=failure_log_fpath)
+        self.assertEqual((report.resumed_from, report.processed, report.written), (4, 7, 6))
+        expected = [CrystalExamples.get_crystal(num=1 + index % 2) for index in range(6)]
+        self.assertEqual([crystal.base.to_bytes() for crystal in CrystalDataset(fpath=output_fpath)],
+                         [crystal.base.to_bytes() for crystal in expected])
+        with open(failure_log_fpath) as file:
+            self.assertEqual(len(file.readlines()), 1)
+
+        shutil.rmtree(self.cif_dirpath)
+        with self.assertRaises(FileNotFoundError):
+            convert_cifs(source=self.cif_dirpath, output_fpath=output_fpath, num_workers=0, restart=True)
+
+
+if __name__ == '__main__':
+    TestConvert.execute_all()
@@ -0,0 +1,54 @@
+import os
+import pickle
+import tempfile
+
+import numpy as np
+from holytools.devtools import Unittest
+
+from CrystalStructure.crystal import CrystalStructure, CrystalBase, AtomicSite, Lengths, Angles
+from CrystalStructure.examples import CrystalExamples
+from CrystalStructure.io import CrystalDataset, write_dataset
+
+
+# ---------------------------------------------------------
+
+class TestCrystalDataset(Unittest):
+    def setUp(self):
+        self.crystals = [CrystalExamples.get_crystal(num=j) for j in range(1, 3)]
+        self.crystals[0].calculate_properties()
+        partial_base = CrystalBase([AtomicSite(x=0.5, y=0.5, z=0.5, occupancy=1.0, species_str="Si0+", wyckoff_letter='a'),
+                                    AtomicSite.make_void(), AtomicSite.make_placeholder()])
+        self.crystals.append(CrystalStructure(lengths=Lengths(a=None, b=3.0, c=4.0), angles=Angles(90.0, 90.0, 90.0),
+                                              base=partial_base))
+        self.fpath = os.path.join(tempfile.mkdtemp(), 'crystals.dataset')
+        self.dataset = write_dataset(fpath=self.fpath, crystals=self.crystals * 2)
+
+    def test_random_access(self):
+        self.assertEqual(len(self.dataset), 6)
+        for index, crystal in enumerate(self.crystals * 2):
+            self.assertEqual(self.dataset[index].to_str(), crystal.to_str())
+        self.assertEqual(self.dataset[-1].to_str(), self.crystals[-1].to_str())
+        self.assertEqual(len(self.dataset[1:4]), 3)
+        with self.assertRaises(IndexError):
+            _ = self.dataset[6]
+
+    def test_columns(self):
+        self.assertEqual(self.dataset.num_atoms.tolist(), [16, 6, 3] * 2)
+        self.assertEqual(self.dataset.spacegroups.tolist(), [57, -1, -1] * 2)
+        self.assertTrue(np.isnan(self.dataset.lattice[2, 0]))
+
+        batch = self.dataset.get_batch(1, 4)
+        self.assertEqual(batch.site_offsets.tolist(), [0, 6, 9, 25])
+        self.assertEqual(batch.coords.shape, (25, 3))
+        self.assertFalse(batch.coords.flags.writeable)
+        self.assertTrue(np.shares_memory(batch.coords, self.dataset.get_batch(0, 6).coords))
+
+    def test_pickling_reopens_file(self):
+        restored = pickle.loads(pickle.dumps(self.dataset))
+        self.assertIsInstance(restored, CrystalDataset)
+        self.assertLess(len(pickle.dumps(self.dataset)), 200)
+        self.assertEqual(restored[0].to_str(), self.crystals[0].to_str())
+
+
+if __name__ == '__main__':
+    TestCrystalDataset.execute_all()
@@ -0,0 +1,59 @@
+import os
+import tarfile
+import tempfile
+
+from holytools.devtools import Unittest
+
+from CrystalStructure.crystal import CrystalStructure
+from CrystalStructure.examples import CrystalExamples
+from CrystalStructure.io import ingest_cifs
+
+
+# ---------------------------------------------------------
+
+class TestCifIngestion(Unittest):
+    def setUp(self):
+        self.cifs = [CrystalExamples.get_cif_content(num=j) for j in range(1, 3)]
+        self.expected_num_atoms = [16, 6]
+
+    def test_iterable_source(self):
+        results = list(ingest_cifs(self.cifs * 3, num_workers=2, max_in_flight=2))
+        self.assertEqual([r.crystal.num_atoms for r in results], self.expected_num_atoms * 3)
+
+    def test_unordered(self):
+        results = list(ingest_cifs(self.cifs * 3, num_workers=2, preserve_order=False))
+        self.assertEqual(sorted(r.crystal.num_atoms for r in results), sorted(self.expected_num_atoms * 3))
+
+    def test_error_capture(self):
+        results = list(ingest_cifs([self.cifs[0], 'not a cif', self.cifs[1]], num_workers=0))
+        self.assertEqual([r.is_ok for r in results], [True, False, True])
+        self.assertIsNotNone(results[1].error)
+
+    def test_directory_and_archive(self):
+        dirpath = tempfile.mkdtemp()
+        for j, cif in enumerate(self.cifs):
+            with open(os.path.join(dirpath, f'{j}.cif'), 'w') as f:
+                f.write(cif)
+        archive_fpath = os.path.join(tempfile.mkdtemp(), 'cifs.tar.gz')
+        with tarfile.open(archive_fpath, 'w:gz') as archive:
+            archive.add(dirpath, arcname='cifs')
+
+        for source in [dirpath, os.path.join(dirpath, '*.cif'), archive_fpath]:
+            results = list(ingest_cifs(source, num_workers=2, calculate_properties=True))
+            self.assertEqual([r.crystal.num_atoms for r in results], self.expected_num_atoms)
+            self.assertIsNotNone(results[0].crystal.spacegroup)
+
+    def test_dead_worker(self):
+        results = list(ingest_cifs(self.cifs * 3, num_workers=1, max_in_flight=1, process=exit_on_small_crystals))
+        self.assertEqual([r.is_ok for r in results], [True, False] * 3)
+        self.assertIn('BrokenProcessPool', results[1].error)
+
+
+def exit_on_small_crystals(crystal : CrystalStructure) -> CrystalStructure:
+    if crystal.num_atoms < 10:
+        os._exit(1)
+    return crystal
+
+
+if __name__ == '__main__':
+    TestCifIngestion.execute_all()
@@ -0,0 +1,61 @@
+import gzip
+import os
+import tempfile
+
+from holytools.devtools import Unittest
+
+from CrystalStructure.crystal import Lengths
+from CrystalStructure.examples import CrystalExamples
+from CrystalStructure.io import JsonlWriter, iter_jsonl, write_jsonl, count_jsonl
+
+
+# ---------------------------------------------------------
+
+class TestJsonl(Unittest):
+    def setUp(self):
+        self.crystals = [CrystalExamples.get_crystal(num=j) for j in range(1, 3)]
+        self.crystals[0].calculate_properties()
+        self.dirpath = tempfile.mkdtemp()
+
+    def test_roundtrip(self):
+        for fname in ['crystals.jsonl', 'crystals.jsonl.gz', 'crystals.jsonl.bz2', 'crystals.jsonl.xz']:
+            fpath = os.path.join(self.dirpath, fname)
+            num_written = write_jsonl(fpath=fpath, crystals=iter(self.crystals * 3), buffer_size=4)
+            self.assertEqual(num_written, 6)
+            restored = list(iter_jsonl(fpath=fpath))
+            self.assertEqual([crystal.to_str() for crystal in restored], [crystal.to_str() for crystal in self.crystals * 3])
+
+        with gzip.open(os.path.join(self.dirpath, 'crystals.jsonl.gz'), 'rt') as file:
+            self.assertEqual(len(file.readlines()), 6)
+
+    def test_fields(self):
+        fpath = os.path.join(self.dirpath, 'crystals.jsonl')
+        write_jsonl(fpath=fpath, crystals=self.crystals)
+        records = list(iter_jsonl(fpath=fpath, fields=['lengths', 'spacegroup', 'wyckoff_symbols']))
+        self.assertEqual(records[0]['lengths'], self.crystals[0].lengths)
+        self.assertIsInstance(records[0]['lengths'], Lengths)
+        self.assertEqual(records[0]['spacegroup'], self.crystals[0].spacegroup)
+        self.assertEqual(records[0]['wyckoff_symbols'], self.crystals[0].wyckoff_symbols)
+        self.assertIsNone(records[1]['spacegroup'])
+        with self.assertRaises(ValueError):
+            next(iter_jsonl(fpath=fpath, fields=['density']))
+
+    def test_resume_after_interruption(self):
+        for fname in ['crystals.jsonl', 'crystals.jsonl.gz']:
+            fpath = os.path.join(self.dirpath, fname)
+            write_jsonl(fpath=fpath, crystals=self.crystals)
+            with open(fpath, 'rb') as file:
+                content = file.read()
+            with open(fpath, 'wb') as file:
+                file.write(content[:-20])
+
+            num_complete = count_jsonl(fpath=fpath)
+            self.assertLess(num_complete, len(self.crystals))
+            with JsonlWriter(fpath=fpath, append=True) as writer:
+                writer.write_all(self.crystals[num_complete:])
+            restored = list(iter_jsonl(fpath=fpath))
+            self.assertEqual([crystal.to_str() for crystal in restored], [crystal.to_str() for crystal in self.crystals])
+
+
+if __name__ == '__main__':
+    TestJsonl.execute_all()
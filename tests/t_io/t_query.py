@@ -0,0 +1,76 @@
+import os
+import tempfile
+
+import numpy as np
+from holytools.devtools import Unittest
+
+from CrystalStructure.crystal import CrystalStructure, CrystalBase, AtomicSite, Lengths, Angles
+from CrystalStructure.examples import CrystalExamples
+from CrystalStructure.io import CrystalIndex, Column, contains, contains_any, contains_only, index_dataset, write_dataset
+
+
+# ---------------------------------------------------------
+
+class TestQuery(Unittest):
+    def setUp(self):
+        crystals = [CrystalExamples.get_crystal(num=j) for j in range(1, 3)]
+        for crystal in crystals:
+            crystal.calculate_properties()
+        partial_base = CrystalBase([AtomicSite(x=0.5, y=0.5, z=0.5, occupancy=1.0, species_str="Si0+", wyckoff_letter='a'),
+                                    AtomicSite.make_void(), AtomicSite.make_placeholder()])
+        crystals.append(CrystalStructure(lengths=Lengths(a=None, b=3.0, c=4.0), angles=Angles(90.0, 90.0, 90.0),
+                                         base=partial_base))
+        self.fpath = os.path.join(tempfile.mkdtemp(), 'crystals.dataset')
+        self.dataset = write_dataset(fpath=self.fpath, crystals=crystals * 7)
+        self.index = CrystalIndex.build(dataset=self.dataset, chunk_size=8)
+        self.crystals = list(self.dataset)
+
+    def test_predicates(self):
+        num_atoms = Column('num_atoms')
+        cases = [(contains('O'), lambda c: 'O' in self.get_elements(c)),
+                 (contains('Si') & ~contains('O'), lambda c: self.get_elements(c) == {'Si'}),
+                 (contains_any('Xe', 'Si'), lambda c: 'Si' in self.get_elements(c)),
+                 (contains_only('Si', 'O'), lambda c: self.get_elements(c) <= {'Si', 'O'}),
+                 (num_atoms < 6, lambda c: len(c.base) < 6),
+                 (num_atoms.between(3, 6) & (num_atoms != 3), lambda c: 3 < len(c.base) <= 6),
+                 (Column('spacegroup').isin([57, 1]), lambda c: c.get_cached('spacegroup') in (57, 1)),
+                 (Column('spacegroup') >= 1, lambda c: c.get_cached('spacegroup') is not None),
+                 (Column('volume_uc') > 0, lambda c: c.get_cached('volume_uc') is not None),
+                 (Column('packing_density') <= 1.0, lambda c: c.get_cached('atomic_volume') is not None),
+                 (Column('crystal_system') == 'orthorhombic', lambda c: c.get_cached('crystal_system') == 'orthorhombic'),
+                 (Column('crystal_system') != 'orthorhombic',
+                  lambda c: c.get_cached('crystal_system') not in (None, 'orthorhombic'))]
+        for predicate, matches in cases:
+            expected = [record for record, crystal in enumerate(self.crystals) if matches(crystal)]
+            self.assertEqual(self.index.select(predicate).tolist(), expected)
+            self.assertEqual(self.index.count(predicate), len(expected))
+
+        unknown_systems = [record for record, crystal in enumerate(self.crystals) if crystal.crystal_system is None]
+        self.assertTrue(set(unknown_systems) <= set(self.index.select(~(Column('crystal_system') == 'orthorhombic'))))
+        self.assertFalse(set(unknown_systems) & set(self.index.select(Column('crystal_system') != 'orthorhombic')))
+        self.assertEqual(self.index.count(contains('Xe')), 0)
+        self.assertEqual(self.index.count(~contains('Xe')), len(self.crystals))
+        with self.assertRaises(ValueError):
+            _ = Column('crystal_system') < 3
+        with self.assertRaises(ValueError):
+            self.index.select(Column('crystal_system') == 'rhombic')
+
+    def test_persistence(self):
+        index = index_dataset(dataset_fpath=self.fpath)
+        self.assertTrue(os.path.isdir(self.fpath + '.index'))
+        predicate = contains('O') & (Column('num_atoms') > 3)
+        self.assertEqual(index.select(predicate).tolist(), self.index.select(predicate).tolist())
+
+        reloaded = index_dataset(dataset_fpath=self.fpath)
+        self.assertIsInstance(reloaded.element_bitmaps, np.memmap)
+
+        write_dataset(fpath=self.fpath, crystals=self.crystals[:2])
+        self.assertEqual(len(index_dataset(dataset_fpath=self.fpath)), 2)
+
+    @staticmethod
+    def get_elements(crystal : CrystalStructure) -> set[str]:
+        return {site.element_symbol for site in crystal.base if site.atom_type.is_standard}
+
+
+if __name__ == '__main__':
+    TestQuery.execute_all()
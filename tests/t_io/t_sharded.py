@@ -0,0 +1,69 @@
+import os
+import pickle
+import tempfile
+
+from holytools.devtools import Unittest
+
+from CrystalStructure.crystal import Lengths
+from CrystalStructure.examples import CrystalExamples
+from CrystalStructure.io import ShardedDataset, ShardedDatasetWriter, write_sharded, get_shard, read_manifest
+from CrystalStructure.io.sharded import get_shard_dirpath, make_structure_key
+
+
+# ---------------------------------------------------------
+
+class TestSharded(Unittest):
+    def setUp(self):
+        self.crystals = [CrystalExamples.get_crystal(num=1 + index % 2) for index in range(8)]
+        for index, crystal in enumerate(self.crystals):
+            crystal.lengths = Lengths(a=crystal.lengths.a + 0.01 * index, b=crystal.lengths.b, c=crystal.lengths.c)
+        self.dirpath = os.path.join(tempfile.mkdtemp(), 'shards')
+
+    def test_partitioning(self):
+        with ShardedDatasetWriter(dirpath=self.dirpath, num_shards=4, writer_id='first', part_size=2) as writer:
+            writer.add_all(crystals=self.crystals[:5])
+        write_sharded(dirpath=self.dirpath, crystals=self.crystals[5:], num_shards=4, writer_id='second')
+
+        expected_shards = [get_shard(key=make_structure_key(crystal), num_shards=4) for crystal in self.crystals]
+        workers = [ShardedDataset(dirpath=self.dirpath, worker_index=k, num_workers=3, verify=True) for k in range(3)]
+        self.assertEqual(sum(len(worker) for worker in workers), len(self.crystals))
+        for worker in workers:
+            for shard in worker.shards:
+                expected = sorted(make_structure_key(crystal) for crystal, crystal_shard
+                                  in zip(self.crystals, expected_shards) if crystal_shard == shard)
+                self.assertEqual(sorted(make_structure_key(crystal) for crystal in worker.iter_shard(shard)), expected)
+                self.assertEqual(worker.get_counts()[shard], len(expected))
+        self.assertEqual(workers[0][-1].to_str(), list(workers[0])[-1].to_str())
+
+        restored = pickle.loads(pickle.dumps(workers[1]))
+        self.assertEqual([crystal.to_str() for crystal in restored], [crystal.to_str() for crystal in workers[1]])
+
+    def test_keys_and_config(self):
+        cif_contents = [CrystalExamples.get_cif_content(num=1)] * 3
+        shards = {get_shard(key=cif_content, num_shards=16) for cif_content in cif_contents}
+        write_sharded(dirpath=self.dirpath, crystals=self.crystals[:3], num_shards=16, keys=cif_contents)
+        manifest = read_manifest(dirpath=self.dirpath)
+        self.assertEqual({shard for shard, parts in manifest.items() if parts}, shards)
+        self.assertEqual(sum(part['count'] for parts in manifest.values() for part in parts.values()), 3)
+
+        with self.assertRaises(ValueError):
+            ShardedDatasetWriter(dirpath=self.dirpath, num_shards=8)
+        with self.assertRaises(FileNotFoundError):
+            ShardedDataset(dirpath=os.path.join(self.dirpath, 'missing'))
+
+    def test_rerun_and_corruption(self):
+        write_sharded(dirpath=self.dirpath, crystals=self.crystals, num_shards=2, writer_id='worker0')
+        write_sharded(dirpath=self.dirpath, crystals=self.crystals[:3], num_shards=2, writer_id='worker0')
+        self.assertEqual(len(ShardedDataset(dirpath=self.dirpath)), 3)
+
+        shard, parts = next((shard, parts) for shard, parts in read_manifest(dirpath=self.dirpath).items() if parts)
+        part_fpath = os.path.join(get_shard_dirpath(dirpath=self.dirpath, shard=shard), f'{next(iter(parts))}.dataset')
+        with open(part_fpath, 'r+b') as file:
+            file.seek(-1, os.SEEK_END)
+            file.write(b'\x01')
+        with self.assertRaises(ValueError):
+            ShardedDataset(dirpath=self.dirpath, verify=True)
+
+
+if __name__ == '__main__':
+    TestSharded.execute_all()